@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from memory_profiling import KEY_TYPES, live_objects, memory_profiler
+from config import ADMIN_TOKEN
+from typing import Optional
+import hmac
+
+router = APIRouter(prefix="/api/admin/memory", tags=["Admin"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Operators authenticate with the shared ``ADMIN_TOKEN``, not a user account."""
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required"
+        )
+
+
+@router.get("", dependencies=[Depends(require_admin)])
+def memory_status(objects: bool = False):
+    """RSS, tracemalloc totals and garbage-collector counts for this worker.
+
+    With ``objects=true`` also counts reachable ORM rows by model and live
+    sessions (this runs a full garbage collection).
+    """
+    result = memory_profiler.status()
+    if objects:
+        result["objects"] = live_objects()
+    return result
+
+
+@router.post("/start", dependencies=[Depends(require_admin)])
+def start_tracing(frames: int = Query(1, ge=1, le=100)):
+    """Start tracemalloc with ``frames`` frames per allocation and take the baseline snapshot."""
+    memory_profiler.start(frames)
+    return memory_profiler.status()
+
+
+@router.post("/snapshot", dependencies=[Depends(require_admin)])
+def take_snapshot(limit: int = Query(20, ge=1, le=500), key_type: str = "lineno"):
+    """Diff a new snapshot against the previous one and list the allocation sites that grew most."""
+    if key_type not in KEY_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"key_type must be one of: {', '.join(KEY_TYPES)}"
+        )
+    try:
+        diff = memory_profiler.snapshot(limit, key_type)
+    except RuntimeError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Tracing is not started; POST /api/admin/memory/start first"
+        )
+    return {**diff, **memory_profiler.status()}
+
+
+@router.post("/stop", dependencies=[Depends(require_admin)])
+def stop_tracing():
+    """Stop tracemalloc and drop the stored snapshot."""
+    memory_profiler.stop()
+    return memory_profiler.status()
@@ -0,0 +1,290 @@
+"""Adaptive admission control: concurrency limits and load shedding by queue delay.
+
+Every endpoint is a sync function run in the threadpool, so in a traffic spike
+requests pile up there, behind bcrypt and database calls, until every client
+times out at once. ``AdmissionMiddleware`` admits requests into a bounded
+number of in-flight slots instead and holds the rest in queues in front of the
+app, where their waiting time can be measured and acted on:
+
+* Requests are classed by ``RouteClass`` rules (first match wins): ``auth``
+  (the bcrypt-heavy login and signup), ``read`` (GETs) and ``write``. A freed
+  slot goes to the waiting class with the best ``priority``, so cheap reads are
+  served before writes, and writes before auth work.
+* Each class has a concurrency limit, adapted AIMD-style once per
+  ``ADMISSION_INTERVAL_MS``: it drops by a tenth when the interval's mean
+  service time exceeds ``ADMISSION_LATENCY_TOLERANCE`` times the class's
+  long-run mean, and grows by one when the limit was reached without that.
+  All classes together never hold more than ``ADMISSION_MAX_CONCURRENCY``.
+* Queues follow CoDel: if even the shortest queue delay a class saw during an
+  interval exceeded ``ADMISSION_TARGET_DELAY_MS``, its queue is standing and
+  the class is overloaded. Waiting requests are only shed while the class is
+  overloaded, once they've waited the target delay, and then the newest
+  waiter is served first (adaptive LIFO): the oldest have likely given up. A
+  burst on a healthy class just waits for slots to free up, however long the
+  requests ahead of it take.
+* Shed requests, and any beyond ``ADMISSION_MAX_QUEUE`` waiting in a class,
+  get an immediate ``503`` with ``Retry-After``.
+
+State is per process, like the in-memory rate limiter.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from config import (
+    ADMISSION_AUTH_MAX_CONCURRENCY,
+    ADMISSION_INTERVAL_MS,
+    ADMISSION_LATENCY_TOLERANCE,
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_TARGET_DELAY_MS,
+)
+
+DECREASE = 0.9
+BASELINE_WEIGHT = 0.05  # weight of each interval in a class's long-run mean service time
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    """Requests whose path starts with ``path`` (and method matches, if given) belong to class ``name``."""
+    name: str
+    path: str
+    method: Optional[str] = None
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method is None or self.method == method) and path.startswith(self.path)
+
+
+@dataclass(frozen=True)
+class ClassLimit:
+    """How a class is scheduled: lower ``priority`` is served first."""
+    priority: int
+    max_limit: int
+    min_limit: int = 1
+
+
+def default_classes() -> List[RouteClass]:
+    return [
+        RouteClass("auth", "/api/auth/login", "POST"),
+        RouteClass("auth", "/api/auth/signup", "POST"),
+        RouteClass("read", "/api/", "GET"),
+        RouteClass("write", "/api/"),
+    ]
+
+
+def default_class_limits() -> Dict[str, ClassLimit]:
+    return {
+        "read": ClassLimit(priority=0, max_limit=ADMISSION_MAX_CONCURRENCY),
+        "write": ClassLimit(priority=1, max_limit=ADMISSION_MAX_CONCURRENCY),
+        "auth": ClassLimit(priority=2, max_limit=ADMISSION_AUTH_MAX_CONCURRENCY),
+    }
+
+
+class ClassState:
+    """Limit, queue and counters of one route class."""
+
+    def __init__(self, name: str, settings: ClassLimit, now: float):
+        self.name = name
+        self.priority = settings.priority
+        self.min_limit = settings.min_limit
+        self.max_limit = settings.max_limit
+        self.limit = float(settings.max_limit)
+        self.in_flight = 0
+        self.waiters: Deque[Tuple[asyncio.Future, float]] = deque()
+        self.overloaded = False
+        self.baseline: Optional[float] = None  # long-run mean service time
+        self.admitted = 0
+        self.shed = 0
+        self.queue_delay_total = 0.0
+        self.start_interval(now)
+
+    def start_interval(self, now: float) -> None:
+        self.interval_start = now
+        self.min_delay: Optional[float] = None
+        self.latency_total = 0.0
+        self.completed = 0
+        self.saturated = False
+
+    def record_delay(self, delay: float) -> None:
+        self.min_delay = delay if self.min_delay is None else min(self.min_delay, delay)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 1),
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "overloaded": self.overloaded,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "mean_queue_delay_ms": 1000 * self.queue_delay_total / self.admitted if self.admitted else 0.0,
+        }
+
+
+class AdmissionController:
+    """Grants in-flight slots to requests by class. Must be used from a single event loop."""
+
+    def __init__(
+        self,
+        classes: Optional[List[RouteClass]] = None,
+        class_limits: Optional[Dict[str, ClassLimit]] = None,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        target: float = ADMISSION_TARGET_DELAY_MS / 1000,
+        interval: float = ADMISSION_INTERVAL_MS / 1000,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        latency_tolerance: float = ADMISSION_LATENCY_TOLERANCE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.classes = default_classes() if classes is None else classes
+        self.max_concurrency = max_concurrency
+        self.target = target
+        self.interval = interval
+        self.max_queue = max_queue
+        self.latency_tolerance = latency_tolerance
+        self.clock = clock
+        self.in_flight = 0
+        now = clock()
+        limits = default_class_limits() if class_limits is None else class_limits
+        self.states = {name: ClassState(name, settings, now) for name, settings in limits.items()}
+        self._by_priority = sorted(self.states.values(), key=lambda state: state.priority)
+
+    def classify(self, method: str, path: str) -> Optional[ClassState]:
+        rule = next((rule for rule in self.classes if rule.matches(method, path)), None)
+        return self.states[rule.name] if rule is not None else None
+
+    async def acquire(self, state: ClassState) -> Optional[float]:
+        """Wait for a slot in ``state``'s class; returns the admission time, or None if the request is shed."""
+        now = self.clock()
+        self._tick(state, now)
+        if not state.waiters and self._has_room(state):
+            self._admit(state, now, now)
+            return now
+        if state.in_flight >= int(state.limit):
+            state.saturated = True
+        if len(state.waiters) >= self.max_queue:
+            state.shed += 1
+            return None
+
+        entry = (asyncio.get_running_loop().create_future(), now)
+        state.waiters.append(entry)
+        try:
+            while not entry[0].done():
+                await asyncio.wait({entry[0]}, timeout=self.target if state.overloaded else self.interval)
+                now = self.clock()
+                self._tick(state, now)
+                if not entry[0].done() and state.overloaded and now - entry[1] >= self.target:
+                    break
+        except asyncio.CancelledError:
+            # The client went away while waiting.
+            if entry[0].done():
+                self.release(state, self.clock())
+            else:
+                state.waiters.remove(entry)
+            raise
+        if entry[0].done():
+            return self.clock()
+
+        state.waiters.remove(entry)
+        state.record_delay(self.clock() - entry[1])
+        state.shed += 1
+        return None
+
+    def release(self, state: ClassState, admitted_at: float) -> None:
+        """Free the slot of a request admitted at ``admitted_at`` and hand it to the next waiter."""
+        now = self.clock()
+        self.in_flight -= 1
+        state.in_flight -= 1
+        state.latency_total += now - admitted_at
+        state.completed += 1
+        self._tick(state, now)
+        for candidate in self._by_priority:
+            while candidate.waiters and self._has_room(candidate):
+                future, enqueued_at = candidate.waiters.pop() if candidate.overloaded else candidate.waiters.popleft()
+                self._admit(candidate, enqueued_at, now)
+                future.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "classes": {name: state.snapshot() for name, state in self.states.items()},
+        }
+
+    def _has_room(self, state: ClassState) -> bool:
+        return self.in_flight < self.max_concurrency and state.in_flight < int(state.limit)
+
+    def _admit(self, state: ClassState, enqueued_at: float, now: float) -> None:
+        self.in_flight += 1
+        state.in_flight += 1
+        state.admitted += 1
+        state.queue_delay_total += now - enqueued_at
+        state.record_delay(now - enqueued_at)
+
+    def _tick(self, state: ClassState, now: float) -> None:
+        """At the end of each interval, update the class's overload state and limit."""
+        if now - state.interval_start < self.interval:
+            return
+        if state.min_delay is not None:
+            state.overloaded = state.min_delay > self.target
+        elif not state.waiters:
+            state.overloaded = False
+
+        if state.completed:
+            mean = state.latency_total / state.completed
+            if state.baseline is None:
+                state.baseline = mean
+            if mean > state.baseline * self.latency_tolerance:
+                state.limit = max(state.min_limit, state.limit * DECREASE)
+            elif state.saturated:
+                state.limit = min(state.max_limit, state.limit + 1)
+            state.baseline += (mean - state.baseline) * BASELINE_WEIGHT
+        state.start_interval(now)
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests through an ``AdmissionController``.
+
+    Add it innermost, so that only requests that actually reach an endpoint
+    take a slot (not coalesced reads or idempotent replays).
+    """
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = admission_controller if controller is None else controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        state = self.controller.classify(scope["method"], scope["path"])
+        if state is None:
+            await self.app(scope, receive, send)
+            return
+
+        admitted_at = await self.controller.acquire(state)
+        if admitted_at is None:
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(state, admitted_at)
+
+    @staticmethod
+    async def _reject(send) -> None:
+        body = json.dumps({"detail": "Server is busy, please retry"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,93 @@
+"""Hot/cold storage for tasks: move old completed tasks out of ``tasks``.
+
+Completed tasks not updated for ``ARCHIVE_AFTER_DAYS`` are moved to
+``archived_tasks`` with ``INSERT ... SELECT`` and ``DELETE``, one short
+transaction per chunk, so the hot table and the indexes the task list uses
+only hold the active set. The archive sits next to ``tasks`` on the user's
+shard and is only read when asked for (``include_archived=true`` or
+``/api/tasks/archived``). Archived tasks are read-only until restored.
+
+Run ``python archive.py [--days N]`` (e.g. nightly from cron) to archive for
+every user on every shard; ``POST /api/tasks/archive`` does it for one user.
+"""
+import argparse
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_CHUNK_SIZE
+from database import create_db_and_tables, shard_engines
+from models import ArchivedTask, Task
+from positions import next_position
+from timestamps import utcnow
+
+TASK_COLUMNS = [column.name for column in Task.__table__.columns]
+
+
+def archive_cutoff(days: int = ARCHIVE_AFTER_DAYS) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def archive_completed_tasks(session: Session, cutoff: datetime, user_id: Optional[uuid.UUID] = None,
+                            chunk_size: int = ARCHIVE_CHUNK_SIZE) -> int:
+    """Move completed tasks last updated before ``cutoff`` to the archive. Returns how many moved."""
+    tasks = Task.__table__
+    condition = (Task.completed == True) & (Task.updated_at < cutoff)  # noqa: E712
+    if user_id is not None:
+        condition &= Task.user_id == user_id
+    archived = 0
+    while True:
+        # Locked, so a concurrent update can't slip in between the copy and the delete.
+        ids = session.execute(select(Task.id).where(condition).limit(chunk_size).with_for_update()).scalars().all()
+        if not ids:
+            return archived
+        session.execute(insert(ArchivedTask).from_select(
+            [*TASK_COLUMNS, "archived_at"],
+            select(*[tasks.c[name] for name in TASK_COLUMNS], utcnow()).where(tasks.c.id.in_(ids)),
+        ))
+        session.execute(delete(Task).where(Task.id.in_(ids)).execution_options(synchronize_session=False))
+        session.commit()
+        archived += len(ids)
+
+
+def restore_task(session: Session, task_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """Move one of the user's archived tasks back to ``tasks``. Returns False if there is none.
+
+    Restoring counts as an update: ``updated_at`` is stamped and ``version``
+    bumped, so delta syncs and ETags see the task return and the next archive
+    run doesn't take it straight back. A task archived before manual ordering
+    existed has no position and is appended to the end of the list.
+    """
+    archived = ArchivedTask.__table__
+    owned = (archived.c.id == task_id) & (archived.c.user_id == user_id)
+    changed = {
+        "updated_at": utcnow(),
+        "version": archived.c.version + 1,
+        "position": func.coalesce(archived.c.position, next_position(session, Task, user_id)),
+    }
+    restored = session.execute(insert(Task).from_select(
+        TASK_COLUMNS, select(*[changed.get(name, archived.c[name]) for name in TASK_COLUMNS]).where(owned)
+    )).rowcount
+    if restored:
+        session.execute(delete(ArchivedTask).where(owned).execution_options(synchronize_session=False))
+    session.commit()
+    return bool(restored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive tasks untouched this long")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    cutoff = archive_cutoff(args.days)
+    for name, shard_engine in shard_engines.items():
+        with Session(shard_engine) as session:
+            print(f"{name:<20} {archive_completed_tasks(session, cutoff)} tasks archived")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,28 +2,55 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import Optional
-from database import get_session
+from sqlalchemy import select
+from config import AUTH_CHECK_USER_EXISTS
+from database import engine, get_session
 from models import User
 from utils import verify_access_token
+from revocation import revocation_list, user_key
 import uuid
 
 security = HTTPBearer()
 
+_unauthorized_headers = {"WWW-Authenticate": "Bearer"}
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session)
-) -> User:
-    """Dependency to get the current authenticated user from JWT token."""
-    token = credentials.credentials
 
-    # Verify the token and get payload
-    payload = verify_access_token(token)
-    if payload is None:
+class Principal:
+    """The authenticated caller, as stated by a valid access token.
+
+    Routes only need the caller's id, so this small immutable object replaces
+    the ``User`` row: no password hash or relationships are loaded per request.
+    """
+
+    __slots__ = ("id", "jti", "expires_at")
+
+    def __init__(self, id: uuid.UUID, jti: Optional[str], expires_at: Optional[int]):
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "jti", jti)
+        object.__setattr__(self, "expires_at", expires_at)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Principal is immutable")
+
+    def __repr__(self) -> str:
+        return f"Principal(id={self.id!r})"
+
+
+def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Dependency to get the authenticated caller from the JWT, without loading the user row.
+
+    Tokens of deleted accounts are rejected by the in-memory revocation list.
+    With ``AUTH_CHECK_USER_EXISTS`` (the default) the user's id is looked up as
+    well, which also covers accounts deleted by another worker before its next
+    revocation sync; nothing else is read.
+    """
+    # Verify the token and get payload (revocations are checked in memory, without a query)
+    payload = verify_access_token(credentials.credentials)
+    if payload is None or revocation_list.is_revoked(payload.get("jti")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=_unauthorized_headers,
         )
 
     # Extract user ID from token
@@ -32,7 +59,7 @@ def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=_unauthorized_headers,
         )
 
     try:
@@ -41,16 +68,41 @@ def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user ID format",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=_unauthorized_headers,
         )
 
-    # Get user from database
-    user = session.get(User, user_uuid)
+    # Deleting an account revokes all of its tokens at once
+    if revocation_list.is_revoked(user_key(user_uuid)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers=_unauthorized_headers,
+        )
+
+    if AUTH_CHECK_USER_EXISTS:
+        with engine.connect() as connection:
+            exists = connection.execute(select(User.id).where(User.id == user_uuid)).first()
+        if exists is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers=_unauthorized_headers,
+            )
+
+    return Principal(user_uuid, payload.get("jti"), payload.get("exp"))
+
+
+def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    session: Session = Depends(get_session)
+) -> User:
+    """Dependency to get the full ``User`` row of the caller, for the rare route that needs it."""
+    user = session.get(User, principal.id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=_unauthorized_headers,
         )
 
-    return user
\ No newline at end of file
+    return user
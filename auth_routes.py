@@ -1,29 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from database import get_session
-from models import User, UserCreate
-from utils import get_password_hash, verify_password
-from jose import jwt
+from database import engine, get_session
+from models import User, UserCreate, RefreshRequest, LogoutRequest, RefreshToken
+from utils import get_password_hash, verify_password, create_access_token, verify_access_token
+from auth import get_current_principal
+from cascades import delete_user_cascade
+from sharding import ShardMoving, shard_moving_error, shard_router
+from tokens import token_service
+from revocation import revocation_list
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
 from datetime import datetime, timedelta
-import os
+from typing import Optional
+import hashlib
+import secrets
 import uuid
 from sqlmodel import select
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
-# Get secret key from environment
-SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-this-in-production")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+optional_security = HTTPBearer(auto_error=False)
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_tokens(session: Session, user_id: uuid.UUID, replaces: Optional[uuid.UUID] = None) -> dict:
+    """Create a short-lived access token and a new stored refresh token for ``user_id``.
+
+    ``replaces`` is the refresh token this one rotates out, which is linked to it.
+    """
+    refresh_token = secrets.token_urlsafe(32)
+    record = RefreshToken(
+        token_hash=hash_refresh_token(refresh_token),
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    session.add(record)
+    if replaces is not None:
+        session.execute(update(RefreshToken).where(RefreshToken.id == replaces).values(replaced_by=record.id))
+    session.commit()
+    return {
+        "access_token": create_access_token(data={"sub": str(user_id)}),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
 
-def create_access_token(data: dict):
-    """Create a JWT access token with expiration."""
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
 
 @router.post("/signup")
 def signup(user_data: UserCreate, session: Session = Depends(get_session)):
@@ -56,10 +82,7 @@ def signup(user_data: UserCreate, session: Session = Depends(get_session)):
             detail="Email already registered"
         )
 
-    # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
-
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_tokens(session, user.id)
 
 
 @router.post("/login")
@@ -75,13 +98,122 @@ def login(user_data: UserCreate, session: Session = Depends(get_session)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    return issue_tokens(session, user.id)
+
 
-    return {"access_token": access_token, "token_type": "bearer"}
+@router.get("/jwks")
+def jwks():
+    """Public key(s) for verifying access tokens without the signing secret.
+
+    Empty when tokens are signed with a shared secret (HS256).
+    """
+    return token_service.jwks()
+
+
+@router.post("/refresh")
+def refresh(request: RefreshRequest, session: Session = Depends(get_session)):
+    """Exchange a refresh token for a new access token and refresh token.
+
+    Refresh tokens are single-use. Presenting one that was already rotated means
+    it leaked, so every refresh token of that user is revoked. One revoked by
+    logout is merely invalid: a stale tab retrying it must not log out the
+    user's other devices.
+    """
+    now = datetime.utcnow()
+    record = session.exec(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(request.refresh_token))
+    ).first()
+    if record is None or record.expires_at <= now:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Revoke with a conditional UPDATE so two concurrent refreshes cannot both rotate it.
+    rotated = session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == record.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    ).rowcount
+    if not rotated:
+        # Only rotation links a token to its replacement; re-read it, as a
+        # concurrent refresh may have rotated the token since it was loaded.
+        replaced_by = session.execute(
+            select(RefreshToken.replaced_by).where(RefreshToken.id == record.id)
+        ).scalar_one()
+        if replaced_by is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        session.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == record.user_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+        )
+        session.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token reuse detected; please log in again",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return issue_tokens(session, record.user_id, replaces=record.id)
 
 
 @router.post("/logout")
-def logout():
-    """Logout user (client-side token removal)."""
-    return {"message": "Successfully logged out"}
\ No newline at end of file
+def logout(
+    request: Optional[LogoutRequest] = Body(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    session: Session = Depends(get_session)
+):
+    """Logout user: revoke the presented access token and refresh token, if any."""
+    if credentials is not None:
+        payload = verify_access_token(credentials.credentials)
+        if payload is not None and payload.get("jti"):
+            revocation_list.revoke(payload["jti"], payload["exp"])
+
+    if request is not None and request.refresh_token:
+        session.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == hash_refresh_token(request.refresh_token),
+                RefreshToken.revoked_at.is_(None),
+            )
+            .values(revoked_at=datetime.utcnow())
+        )
+        session.commit()
+
+    return {"message": "Successfully logged out"}
+
+
+@router.delete("/me")
+def delete_account(
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_session)
+):
+    """Delete the current user's account and everything they own.
+
+    Children are deleted set-based in the database, in bounded chunks, so
+    large accounts never have their rows loaded into memory. Every access
+    token the user holds is revoked, so none keeps working where
+    ``AUTH_CHECK_USER_EXISTS`` is off.
+    """
+    user_id = current_user.id
+    try:
+        shard_engine = shard_router.engine_for(user_id)
+    except ShardMoving:
+        raise shard_moving_error()
+    if shard_engine is not engine:
+        # The user's data lives on another shard, which also holds a copy of the user row.
+        with Session(shard_engine) as shard_session:
+            on_shard = delete_user_cascade(shard_session, user_id)
+    deleted = delete_user_cascade(session, user_id)
+    if shard_engine is not engine:
+        deleted = {kind: count + on_shard[kind] for kind, count in deleted.items()}
+        shard_router.invalidate(user_id)
+    revocation_list.revoke_user(user_id)
+
+    return {"message": "Account deleted successfully", "deleted": deleted}
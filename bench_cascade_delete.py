@@ -0,0 +1,75 @@
+"""Benchmark deleting a sub-agent that has many skills.
+
+Compares loading the skills through the ORM and deleting them one by one with
+the set-based, chunked delete in cascades.py.
+Usage: ``python bench_cascade_delete.py [--skills N] [--chunk-size N]``.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import event, insert
+from sqlmodel import Session, create_engine
+
+import migrations
+from cascades import DELETE_CHUNK_SIZE, delete_sub_agent_cascade
+from models import Skill, SubAgent, User
+
+
+def seed(engine, skills: int) -> uuid.UUID:
+    with Session(engine) as session:
+        user = User(email=f"bench_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        agent = SubAgent(name="agent", user_id=user.id)
+        session.add(agent)
+        session.commit()
+        for start in range(0, skills, 5000):
+            rows = [{"name": f"skill {i}", "sub_agent_id": agent.id} for i in range(start, min(start + 5000, skills))]
+            session.execute(insert(Skill), rows)
+        session.commit()
+        return agent.id
+
+
+def orm_delete(engine, sub_agent_id: uuid.UUID) -> None:
+    with Session(engine) as session:
+        agent = session.get(SubAgent, sub_agent_id)
+        for skill in agent.skills:
+            session.delete(skill)
+        session.delete(agent)
+        session.commit()
+
+
+def set_based_delete(engine, sub_agent_id: uuid.UUID, chunk_size: int) -> None:
+    with Session(engine) as session:
+        delete_sub_agent_cascade(session, sub_agent_id, chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skills", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=DELETE_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        # Same PRAGMA database.py sets on the app's engine.
+        event.listen(engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys=ON"))
+        migrations.upgrade(engine)
+
+        for label, run in (
+            ("ORM load + delete", lambda agent: orm_delete(engine, agent)),
+            (f"set-based, chunks of {args.chunk_size}", lambda agent: set_based_delete(engine, agent, args.chunk_size)),
+        ):
+            agent = seed(engine, args.skills)
+            started = time.perf_counter()
+            run(agent)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<32} {args.skills:>8} skills  {elapsed * 1000:9.1f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark task inserts on SQLite from concurrent clients, with and without group commit.
+
+Each of ``--clients`` threads creates ``--writes`` tasks, the way
+``create_task`` does: once with a transaction (and an fsync) per write, and
+once through ``group_commit.WriteBatcher``. Reports writes per second, and
+for group commit the mean number of writes per transaction.
+Usage: ``python bench_group_commit.py [--clients 100] [--writes 20] [--max-batch 64] [--max-delay-ms 2]``
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlmodel import Session, create_engine
+
+import migrations
+from group_commit import WriteBatcher
+from models import Task, User
+
+
+def make_engine(path: str, clients: int):
+    return create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": 60},
+        pool_size=clients,
+    )
+
+
+def insert_task(session: Session, user_id) -> Task:
+    task = Task(title="benchmark", user_id=user_id)
+    session.add(task)
+    session.flush()
+    return task
+
+
+def run(clients: int, writes: int, write) -> float:
+    """Run ``write()`` ``writes`` times from each of ``clients`` threads; returns writes per second."""
+    start = threading.Barrier(clients + 1)
+
+    def client():
+        start.wait()
+        for _ in range(writes):
+            write()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return clients * writes / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--writes", type=int, default=20, help="writes per client")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.db"), args.clients)
+        migrations.upgrade(engine)
+        with Session(engine) as session:
+            user = User(email="bench@example.com", hashed_password="x")
+            session.add(user)
+            session.commit()
+            user_id = user.id
+
+        def own_transaction():
+            with Session(engine) as session:
+                insert_task(session, user_id)
+                session.commit()
+
+        per_write = run(args.clients, args.writes, own_transaction)
+
+        batcher = WriteBatcher(max_batch=args.max_batch, max_delay=args.max_delay_ms / 1000)
+        batcher.start()
+        try:
+            grouped = run(args.clients, args.writes, lambda: batcher.submit(engine, lambda s: insert_task(s, user_id)))
+        finally:
+            batcher.stop()
+
+    print(f"{args.clients} clients x {args.writes} writes")
+    print(f"{'commit per write':<20}{per_write:>10.0f} writes/s")
+    print(f"{'group commit':<20}{grouped:>10.0f} writes/s   "
+          f"({batcher.stats.snapshot()['mean_batch']:.1f} writes per commit)")
+
+
+if __name__ == "__main__":
+    main()
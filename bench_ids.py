@@ -0,0 +1,79 @@
+"""Benchmark primary-key formats: insert throughput and index size on SQLite.
+
+Inserts the same number of task-shaped rows with each combination of UUID
+version (4 = random, 7 = time-ordered) and storage (32-character text or
+16-byte binary), then reports rows per second and the on-disk size of the
+table and its primary-key index (from SQLite's ``dbstat``).
+Usage: ``python bench_ids.py [--rows N] [--batch N]``. The default of 10M rows
+takes a while; ``--rows 1000000`` already shows the trend.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from ids import uuid7
+
+VARIANTS = [
+    ("uuid4", "text"),
+    ("uuid7", "text"),
+    ("uuid4", "binary"),
+    ("uuid7", "binary"),
+]
+
+
+def make_id(version: str, storage: str):
+    value = uuid7() if version == "uuid7" else uuid.uuid4()
+    return value.bytes if storage == "binary" else value.hex
+
+
+def run(path: str, version: str, storage: str, rows: int, batch: int) -> dict:
+    column_type = "BLOB" if storage == "binary" else "CHAR(32)"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        f"CREATE TABLE tasks (id {column_type} NOT NULL PRIMARY KEY, user_id {column_type} NOT NULL, title TEXT)"
+    )
+    user_id = make_id(version, storage)
+
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        connection.executemany(
+            "INSERT INTO tasks (id, user_id, title) VALUES (?, ?, ?)",
+            ((make_id(version, storage), user_id, "task") for _ in range(count)),
+        )
+        connection.commit()
+    elapsed = time.perf_counter() - started
+
+    sizes = dict(connection.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+    index_name = next(name for name in sizes if name.startswith("sqlite_autoindex_tasks"))
+    connection.close()
+    return {
+        "rows_per_second": rows / elapsed,
+        "table_mb": sizes["tasks"] / 1e6,
+        "index_mb": sizes[index_name] / 1e6,
+        "file_mb": os.path.getsize(path) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows per variant")
+    print(f"{'ids':<8}{'storage':<9}{'rows/s':>10}{'table MB':>11}{'pk index MB':>13}{'file MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for version, storage in VARIANTS:
+            result = run(os.path.join(tmp, f"{version}_{storage}.db"), version, storage, args.rows, args.batch)
+            print(
+                f"{version:<8}{storage:<9}{result['rows_per_second']:>10.0f}{result['table_mb']:>11.1f}"
+                f"{result['index_mb']:>13.1f}{result['file_mb']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
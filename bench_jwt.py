@@ -0,0 +1,62 @@
+"""Benchmark access-token verification throughput on a single core.
+
+Reports tokens verified per second for each algorithm TokenService supports,
+and for python-jose's ``jwt.decode`` (the previous implementation) when it is
+installed. Usage: ``python bench_jwt.py [--seconds N]``.
+"""
+import argparse
+import time
+
+from tokens import TokenService
+
+SECRET = "benchmark-secret-key"
+
+
+def asymmetric_service(algorithm: str) -> TokenService:
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+
+    key = ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+    pem = key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption())
+    return TokenService(algorithm, private_key_pem=pem)
+
+
+def rate(verify, token: str, seconds: float) -> float:
+    """Verifications per second, measured over roughly ``seconds``."""
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            verify(token)
+        count += 1000
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    claims = {"sub": "5f2b8a5e-8d4c-4f6e-9a57-0c1f0a3b7d21"}
+
+    cases = [("HS256 (TokenService)", TokenService("HS256", secret_key=SECRET))]
+    try:
+        cases += [(f"{alg} (TokenService)", asymmetric_service(alg)) for alg in ("EdDSA", "ES256")]
+    except ImportError:
+        print("cryptography is not installed; skipping EdDSA and ES256")
+
+    for label, service in cases:
+        token = service.create_token(claims)
+        print(f"{label:<24} {rate(service.decode, token, args.seconds):>12,.0f} tokens/s")
+
+    try:
+        from jose import jwt
+    except ImportError:
+        return
+    token = cases[0][1].create_token(claims)
+    decode = lambda t: jwt.decode(t, SECRET, algorithms=["HS256"])  # noqa: E731
+    print(f"{'HS256 (python-jose)':<24} {rate(decode, token, args.seconds):>12,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark cold-start latency: importing the app and preparing the schema.
+
+Each sample runs in a fresh interpreter so module caches don't hide import cost.
+Usage: ``python bench_startup.py [--runs N] [--database-url URL]``. Without a
+database URL a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from database import create_db_and_tables
+create_db_and_tables()
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def sample(database_url: str, fast_start: bool) -> tuple:
+    env = dict(os.environ, DATABASE_URL=database_url, FAST_START="1" if fast_start else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def report(label: str, samples: list) -> None:
+    imports = [s[0] * 1000 for s in samples]
+    schema = [s[1] * 1000 for s in samples]
+    total = [i + s for i, s in zip(imports, schema)]
+    print(
+        f"{label:<12} import {statistics.median(imports):7.1f} ms   "
+        f"schema {statistics.median(schema):7.1f} ms   "
+        f"total {statistics.median(total):7.1f} ms   (median of {len(samples)})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # Warm-up run creates and stamps the schema so both modes start from the same state.
+        sample(database_url, fast_start=False)
+        for label, fast_start in (("create_all", False), ("fast-start", True)):
+            report(label, [sample(database_url, fast_start) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sharding import get_shard_session
+from models import BootstrapRead, Skill, SkillRead, SubAgent, SubAgentRead, SubAgentSummary, Task, TaskRead
+from auth import get_current_principal
+from streaming import iter_json_array, iter_rows
+from conditional import is_not_modified, list_etag, not_modified
+from typing import Optional
+from sqlmodel import select
+import json
+
+router = APIRouter(prefix="/api/bootstrap", tags=["Bootstrap"])
+
+
+def workspace_statements(user_id):
+    return {
+        "tasks": (select(Task).where(Task.user_id == user_id).order_by(Task.position, Task.id), Task),
+        "sub_agents": (select(SubAgent).where(SubAgent.user_id == user_id), SubAgent),
+        "skills": (
+            select(Skill).join(SubAgent).where(SubAgent.user_id == user_id)
+            .order_by(Skill.sub_agent_id, Skill.position, Skill.id),
+            Skill,
+        ),
+    }
+
+
+def summarize(sub_agents, skill_counts):
+    for sub_agent in sub_agents:
+        summary = SubAgentRead.model_validate(sub_agent, from_attributes=True).model_dump()
+        yield SubAgentSummary(**summary, skill_count=skill_counts.get(sub_agent.id, 0))
+
+
+def iter_workspace(sections):
+    """Serialize ``{name: rows}`` sections as one JSON object, each array streamed batch by batch."""
+    yield b"{"
+    for index, (name, rows, schema) in enumerate(sections):
+        yield (b"," if index else b"") + json.dumps(name).encode() + b":"
+        yield from iter_json_array(rows, schema)
+    yield b"}"
+
+
+@router.get("", response_model=BootstrapRead)
+def get_bootstrap(
+    response: Response,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Get the current user's tasks, sub-agents (with skill counts) and skills in one response.
+
+    Replaces the three list calls a client makes on start: one authentication,
+    one session and a handful of set-based queries. The ``ETag`` covers all
+    three lists; sending it back in ``If-None-Match`` gets a 304 when nothing
+    changed, from a single aggregate query.
+
+    With ``stream=true`` the same JSON object is streamed straight from the
+    database cursors instead of being built in memory first.
+    """
+    statements = workspace_statements(current_user.id)
+    tag = list_etag(session, *statements["tasks"], statements["sub_agents"], statements["skills"])
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+
+    skill_counts = dict(session.execute(
+        select(Skill.sub_agent_id, func.count(Skill.id))
+        .join(SubAgent)
+        .where(SubAgent.user_id == current_user.id)
+        .group_by(Skill.sub_agent_id)
+    ).all())
+
+    if stream:
+        sections = [
+            ("tasks", iter_rows(session, statements["tasks"][0]), TaskRead),
+            ("sub_agents", summarize(iter_rows(session, statements["sub_agents"][0]), skill_counts), SubAgentSummary),
+            ("skills", iter_rows(session, statements["skills"][0]), SkillRead),
+        ]
+        streamed = StreamingResponse(iter_workspace(sections), media_type="application/json")
+        streamed.headers["ETag"] = tag
+        return streamed
+
+    response.headers["ETag"] = tag
+    rows = {name: session.execute(statement).scalars().all() for name, (statement, _) in statements.items()}
+    return {
+        "tasks": rows["tasks"],
+        "sub_agents": list(summarize(rows["sub_agents"], skill_counts)),
+        "skills": rows["skills"],
+    }
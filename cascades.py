@@ -0,0 +1,62 @@
+"""Set-based, chunked deletes of sub-agents and users together with their children.
+
+Children are deleted with ``DELETE ... WHERE id IN (SELECT id ... LIMIT n)``
+statements that run entirely in the database, one short transaction per
+chunk, so no child row is ever loaded into Python and no single transaction
+holds its locks for long. The parent row goes last; the foreign keys'
+``ON DELETE CASCADE`` catches any child inserted concurrently in between.
+"""
+from typing import Callable, Optional
+import uuid
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from models import ArchivedTask, Job, Skill, SubAgent, Task, User
+
+DELETE_CHUNK_SIZE = 1000
+
+ProgressCallback = Optional[Callable[[int], None]]
+
+
+def delete_in_chunks(session: Session, model, condition, chunk_size: int = DELETE_CHUNK_SIZE,
+                     on_progress: ProgressCallback = None) -> int:
+    """Delete every ``model`` row matching ``condition``, committing after each chunk."""
+    deleted = 0
+    while True:
+        chunk = select(model.id).where(condition).limit(chunk_size).scalar_subquery()
+        count = session.execute(
+            delete(model).where(model.id.in_(chunk)).execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+        deleted += count
+        if on_progress and count:
+            on_progress(deleted)
+        if count < chunk_size:
+            return deleted
+
+
+def delete_sub_agent_cascade(session: Session, sub_agent_id: uuid.UUID, chunk_size: int = DELETE_CHUNK_SIZE,
+                             on_progress: ProgressCallback = None) -> int:
+    """Delete a sub-agent and all of its skills. Returns the number of skills deleted."""
+    skills = delete_in_chunks(session, Skill, Skill.sub_agent_id == sub_agent_id, chunk_size, on_progress)
+    session.execute(
+        delete(SubAgent).where(SubAgent.id == sub_agent_id).execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return skills
+
+
+def delete_user_cascade(session: Session, user_id: uuid.UUID, chunk_size: int = DELETE_CHUNK_SIZE) -> dict:
+    """Delete a user's skills, sub-agents, tasks and jobs, then the user. Returns counts per type."""
+    user_sub_agents = select(SubAgent.id).where(SubAgent.user_id == user_id)
+    counts = {
+        "skills": delete_in_chunks(session, Skill, Skill.sub_agent_id.in_(user_sub_agents), chunk_size),
+        "sub_agents": delete_in_chunks(session, SubAgent, SubAgent.user_id == user_id, chunk_size),
+        "tasks": delete_in_chunks(session, Task, Task.user_id == user_id, chunk_size),
+        "archived_tasks": delete_in_chunks(session, ArchivedTask, ArchivedTask.user_id == user_id, chunk_size),
+        "jobs": delete_in_chunks(session, Job, Job.user_id == user_id, chunk_size),
+    }
+    session.execute(delete(User).where(User.id == user_id).execution_options(synchronize_session=False))
+    session.commit()
+    return counts
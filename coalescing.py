@@ -0,0 +1,132 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+Bursts of the same ``GET`` (several tabs, a client retry loop) would each run
+their own queries and serialize the same JSON. ``CoalescingMiddleware`` lets
+the first request of a burst run; identical requests that arrive while it is
+in flight wait for it and are sent a copy of its response.
+
+Requests are identical when they have the same path, the same query
+parameters (in any order) and the same ``Authorization`` and ``If-None-Match``
+headers. Keying on the
+credentials rather than the user means a revoked or expired token never shares
+a response that another token was allowed to see. Only complete, non-streamed
+responses (those with a ``Content-Length``) are shared; if the leader's response
+can't be shared, each waiting request runs on its own.
+
+A write (any non-GET request) detaches the in-flight reads made with the same
+credentials once it completes, so a read sent after a write never joins a
+read that started before it.
+"""
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+# GET paths whose responses may be shared between identical concurrent requests
+COALESCED_PATHS = ("/api/tasks/", "/api/skills/", "/api/sub-agents/", "/api/bootstrap")
+
+SharedResponse = Tuple[int, list, bytes]
+
+
+@dataclass
+class CoalescingStats:
+    leaders: int = 0  # requests that ran the endpoint for a burst
+    coalesced: int = 0  # requests answered with a leader's response
+    fallbacks: int = 0  # waiters that had to run themselves (leader's response wasn't shareable)
+
+    def snapshot(self) -> dict:
+        return asdict(self)
+
+
+coalescing_stats = CoalescingStats()
+
+
+class CoalescingMiddleware:
+    """ASGI middleware sharing one in-flight response between identical GETs.
+
+    Add it inside the compression middleware, so one uncompressed body can be
+    shared by clients that negotiate different encodings.
+    """
+
+    def __init__(self, app, paths=COALESCED_PATHS, stats: CoalescingStats = coalescing_stats):
+        self.app = app
+        self.paths = set(paths)
+        self.stats = stats
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] not in ("GET", "HEAD", "OPTIONS"):
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self._detach(self._authorization(scope))
+            return
+        if scope["method"] != "GET" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        leader = self._in_flight.get(key)
+        if leader is not None:
+            shared = await asyncio.shield(leader)
+            if shared is not None:
+                self.stats.coalesced += 1
+                await self._replay(shared, send)
+                return
+            self.stats.fallbacks += 1
+            await self.app(scope, receive, send)
+            return
+
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        self.stats.leaders += 1
+        shared: Optional[SharedResponse] = None
+        try:
+            shared = await self._run(scope, receive, send)
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            future.set_result(shared)
+
+    @staticmethod
+    def _authorization(scope) -> bytes:
+        return next((v for k, v in scope["headers"] if k == b"authorization"), b"")
+
+    def _key(self, scope) -> tuple:
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)))
+        if_none_match = next((v for k, v in scope["headers"] if k == b"if-none-match"), b"")
+        return self._authorization(scope), scope["path"], query, if_none_match
+
+    def _detach(self, authorization: bytes) -> None:
+        """Stop new requests from joining reads made with ``authorization``."""
+        for key in [key for key in self._in_flight if key[0] == authorization]:
+            del self._in_flight[key]
+
+    async def _run(self, scope, receive, send) -> Optional[SharedResponse]:
+        """Run the request, returning its response if it can be shared."""
+        start, chunks, complete = None, [], False
+
+        async def capture_send(message):
+            nonlocal start, complete
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                complete = not message.get("more_body", False)
+            await send(message)
+
+        await self.app(scope, receive, capture_send)
+        if start is None or not complete:
+            return None
+        headers = list(start.get("headers", ()))
+        if not any(name == b"content-length" for name, _ in headers):
+            return None
+        return start["status"], headers, b"".join(chunks)
+
+    @staticmethod
+    async def _replay(shared: SharedResponse, send) -> None:
+        status_code, headers, body = shared
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
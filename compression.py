@@ -0,0 +1,85 @@
+"""Response compression negotiated from ``Accept-Encoding`` (brotli or gzip).
+
+Built on Starlette's responder classes, so streamed responses are compressed
+chunk by chunk and bodies under the minimum size are sent as-is. Brotli is used
+only when the ``brotli`` package is installed.
+"""
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+
+from config import BROTLI_QUALITY, COMPRESSION_ENCODINGS, COMPRESSION_MINIMUM_SIZE, GZIP_LEVEL
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Bodies at least this large are compressed in a worker thread instead of on the event loop.
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        if more_body:
+            # Flush so each streamed chunk reaches the client without waiting for the next one.
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+def parse_accept_encoding(value: str) -> set:
+    """Return the encodings the client accepts (those not explicitly given ``q=0``)."""
+    accepted = set()
+    for item in value.split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """Compress responses with the first of ``encodings`` the client accepts."""
+
+    def __init__(
+        self,
+        app,
+        encodings=COMPRESSION_ENCODINGS,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.encodings = [e for e in encodings if e == "gzip" or (e == "br" and brotli is not None)]
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = parse_accept_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = next((e for e in self.encodings if e in accepted), None)
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = self.app
+        await responder(scope, receive, send)
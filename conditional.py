@@ -0,0 +1,123 @@
+"""Optimistic concurrency for tasks, sub-agents and skills.
+
+Every row carries a ``version`` that is bumped on each update and exposed as
+the ``ETag``. A client that sends ``If-Match`` with the version it last read
+gets its update applied only if nobody changed the row in between: the check
+and the write are one compare-and-swap ``UPDATE ... WHERE version = :expected``,
+so no row lock is held across the request. A lost race answers 412.
+
+Reads are conditional too: a single resource answers ``If-None-Match`` with
+304 when its version is unchanged, and list endpoints return a validator
+built from one aggregate query (row count, sum of versions, latest
+``updated_at``), so a client polling an unchanged list gets a 304 without any
+rows being loaded or serialized.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import func, select, true, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def is_not_modified(if_none_match: Optional[str], current: str) -> bool:
+    """True if the client's ``If-None-Match`` already names ``current``."""
+    if not if_none_match:
+        return False
+    current = current[2:] if current.startswith("W/") else current
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == current:
+            return True
+    return False
+
+
+def not_modified(current: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": current})
+
+
+def list_etag(session: Session, statement: Select, model, *more) -> str:
+    """Weak ETag for the rows ``statement`` selects, from a single aggregate query.
+
+    Inserts and deletes change the count, and every update bumps a version and
+    ``updated_at``. Further ``(statement, model)`` pairs in ``more`` are covered
+    by the same ETag and the same query.
+    """
+    aggregates = [
+        query.with_only_columns(
+            func.count(table.id), func.coalesce(func.sum(table.version), 0), func.max(table.updated_at)
+        ).order_by(None).subquery()
+        for query, table in [(statement, model), *more]
+    ]
+    joined = aggregates[0]
+    for aggregate in aggregates[1:]:
+        joined = joined.join(aggregate, true())
+    columns = [column for aggregate in aggregates for column in aggregate.c]
+    row = session.execute(select(*columns).select_from(joined)).one()
+
+    parts = []
+    for index in range(0, len(row), 3):
+        count, versions, latest = row[index:index + 3]
+        parts.append(f"{count}-{versions}-{latest.isoformat() if latest is not None else '-'}")
+    return 'W/"' + "+".join(parts) + '"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """The version named by an ``If-Match`` header, or None when any version is acceptable."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.split(",")[0].strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match must be an ETag returned by this API"
+        )
+
+
+def precondition_failed(current_version: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="The resource was modified by another request",
+        headers={"ETag": etag(current_version)},
+    )
+
+
+def update_versioned(session: Session, row, values: dict, if_match: Optional[str], response: Response,
+                     commit: bool = True):
+    """Apply ``values`` to ``row`` and bump its version, honouring ``If-Match``.
+
+    Raises 412 if the row's version no longer matches. Returns the refreshed row
+    and sets its ETag on ``response``. With ``commit=False`` the caller commits
+    (e.g. as part of a group commit).
+    """
+    model = type(row)
+    expected = parse_if_match(if_match)
+    if expected is not None and row.version != expected:
+        raise precondition_failed(row.version)
+
+    statement = update(model).where(model.id == row.id)
+    if expected is not None:
+        statement = statement.where(model.version == expected)
+    updated = session.execute(
+        statement.values(**values, version=model.version + 1).execution_options(synchronize_session=False)
+    ).rowcount
+    if commit:
+        session.commit()
+
+    if not updated:
+        current_version = session.execute(select(model.version).where(model.id == row.id)).scalar()
+        if current_version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resource was deleted")
+        raise precondition_failed(current_version)
+
+    session.refresh(row)
+    response.headers["ETag"] = etag(row.version)
+    return row
@@ -0,0 +1,100 @@
+"""Application settings, read from the environment (and ``.env``) exactly once."""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean environment variable ("1", "true", "yes" and "on" are truthy)."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Database
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./task_management.db")
+
+# JWT settings
+SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-this-in-production")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Look up the user's id on every request. Deleted accounts' tokens are revoked either
+# way, but other workers only learn of that on their next revocation sync
+AUTH_CHECK_USER_EXISTS = env_flag("AUTH_CHECK_USER_EXISTS", True)
+# How often each process pulls revocations made by other workers
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+
+# Primary keys: UUID version for new rows (7 = time-ordered, 4 = random), and how
+# they are stored on SQLite ("text" = 32 hex chars, "binary" = 16 bytes; see convert_ids.py)
+ID_VERSION = int(os.getenv("ID_VERSION", "7"))
+ID_STORAGE = os.getenv("ID_STORAGE", "text")
+
+# Sharding: user-owned rows (tasks, sub-agents, skills) live on these databases,
+# given as "name=url,name=url"; empty keeps everything in DATABASE_URL
+SHARDS = dict(
+    part.strip().split("=", 1) for part in os.getenv("SHARDS", "").split(",") if part.strip()
+)
+SHARD_MAP_CACHE_SECONDS = float(os.getenv("SHARD_MAP_CACHE_SECONDS", "5"))
+
+# Archiving: completed tasks untouched for this many days move to archived_tasks
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "1000"))
+
+# Manual ordering: rebalance a list once a moved row's position key gets this long
+POSITION_REBALANCE_LENGTH = int(os.getenv("POSITION_REBALANCE_LENGTH", "32"))
+
+# Startup: trust the stored schema version instead of running create_all
+FAST_START = env_flag("FAST_START")
+
+# Rate limiting ("<requests>/<second|minute|hour>"; the count is also the burst size)
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" or "database"
+AUTH_RATE_LIMIT = os.getenv("AUTH_RATE_LIMIT", "30/minute")
+READ_RATE_LIMIT = os.getenv("READ_RATE_LIMIT", "600/minute")
+WRITE_RATE_LIMIT = os.getenv("WRITE_RATE_LIMIT", "300/minute")
+MAX_CONCURRENT_REQUESTS_PER_USER = int(os.getenv("MAX_CONCURRENT_REQUESTS_PER_USER", "16"))
+
+# Admission control: adaptive concurrency limits and load shedding (see admission.py)
+ADMISSION_CONTROL_ENABLED = env_flag("ADMISSION_CONTROL_ENABLED", True)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "40"))  # the threadpool's size
+ADMISSION_AUTH_MAX_CONCURRENCY = int(os.getenv("ADMISSION_AUTH_MAX_CONCURRENCY", "8"))
+ADMISSION_TARGET_DELAY_MS = float(os.getenv("ADMISSION_TARGET_DELAY_MS", "5"))
+ADMISSION_INTERVAL_MS = float(os.getenv("ADMISSION_INTERVAL_MS", "100"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+ADMISSION_LATENCY_TOLERANCE = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+
+# Memory profiling endpoints under /api/admin/memory (see memory_profiling.py);
+# only registered when enabled, and every call needs the X-Admin-Token header
+MEMORY_PROFILING_ENABLED = env_flag("MEMORY_PROFILING_ENABLED")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+
+# Idempotency-Key replay for create endpoints
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")  # "memory" or "database"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+# Response compression and streaming
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",") if e.strip()]
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+# Group commit: batch concurrent task writes into shared transactions (see group_commit.py)
+GROUP_COMMIT_ENABLED = env_flag("GROUP_COMMIT_ENABLED")
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "2"))
+
+# Background jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+ASYNC_DELETE_THRESHOLD = int(os.getenv("ASYNC_DELETE_THRESHOLD", "1000"))
+IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR") or None
+
+# Asymmetric JWT keys (PEM files), used when ALGORITHM is EdDSA or ES256
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE") or None
+JWT_PUBLIC_KEY_FILE = os.getenv("JWT_PUBLIC_KEY_FILE") or None
@@ -0,0 +1,46 @@
+"""Shared fixtures for the API tests."""
+import itertools
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+_addresses = itertools.count(1)
+
+
+@pytest.fixture
+def client():
+    """A client for the app (startup and shutdown included).
+
+    Each test gets its own client address, so per-IP rate limits on signup and
+    login never carry over from one test to the next.
+    """
+    n = next(_addresses)
+    with TestClient(app, client=(f"10.1.{n // 250}.{n % 250 + 1}", 50000)) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def signup():
+    """``signup(client, email=None)`` registers a new user and returns the token response."""
+    def signup(client, email=None):
+        email = email or f"user_{uuid.uuid4().hex[:12]}@example.com"
+        response = client.post("/api/auth/signup", json={"email": email, "password": "secure123"})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return signup
+
+
+@pytest.fixture(scope="session")
+def user_headers(signup):
+    """``user_headers(client)`` registers a new user and returns their ``Authorization`` header."""
+    def user_headers(client):
+        return {"Authorization": f"Bearer {signup(client)['access_token']}"}
+    return user_headers
+
+
+@pytest.fixture
+def auth_headers(client, user_headers):
+    return user_headers(client)
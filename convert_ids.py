@@ -0,0 +1,107 @@
+"""Convert the id columns of an existing SQLite database between text and binary storage.
+
+Run it once, with the app stopped, before switching ``ID_STORAGE``:
+``python convert_ids.py --to binary [--vacuum]``. Every id and foreign-key
+column is rewritten in place, in one transaction, and the foreign keys are
+checked before it commits. Values already in the target format are left
+alone, so an interrupted run can simply be repeated. Id values themselves do
+not change (existing rows keep their random ids; new rows get time-ordered
+ones). PostgreSQL stores UUIDs natively and needs no conversion.
+"""
+import argparse
+import uuid
+
+from sqlalchemy import Uuid, create_engine, text
+from sqlmodel import SQLModel
+
+import models  # noqa: F401 - registers the tables
+from config import DATABASE_URL
+from ids import BinaryUUID
+
+CHUNK_SIZE = 5000
+
+
+def id_columns():
+    """``{table: [column, ...]}`` for every UUID column in the schema."""
+    columns = {}
+    for table in SQLModel.metadata.sorted_tables:
+        names = [c.name for c in table.columns if isinstance(c.type, (Uuid, BinaryUUID))]
+        if names:
+            columns[table.name] = names
+    return columns
+
+
+def to_binary(value):
+    return uuid.UUID(hex=value).bytes if isinstance(value, str) else value
+
+
+def to_text(value):
+    return uuid.UUID(bytes=bytes(value)).hex if isinstance(value, (bytes, memoryview)) else value
+
+
+def convert(engine, target: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Rewrite all id columns to ``target`` ("binary" or "text"); returns rows changed per table."""
+    transform = to_binary if target == "binary" else to_text
+    changed = {}
+    with engine.connect() as connection:
+        # Parents and children change in the same transaction; check the keys once at the end.
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.commit()
+        with connection.begin():
+            present = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='table'")}
+            for table, columns in id_columns().items():
+                if table not in present:
+                    continue
+                changed[table] = convert_table(connection, table, columns, transform, chunk_size)
+            violations = connection.exec_driver_sql("PRAGMA foreign_key_check").fetchall()
+            if violations:
+                raise RuntimeError(f"Foreign key check failed after conversion: {violations[:10]}")
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+        connection.commit()
+    return changed
+
+
+def convert_table(connection, table: str, columns, transform, chunk_size: int) -> int:
+    column_list = ", ".join(columns)
+    assignments = ", ".join(f"{column} = :{column}" for column in columns)
+    changed, last_rowid = 0, 0
+    while True:
+        rows = connection.execute(
+            text(f"SELECT rowid, {column_list} FROM {table} WHERE rowid > :last ORDER BY rowid LIMIT :limit"),
+            {"last": last_rowid, "limit": chunk_size},
+        ).fetchall()
+        if not rows:
+            return changed
+        updates = []
+        for rowid, *values in rows:
+            converted = [transform(value) for value in values]
+            if converted != list(values):
+                updates.append({"rowid": rowid, **dict(zip(columns, converted))})
+        if updates:
+            connection.execute(text(f"UPDATE {table} SET {assignments} WHERE rowid = :rowid"), updates)
+            changed += len(updates)
+        last_rowid = rows[-1][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--to", choices=["binary", "text"], required=True)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--vacuum", action="store_true", help="rebuild the file afterwards to reclaim space")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name != "sqlite":
+        print(f"{engine.dialect.name} stores UUIDs natively; nothing to convert.")
+        return
+
+    for table, count in convert(engine, args.to).items():
+        print(f"{table:<20} {count} rows converted")
+    if args.vacuum:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+    print(f"Done. Start the app with ID_STORAGE={args.to}.")
+
+
+if __name__ == "__main__":
+    main()
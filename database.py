@@ -1,26 +1,61 @@
+from sqlalchemy import event
 from sqlmodel import create_engine, Session
-import os
-from dotenv import load_dotenv
+from config import DATABASE_URL, FAST_START, SHARDS
 from models import User, Task  # Import all models to register them
+import migrations
 
-load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./task_management.db")
+def enable_sqlite_foreign_keys(engine):
+    """SQLite ignores foreign keys (and so ON DELETE CASCADE) unless each connection opts in."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_foreign_keys_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def make_engine(url: str):
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if url.startswith("sqlite") else {},
+    )
+    enable_sqlite_foreign_keys(engine)
+    return engine
+
 
 # For testing with in-memory database, use: sqlite:///:memory:
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+engine = make_engine(DATABASE_URL)
+
+# Databases holding users' tasks, sub-agents and skills (see sharding.py). Without
+# SHARDS configured the main database is the only shard.
+shard_engines = {
+    name: engine if url == DATABASE_URL else make_engine(url) for name, url in SHARDS.items()
+} or {"main": engine}
+
+# Set once the schema has been prepared in this process. Workers forked from a
+# preloading master inherit it, so they skip the startup schema check.
+_schema_ready = False
 
 
 def create_db_and_tables():
-    """Create database tables if they don't exist."""
-    from sqlmodel import SQLModel
-    SQLModel.metadata.create_all(engine)
+    """Create database tables if they don't exist and apply pending migrations.
+
+    In fast-start mode the stored schema version is checked first and the
+    (expensive) table reflection is skipped entirely when it is current.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    for database in {engine, *shard_engines.values()}:
+        if not (FAST_START and migrations.is_schema_current(database)):
+            migrations.upgrade(database)
+    _schema_ready = True
 
 
 def get_session():
     """Dependency to get database session."""
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sharding import get_shard_session
+from models import ArchivedTask, Task, TaskRead, SubAgent, SubAgentRead, Skill, SkillRead
+from auth import get_current_principal
+from streaming import iter_rows
+from config import STREAM_BATCH_SIZE
+from sqlmodel import select
+import csv
+import io
+import json
+
+router = APIRouter(prefix="/api/export", tags=["Export"])
+
+# Record types in export order: sub-agents come before the skills that reference them.
+RECORD_SCHEMAS = {
+    "task": TaskRead,
+    "sub_agent": SubAgentRead,
+    "skill": SkillRead,
+}
+
+CSV_COLUMNS = [
+    "type", "id", "user_id", "sub_agent_id", "title", "name",
+    "description", "completed", "position", "version", "created_at", "updated_at",
+]
+
+
+def iter_records(session: Session, user_id):
+    """Yield ``(type, record dict)`` for every task, sub-agent and skill the user owns.
+
+    Tasks and skills come in their manual order, as the list endpoints return
+    them, so importing the export (which appends in file order) keeps it.
+    """
+    statements = [
+        ("task", select(Task).where(Task.user_id == user_id).order_by(Task.position, Task.id)),
+        ("task", select(ArchivedTask).where(ArchivedTask.user_id == user_id)
+            .order_by(ArchivedTask.position, ArchivedTask.id)),
+        ("sub_agent", select(SubAgent).where(SubAgent.user_id == user_id)),
+        ("skill", select(Skill).join(SubAgent).where(SubAgent.user_id == user_id)
+            .order_by(Skill.sub_agent_id, Skill.position, Skill.id)),
+    ]
+    for record_type, statement in statements:
+        schema = RECORD_SCHEMAS[record_type]
+        for row in iter_rows(session, statement):
+            yield record_type, schema.model_validate(row, from_attributes=True).model_dump(mode="json")
+
+
+def iter_ndjson(records):
+    lines = []
+    for record_type, record in records:
+        lines.append(json.dumps({"type": record_type, **record}))
+        if len(lines) == STREAM_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for count, (record_type, record) in enumerate(records, 1):
+        writer.writerow({"type": record_type, **record})
+        if count % STREAM_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+    "csv": (iter_csv, "text/csv"),
+}
+
+
+@router.get("")
+def export_data(
+    format: str = "ndjson",
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Stream all of the current user's tasks, sub-agents and skills as NDJSON or CSV.
+
+    Rows are read from server-side cursors and written out batch by batch, so
+    memory use stays flat however much data the user has.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="format must be one of: " + ", ".join(EXPORT_FORMATS)
+        )
+
+    serializer, media_type = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        serializer(iter_records(session, current_user.id)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="export.{format}"'},
+    )
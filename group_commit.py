@@ -0,0 +1,167 @@
+"""Group commit: apply concurrent writes in shared transactions.
+
+On SQLite every commit is an fsync and writers queue for a single lock, so
+one transaction per request caps write throughput at the disk's sync rate.
+With ``GROUP_COMMIT_ENABLED`` the hot write endpoints hand their work to
+``write_batcher`` instead. A single writer thread collects the operations
+queued by concurrent requests - up to ``GROUP_COMMIT_MAX_BATCH`` of them, or
+whatever arrived within ``GROUP_COMMIT_MAX_DELAY_MS`` of the first - runs them
+in one transaction and commits once, then hands each request its own result.
+
+Operations must not commit, and may raise ``HTTPException`` (a 404, a 412)
+only before they write anything; that exception goes to their own request
+and the rest of the batch commits. Any other error rolls the batch back and
+it is run again with each operation in a savepoint (savepoints cost more
+than the writes themselves, so they are only used when needed), which
+isolates the failing operation. If the commit itself fails, every request in
+the batch gets the error.
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from config import GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_DELAY_MS
+
+T = TypeVar("T")
+Operation = Callable[[Session], T]
+
+
+@dataclass
+class BatchStats:
+    batches: int = 0
+    writes: int = 0
+    retried: int = 0  # batches rerun with savepoints after an operation failed
+    failed_commits: int = 0
+
+    def snapshot(self) -> dict:
+        return {**asdict(self), "mean_batch": self.writes / self.batches if self.batches else 0.0}
+
+
+class WriteBatcher:
+    def __init__(self, max_batch: int = GROUP_COMMIT_MAX_BATCH, max_delay: float = GROUP_COMMIT_MAX_DELAY_MS / 1000):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = BatchStats()
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Apply what is already queued, then stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, engine: Engine, operation: Operation) -> T:
+        """Run ``operation(session)`` in the next batch for ``engine`` and return its result.
+
+        Blocks until the batch has committed. Without a running writer the
+        operation gets a transaction of its own.
+        """
+        if self._thread is None:
+            with Session(engine, expire_on_commit=False) as session:
+                result = operation(session)
+                session.commit()
+                return result
+        future: Future = Future()
+        self._queue.put((engine, operation, future))
+        return future.result()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, stopping = [item], False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._apply(batch)
+            if stopping:
+                return
+
+    def _apply(self, batch) -> None:
+        by_engine = defaultdict(list)
+        for engine, operation, future in batch:
+            by_engine[engine].append((operation, future))
+
+        for engine, writes in by_engine.items():
+            try:
+                try:
+                    outcomes = self._execute(engine, writes, isolate=False)
+                except Exception:
+                    # Something failed mid-write: redo the batch with each operation in a savepoint.
+                    self.stats.retried += 1
+                    outcomes = self._execute(engine, writes, isolate=True)
+            except Exception as exc:
+                self.stats.failed_commits += 1
+                for _, future in writes:
+                    future.set_exception(exc)
+                continue
+
+            self.stats.batches += 1
+            self.stats.writes += len(writes)
+            for future, result, exc in outcomes:
+                if exc is not None:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+
+    @staticmethod
+    def _execute(engine: Engine, writes, isolate: bool) -> list:
+        """Run ``writes`` in one transaction and commit; returns ``(future, result, exception)`` triples."""
+        outcomes = []
+        with Session(engine, expire_on_commit=False) as session:
+            for operation, future in writes:
+                try:
+                    if isolate:
+                        with session.begin_nested():
+                            result = operation(session)
+                    else:
+                        result = operation(session)
+                except HTTPException as exc:
+                    outcomes.append((future, None, exc))  # raised before anything was written
+                except Exception as exc:
+                    if not isolate:
+                        raise
+                    outcomes.append((future, None, exc))
+                else:
+                    outcomes.append((future, result, None))
+            session.commit()
+        return outcomes
+
+
+write_batcher = WriteBatcher()
+
+
+def run_write(session: Session, operation: Operation) -> T:
+    """Run ``operation`` in the next group commit if batching is on, else in ``session`` and commit."""
+    if write_batcher.running:
+        return write_batcher.submit(session.get_bind(), operation)
+    result = operation(session)
+    session.commit()
+    return result
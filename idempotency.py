@@ -0,0 +1,289 @@
+"""``Idempotency-Key`` support for create endpoints.
+
+A client that retries ``POST /api/tasks/`` (or another create endpoint) with
+the same ``Idempotency-Key`` header gets the stored response of the first
+attempt instead of a second row. Keys are scoped to the user and path, and the
+request body is fingerprinted: reusing a key for a different body is a 422.
+
+While the first request is still running, duplicates wait for it and replay
+its response, so concurrent retries run the endpoint once. Duplicates in the
+same process wait on an event; with the database store, duplicates in other
+worker processes poll the row. Only responses below 500 are stored, so a
+failed attempt can be retried. Stored responses expire after
+``IDEMPOTENCY_TTL_SECONDS``.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_WAIT_SECONDS
+from models import IdempotencyKey
+from rate_limit import user_id_from_scope
+
+# (method, path) pairs that honour Idempotency-Key
+IDEMPOTENT_ROUTES = (
+    ("POST", "/api/tasks/"),
+    ("POST", "/api/sub-agents/"),
+    ("POST", "/api/skills/"),
+)
+MAX_KEY_LENGTH = 255
+# An in-progress claim is abandoned (e.g. its worker died) after this long.
+CLAIM_SECONDS = 60.0
+
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    status_code: Optional[int] = None  # None while in progress
+    headers: Optional[List[Tuple[str, str]]] = None
+    body: bytes = b""
+    expires_at: float = 0.0
+
+
+class InMemoryStore:
+    """Stored responses in an insertion-ordered dict with TTL and size bounds."""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def begin(self, key: str, fingerprint: str, now: Optional[float] = None) -> Optional[StoredResponse]:
+        """Claim ``key`` and return None, or return the entry of whoever holds it."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                return entry
+            self._entries[key] = StoredResponse(fingerprint, expires_at=now + CLAIM_SECONDS)
+            self._entries.move_to_end(key)
+            return None
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        entry = self._entries.get(key)
+        return entry if entry is not None and entry.expires_at > time.time() else None
+
+    def complete(self, key: str, status_code: int, headers: List[Tuple[str, str]], body: bytes) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.status_code, entry.headers, entry.body = status_code, headers, body
+            entry.expires_at = time.time() + self.ttl
+            self._entries.move_to_end(key)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _evict(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry.expires_at > now and len(entries) <= self.max_entries:
+                break
+            del entries[key]
+
+
+class DatabaseStore:
+    """Stored responses in the ``idempotency_keys`` table, shared by all workers.
+
+    The claim is an INSERT on the key's primary key, so exactly one worker wins it.
+    """
+
+    def __init__(self, engine: Engine, ttl: float = IDEMPOTENCY_TTL_SECONDS, cleanup_every: int = 1000):
+        self.engine = engine
+        self.ttl = ttl
+        self.cleanup_every = cleanup_every
+        self._calls = 0
+
+    def begin(self, key: str, fingerprint: str, now: Optional[float] = None) -> Optional[StoredResponse]:
+        now = time.time() if now is None else now
+        with self.engine.begin() as connection:
+            self._calls += 1
+            expired = IdempotencyKey.expires_at <= now
+            if self._calls % self.cleanup_every != 0:
+                expired = expired & (IdempotencyKey.key == key)
+            connection.execute(delete(IdempotencyKey).where(expired))
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    insert(IdempotencyKey).values(key=key, fingerprint=fingerprint, expires_at=now + CLAIM_SECONDS)
+                )
+            return None
+        except IntegrityError:
+            entry = self.get(key)
+            # The holder released it in between; try to claim it again.
+            return entry if entry is not None else self.begin(key, fingerprint, now)
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at > time.time())
+            ).first()
+        if row is None:
+            return None
+        headers = [tuple(header) for header in row.headers] if row.headers is not None else None
+        return StoredResponse(row.fingerprint, row.status_code, headers, row.body or b"", row.expires_at)
+
+    def complete(self, key: str, status_code: int, headers: List[Tuple[str, str]], body: bytes) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                update(IdempotencyKey).where(IdempotencyKey.key == key).values(
+                    status_code=status_code, headers=[list(h) for h in headers], body=body,
+                    expires_at=time.time() + self.ttl,
+                )
+            )
+
+    def release(self, key: str) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware that stores and replays responses by ``Idempotency-Key``.
+
+    Add it inside the compression middleware, so stored bodies are uncompressed.
+    """
+
+    def __init__(self, app, store=None, routes=IDEMPOTENT_ROUTES,
+                 wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS, poll_interval: float = 0.05):
+        self.app = app
+        self.store = store if store is not None else InMemoryStore()
+        self.routes = set(routes)
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+        self._running: Dict[str, asyncio.Event] = {}
+        # Only the in-memory store is cheap enough to call on the event loop.
+        self._blocking_store = not isinstance(self.store, InMemoryStore)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = next((v for k, v in scope["headers"] if k == b"idempotency-key"), None)
+        user_id = user_id_from_scope(scope) if idempotency_key is not None else None
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._error(send, 400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+            return
+
+        body = await self._read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        key = hashlib.sha256(
+            b"\0".join([user_id.encode(), scope["method"].encode(), scope["path"].encode(), idempotency_key])
+        ).hexdigest()
+
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            entry = await self._call(self.store.begin, key, fingerprint)
+            if entry is None:
+                await self._run(key, scope, body, receive, send)
+                return
+            if entry.fingerprint != fingerprint:
+                await self._error(send, 422, "Idempotency-Key was already used with a different request body")
+                return
+            entry = await self._wait(key, entry, deadline)
+            if entry is None:
+                continue  # the first attempt failed without a response; run it ourselves
+            if entry.status_code is None:
+                await self._error(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+            await self._replay(entry, send)
+            return
+
+    async def _run(self, key: str, scope, body: bytes, receive, send) -> None:
+        event = self._running[key] = asyncio.Event()
+        status_code, headers, chunks, finished = 500, [], [], False
+
+        async def replay_receive():
+            nonlocal body
+            if body is None:
+                return await receive()
+            message, body = {"type": "http.request", "body": body, "more_body": False}, None
+            return message
+
+        async def capture_send(message):
+            nonlocal status_code, headers, finished
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", ())]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                finished = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            if finished and status_code < 500:
+                await self._call(self.store.complete, key, status_code, headers, b"".join(chunks))
+            else:
+                await self._call(self.store.release, key)
+            del self._running[key]
+            event.set()
+
+    async def _wait(self, key: str, entry: StoredResponse, deadline: float) -> Optional[StoredResponse]:
+        """Wait until ``entry`` has a response or the deadline passes.
+
+        Returns None if the running attempt gave up the key.
+        """
+        while entry is not None and entry.status_code is None and time.monotonic() < deadline:
+            event = self._running.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+            else:
+                await asyncio.sleep(self.poll_interval)
+            entry = await self._call(self.store.get, key)
+        return entry
+
+    async def _call(self, func, *args):
+        if self._blocking_store:
+            return await run_in_threadpool(func, *args)
+        return func(*args)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks, more_body = [], True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _replay(entry: StoredResponse, send) -> None:
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in entry.headers or ()]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": entry.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+    @staticmethod
+    async def _error(send, status_code: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
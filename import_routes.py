@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, Header, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sharding import get_shard_session, shard_router
+from auth import get_current_principal
+from importer import Importer
+from jobs import job_queue, prefers_async, accepted_response
+from config import IMPORT_SPOOL_DIR
+from typing import Optional
+import codecs
+import os
+import tempfile
+
+router = APIRouter(prefix="/api/import", tags=["Import"])
+
+
+async def iter_lines(request: Request):
+    """Yield lists of complete lines from the request body as it arrives."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    remainder = ""
+    async for chunk in request.stream():
+        text = remainder + decoder.decode(chunk)
+        lines = text.split("\n")
+        remainder = lines.pop()
+        if lines:
+            yield lines
+    remainder += decoder.decode(b"", final=True)
+    if remainder:
+        yield [remainder]
+
+
+def feed_lines(importer: Importer, lines):
+    for line in lines:
+        importer.feed(line)
+
+
+def finish(importer: Importer) -> dict:
+    importer.flush()
+    return importer.summary()
+
+
+async def spool_body(request: Request) -> str:
+    """Copy the request body to a temporary file without buffering it in memory."""
+    handle, path = tempfile.mkstemp(prefix="import-", suffix=".ndjson", dir=IMPORT_SPOOL_DIR)
+    with os.fdopen(handle, "wb") as spool:
+        async for chunk in request.stream():
+            await run_in_threadpool(spool.write, chunk)
+    return path
+
+
+@router.post("")
+async def import_data(
+    request: Request,
+    prefer: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Import tasks, sub-agents and skills from a streamed NDJSON body.
+
+    The body is parsed line by line as it arrives and written in chunks of
+    ``IMPORT_CHUNK_SIZE`` rows, one transaction per chunk. The response reports
+    how many records of each type were imported and which lines were rejected.
+
+    With ``Prefer: respond-async`` the body is spooled to disk and imported by
+    a background job instead; the 202 response carries the job's ID, and the
+    job's progress and result use the same shape as the synchronous response.
+    """
+    if prefers_async(prefer):
+        path = await spool_body(request)
+        # Not retried: chunks committed before a failure would be imported twice.
+        job = await run_in_threadpool(
+            job_queue.enqueue, "import", current_user.id, {"path": path}, 1
+        )
+        return accepted_response(job, "Import queued")
+
+    importer = Importer(session, current_user.id)
+    async for lines in iter_lines(request):
+        await run_in_threadpool(feed_lines, importer, lines)
+    return await run_in_threadpool(finish, importer)
+
+
+@job_queue.handler("import")
+def run_import(session: Session, job) -> dict:
+    """Background half of ``import_data`` for spooled request bodies."""
+    path = job.payload["path"]
+    # Raises ShardMoving, and the job is retried later, before the spool is touched.
+    with shard_router.session_for(job.user_id) as shard_session:
+        try:
+            importer = Importer(
+                shard_session, job.user_id, on_progress=lambda progress: job_queue.report_progress(job, progress)
+            )
+            with open(path, encoding="utf-8", errors="replace") as spool:
+                for line in spool:
+                    importer.feed(line)
+            return finish(importer)
+        finally:
+            os.remove(path)
@@ -0,0 +1,181 @@
+"""Incremental NDJSON import of tasks, sub-agents and skills.
+
+Input uses the same line format as ``GET /api/export?format=ndjson``: one JSON
+object per line with a ``type`` of ``task``, ``sub_agent`` or ``skill``. Lines
+are validated as they arrive and buffered; every ``IMPORT_CHUNK_SIZE`` valid
+rows are written with one multi-row INSERT per table in a single transaction,
+so only one chunk is ever held in memory.
+
+Sub-agents get fresh IDs. A skill may reference either a sub-agent from the
+same file (by the ``id`` it has in the file) or an existing sub-agent that the
+importing user owns. Imported tasks and skills are appended to the end of
+their lists, in file order.
+"""
+import json
+import logging
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ids import new_id
+from models import Task, TaskCreate, SubAgent, SubAgentCreate, Skill, SkillBase
+from positions import key_between, last_position
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class Importer:
+    """Validate NDJSON lines and insert them into ``session`` chunk by chunk."""
+
+    def __init__(
+        self,
+        session: Session,
+        user_id: uuid.UUID,
+        chunk_size: Optional[int] = None,
+        on_progress: Optional[Callable[[dict], None]] = None,
+    ):
+        self.session = session
+        self.user_id = user_id
+        self.chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+        self.on_progress = on_progress
+        self.lines = 0
+        self.chunks = 0
+        self.imported = {"task": 0, "sub_agent": 0, "skill": 0}
+        self.errors: List[dict] = []
+        self.error_count = 0
+        # file ID -> new ID for sub-agents in this import, plus existing ones verified as owned
+        self._sub_agent_ids: Dict[str, uuid.UUID] = {}
+        # (model, user or sub-agent ID) -> position key last handed out in that list
+        self._positions: Dict[tuple, Optional[str]] = {}
+        self._pending = {"task": [], "sub_agent": [], "skill": []}
+        self._pending_lines: List[int] = []
+
+    def feed(self, line: str) -> None:
+        """Process one line of input."""
+        self.lines += 1
+        if not line.strip():
+            return
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("line is not a JSON object")
+            record_type = record.get("type")
+            parse = getattr(self, f"_parse_{record_type}", None) if isinstance(record_type, str) else None
+            if parse is None:
+                raise ValueError("type must be one of: task, sub_agent, skill")
+            row = parse(record)
+        except (ValueError, ValidationError) as exc:
+            self._error(self.lines, str(exc))
+            return
+
+        self._pending[record_type].append(row)
+        self._pending_lines.append(self.lines)
+        if len(self._pending_lines) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Insert all buffered rows in one transaction."""
+        if not self._pending_lines:
+            return
+        first, last = self._pending_lines[0], self._pending_lines[-1]
+        try:
+            # Parents first so skills can reference sub-agents from the same chunk.
+            for record_type, model in (("sub_agent", SubAgent), ("skill", Skill), ("task", Task)):
+                if self._pending[record_type]:
+                    self.session.execute(insert(model), self._pending[record_type])
+            self.session.commit()
+            for record_type, rows in self._pending.items():
+                self.imported[record_type] += len(rows)
+        except SQLAlchemyError as exc:
+            self.session.rollback()
+            self._error(first, f"lines {first}-{last} were not imported: {exc.__class__.__name__}")
+            if self._pending["sub_agent"]:
+                # Skills later in the file must not point at sub-agents that were rolled back.
+                rolled_back = {row["id"] for row in self._pending["sub_agent"]}
+                self._sub_agent_ids = {k: v for k, v in self._sub_agent_ids.items() if v not in rolled_back}
+        finally:
+            self._pending = {"task": [], "sub_agent": [], "skill": []}
+            self._pending_lines = []
+
+        self.chunks += 1
+        progress = self.summary()
+        logger.info("import for user %s: %s lines read, %s imported", self.user_id, self.lines, progress["imported"])
+        if self.on_progress:
+            self.on_progress(progress)
+
+    def summary(self) -> dict:
+        return {
+            "lines": self.lines,
+            "chunks": self.chunks,
+            "imported": dict(self.imported),
+            "error_count": self.error_count,
+            "errors": list(self.errors),
+        }
+
+    def _error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def _parse_task(self, record: dict) -> dict:
+        data = TaskCreate(**record)
+        if not data.title.strip():
+            raise ValueError("title is required")
+        return {
+            "title": data.title,
+            "description": data.description,
+            "completed": data.completed,
+            "user_id": self.user_id,
+            "position": self._next_position(Task, self.user_id),
+        }
+
+    def _parse_sub_agent(self, record: dict) -> dict:
+        data = SubAgentCreate(**record)
+        if not data.name.strip():
+            raise ValueError("name is required")
+        sub_agent_id = new_id()
+        if record.get("id") is not None:
+            self._sub_agent_ids[str(record["id"])] = sub_agent_id
+        return {"id": sub_agent_id, "name": data.name, "description": data.description, "user_id": self.user_id}
+
+    def _parse_skill(self, record: dict) -> dict:
+        reference = str(record.get("sub_agent_id", ""))
+        sub_agent_id = self._sub_agent_ids.get(reference) or self._owned_sub_agent(reference)
+        if sub_agent_id is None:
+            raise ValueError("sub_agent_id does not match a sub-agent in this import or one you own")
+        data = SkillBase(**{**record, "sub_agent_id": sub_agent_id})
+        if not data.name.strip():
+            raise ValueError("name is required")
+        return {
+            "name": data.name,
+            "description": data.description,
+            "sub_agent_id": sub_agent_id,
+            "position": self._next_position(Skill, sub_agent_id),
+        }
+
+    def _next_position(self, model, scope_id: uuid.UUID) -> str:
+        scope = (model, scope_id)
+        if scope not in self._positions:
+            self._positions[scope] = last_position(self.session, model, scope_id)
+        self._positions[scope] = key_between(self._positions[scope], None)
+        return self._positions[scope]
+
+    def _owned_sub_agent(self, reference: str) -> Optional[uuid.UUID]:
+        try:
+            sub_agent_uuid = uuid.UUID(reference)
+        except ValueError:
+            return None
+        owned = self.session.query(SubAgent.id).filter(
+            SubAgent.id == sub_agent_uuid, SubAgent.user_id == self.user_id
+        ).first()
+        if owned is None:
+            return None
+        self._sub_agent_ids[reference] = sub_agent_uuid
+        return sub_agent_uuid
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from database import get_session
+from models import Job, JobRead
+from auth import get_current_principal
+from typing import List
+import uuid
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+
+@router.get("/", response_model=List[JobRead])
+def get_jobs(
+    limit: int = 50,
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_session)
+):
+    """Get the current user's most recent background jobs."""
+    jobs = (
+        session.query(Job)
+        .filter(Job.user_id == current_user.id)
+        .order_by(Job.created_at.desc())
+        .limit(min(max(limit, 1), 200))
+        .all()
+    )
+    return jobs
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def get_job(
+    job_id: str,
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_session)
+):
+    """Get the status, progress and result of a background job."""
+    try:
+        job_uuid = uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    job = session.query(Job).filter(Job.id == job_uuid, Job.user_id == current_user.id).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or access denied"
+        )
+
+    return job
@@ -0,0 +1,210 @@
+"""In-process background jobs, queued in the application database.
+
+Heavy operations are recorded as rows in the ``jobs`` table and picked up by a
+small pool of worker threads in every app process. A worker claims a job with
+a compare-and-swap UPDATE (``status = 'queued'`` -> ``'running'``), so several
+processes can share the table without double-running anything. Failed jobs are
+retried with exponential backoff up to ``max_attempts``; jobs left ``running``
+by a crashed process are requeued once their lease expires. A handler that
+can't run yet raises ``RetryLater`` to be requeued without using up an attempt.
+
+Handlers are registered with ``@job_queue.handler("kind")`` and called as
+``handler(session, job)``; they may call ``job_queue.report_progress`` and
+return a JSON-serializable result.
+"""
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from config import JOB_LEASE_SECONDS, JOB_POLL_INTERVAL
+from database import engine
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Session, Job], Optional[dict]]
+
+
+class RetryLater(Exception):
+    """Raised by a handler that can't run yet: the job runs again after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    def __init__(self, engine: Engine, poll_interval: float = JOB_POLL_INTERVAL, lease_seconds: int = JOB_LEASE_SECONDS):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.handlers: Dict[str, Handler] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+
+    def handler(self, kind: str):
+        """Register the function that runs jobs of ``kind``."""
+        def decorator(func: Handler) -> Handler:
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind: str, user_id: uuid.UUID, payload: dict, max_attempts: int = 3) -> Job:
+        """Persist a new job and wake a local worker for it.
+
+        Jobs always live in the main database, whichever shard holds the user's data.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        job = Job(kind=kind, user_id=user_id, payload=payload, max_attempts=max_attempts)
+        with Session(self.engine) as session:
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        self._wakeup.set()
+        return job
+
+    def report_progress(self, job: Job, progress: dict) -> None:
+        """Record progress for a running job (in its own short transaction)."""
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job).where(Job.id == job.id).values(progress=progress, updated_at=datetime.utcnow())
+            )
+            session.commit()
+
+    def claim(self, session: Session) -> Optional[Job]:
+        """Atomically move the next due job from queued to running."""
+        now = datetime.utcnow()
+        candidates = session.exec(
+            select(Job.id)
+            .where(Job.status == "queued", Job.run_after <= now, Job.kind.in_(list(self.handlers)))
+            .order_by(Job.run_after)
+            .limit(5)
+        ).all()
+        for job_id in candidates:
+            claimed = session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "queued")
+                .values(status="running", attempts=Job.attempts + 1, updated_at=now)
+            ).rowcount
+            session.commit()
+            if claimed:
+                return session.get(Job, job_id)
+        return None
+
+    def run_once(self) -> bool:
+        """Claim and run a single job. Returns False if nothing was due."""
+        with Session(self.engine) as session:
+            job = self.claim(session)
+            if job is None:
+                return False
+
+            try:
+                result = self.handlers[job.kind](session, job)
+            except RetryLater as exc:
+                session.rollback()
+                self._reschedule(session, job, exc)
+                return True
+            except Exception as exc:
+                session.rollback()
+                logger.exception("job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+                self._record_failure(session, job, exc)
+                return True
+
+            session.execute(
+                update(Job).where(Job.id == job.id).values(
+                    status="succeeded", result=result, error=None, updated_at=datetime.utcnow()
+                )
+            )
+            session.commit()
+            return True
+
+    def _reschedule(self, session: Session, job: Job, exc: RetryLater) -> None:
+        now = datetime.utcnow()
+        session.execute(update(Job).where(Job.id == job.id).values(
+            status="queued", attempts=Job.attempts - 1, error=str(exc),
+            run_after=now + timedelta(seconds=exc.retry_after), updated_at=now,
+        ))
+        session.commit()
+
+    def _record_failure(self, session: Session, job: Job, exc: Exception) -> None:
+        now = datetime.utcnow()
+        values = {"error": f"{exc.__class__.__name__}: {exc}", "updated_at": now}
+        if job.attempts < job.max_attempts:
+            values.update(status="queued", run_after=now + timedelta(seconds=2 ** job.attempts))
+        else:
+            values.update(status="failed")
+        session.execute(update(Job).where(Job.id == job.id).values(**values))
+        session.commit()
+
+    def requeue_stale(self) -> int:
+        """Requeue running jobs whose worker stopped updating them (e.g. the process died).
+
+        Jobs that have used up their attempts are marked failed instead.
+        """
+        now = datetime.utcnow()
+        stale = (Job.status == "running", Job.updated_at < now - timedelta(seconds=self.lease_seconds))
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job)
+                .where(*stale, Job.attempts >= Job.max_attempts)
+                .values(status="failed", error="Worker stopped before the job finished", updated_at=now)
+            )
+            count = session.execute(
+                update(Job).where(*stale).values(status="queued", run_after=now, updated_at=now)
+            ).rowcount
+            session.commit()
+        return count
+
+    def start(self, workers: int) -> None:
+        """Start ``workers`` daemon threads polling for jobs."""
+        self._stopping.clear()
+        self.requeue_stale()
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ask the workers to exit after their current job and wait for them."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_once()
+            except Exception:
+                logger.exception("job worker error")
+                ran = False
+            if not ran:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+
+def prefers_async(prefer: Optional[str]) -> bool:
+    """True if the client sent ``Prefer: respond-async`` (RFC 7240)."""
+    return bool(prefer) and "respond-async" in prefer.lower()
+
+
+def accepted_response(job: Job, message: str) -> JSONResponse:
+    """202 pointing the client at the job's status endpoint."""
+    return JSONResponse(
+        status_code=202,
+        content={"message": message, "job_id": str(job.id)},
+        headers={"Location": f"/api/jobs/{job.id}"},
+    )
+
+
+job_queue = JobQueue(engine)
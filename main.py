@@ -1,10 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import create_db_and_tables
+from config import (
+    ADMISSION_CONTROL_ENABLED, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, IDEMPOTENCY_BACKEND, JOB_WORKERS,
+    GROUP_COMMIT_ENABLED, MEMORY_PROFILING_ENABLED,
+)
+from database import create_db_and_tables, engine
+from rate_limit import RateLimitMiddleware, DatabaseBackend, InMemoryBackend
+from compression import CompressionMiddleware
+from idempotency import IdempotencyMiddleware, DatabaseStore, InMemoryStore
+from coalescing import CoalescingMiddleware, coalescing_stats
+from admission import AdmissionMiddleware, admission_controller
 from auth_routes import router as auth_router
 from task_routes import router as task_router
 from sub_agent_routes import router as sub_agent_router
 from skill_routes import router as skill_router
+from export_routes import router as export_router
+from import_routes import router as import_router
+from job_routes import router as job_router
+from bootstrap_routes import router as bootstrap_router
+from admin_routes import router as admin_router
+from jobs import job_queue
+from revocation import revocation_list
+from group_commit import write_batcher
 
 app = FastAPI()
 
@@ -13,6 +30,41 @@ app = FastAPI()
 def health():
     return {"status": "ok"}
 
+
+@app.get("/metrics")
+def metrics():
+    """Process-local counters for request coalescing, group commit and admission control."""
+    return {
+        "coalescing": coalescing_stats.snapshot(),
+        "group_commit": write_batcher.stats.snapshot(),
+        "admission": admission_controller.snapshot(),
+    }
+
+# Limit in-flight requests per route class and shed the excess with 503s
+# (innermost, so coalesced reads and replayed creates don't take a slot)
+if ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+# Share one in-flight response between identical concurrent list reads
+app.add_middleware(CoalescingMiddleware)
+
+# Replay responses of retried creates that carry an Idempotency-Key
+# (innermost, so stored bodies are not compressed for one particular client)
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=DatabaseStore(engine) if IDEMPOTENCY_BACKEND == "database" else InMemoryStore(),
+)
+
+# Compress large responses (brotli or gzip, whichever the client accepts)
+app.add_middleware(CompressionMiddleware)
+
+# Throttle per IP and per user (added before CORS so that 429s still carry CORS headers)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=DatabaseBackend(engine) if RATE_LIMIT_BACKEND == "database" else InMemoryBackend(),
+    )
+
 # Configure CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -25,11 +77,27 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    job_queue.start(JOB_WORKERS)
+    revocation_list.start()
+    if GROUP_COMMIT_ENABLED:
+        write_batcher.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    job_queue.stop()
+    revocation_list.stop()
+    write_batcher.stop()
 
 app.include_router(auth_router)
 app.include_router(task_router)
 app.include_router(sub_agent_router)
 app.include_router(skill_router)
+app.include_router(export_router)
+app.include_router(import_router)
+app.include_router(job_router)
+app.include_router(bootstrap_router)
+if MEMORY_PROFILING_ENABLED:
+    app.include_router(admin_router)
 
 @app.get("/")
 def read_root():
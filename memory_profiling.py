@@ -0,0 +1,121 @@
+"""Process memory inspection for tracking down slow RSS growth.
+
+``memory_profiler`` wraps ``tracemalloc``: ``start`` begins tracing and takes
+a baseline snapshot, and each ``snapshot`` call diffs a new snapshot against
+the previous one, grouped by allocation site, so that sites which keep
+growing between calls stand out. Tracing slows every allocation down, so it
+is off until started. Alongside it, ``live_objects`` counts ORM rows and
+sessions that are still reachable, which is where leaked identity maps and
+large ``get_tasks`` results would show up.
+
+Everything here is per process: with several workers, each one has its own
+trace and only the worker that answers a request is inspected.
+"""
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from sqlmodel import SQLModel
+
+KEY_TYPES = ("lineno", "filename", "traceback")
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, where ``/proc`` is available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def live_objects() -> dict:
+    """Count reachable ORM rows (by model) and sessions, after a full collection."""
+    gc.collect()
+    counts = Counter(
+        type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, (SQLModel, Session))
+    )
+    return dict(counts.most_common())
+
+
+class MemoryProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previous_at = 0.0
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """Start tracing (restarting it if already on) and take the baseline snapshot."""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            tracemalloc.start(frames)
+            self._previous = self._take()
+            self._previous_at = time.monotonic()
+
+    def stop(self) -> None:
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+    def snapshot(self, limit: int = 20, key_type: str = "lineno") -> dict:
+        """Diff a new snapshot against the previous one; returns the ``limit`` sites that grew most."""
+        with self._lock:
+            if self._previous is None:
+                raise RuntimeError("tracing is not started")
+            current, now = self._take(), time.monotonic()
+            stats = current.compare_to(self._previous, key_type)
+            since = now - self._previous_at
+            self._previous, self._previous_at = current, now
+
+        return {
+            "since_seconds": round(since, 3),
+            "size_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            "top": [
+                {
+                    # most recent frame first
+                    "sites": [
+                        frame.filename if key_type == "filename" else f"{frame.filename}:{frame.lineno}"
+                        for frame in reversed(stat.traceback)
+                    ],
+                    "size_kb": round(stat.size / 1024, 1),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+    def status(self) -> dict:
+        status = {"tracing": self.tracing, "rss_kb": None, "gc_counts": list(gc.get_count())}
+        rss = rss_bytes()
+        if rss is not None:
+            status["rss_kb"] = rss // 1024
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            status["traced_kb"] = current // 1024
+            status["traced_peak_kb"] = peak // 1024
+        return status
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(IGNORED)
+
+
+memory_profiler = MemoryProfiler()
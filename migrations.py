@@ -0,0 +1,202 @@
+"""Schema versioning and in-place migrations.
+
+The schema version is stored in a one-row ``schema_version`` table. In fast-start
+mode (``FAST_START=1``) startup only reads that row and skips ``create_all`` -
+which reflects every table and is slow against a remote Postgres - whenever the
+stored version is current.
+
+To change the schema, update the models, bump ``SCHEMA_VERSION`` and register a
+function for the new version in ``MIGRATIONS``. Migrations run on databases that
+predate the change; fresh databases are created from the models and stamped with
+the current version directly.
+"""
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import Column, Integer, Table, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import SQLModel
+
+from models import normalize_name
+from timestamps import utcnow
+
+SCHEMA_VERSION = 12
+
+schema_version_table = Table(
+    "schema_version",
+    SQLModel.metadata,
+    Column("version", Integer, nullable=False),
+)
+
+# version -> function upgrading a database from ``version - 1`` to ``version``
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {}
+
+
+def migration(version: int):
+    """Register the function that upgrades the schema to ``version``."""
+    def decorator(func: Callable[[Connection], None]):
+        MIGRATIONS[version] = func
+        return func
+    return decorator
+
+
+def get_stored_version(connection: Connection) -> Optional[int]:
+    """Return the stored schema version, or None if the database has never been stamped."""
+    try:
+        return connection.execute(text("SELECT version FROM schema_version")).scalar()
+    except SQLAlchemyError:
+        connection.rollback()
+        return None
+
+
+def is_schema_current(engine: Engine) -> bool:
+    """Cheap check (a single-row SELECT) used by fast-start mode."""
+    with engine.connect() as connection:
+        return get_stored_version(connection) == SCHEMA_VERSION
+
+
+def _stamp(connection: Connection, version: int) -> None:
+    connection.execute(text("DELETE FROM schema_version"))
+    connection.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+
+
+def upgrade(engine: Engine) -> None:
+    """Create missing tables, run pending migrations and record the new version."""
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        stored = get_stored_version(connection) if "schema_version" in existing_tables else None
+
+        SQLModel.metadata.create_all(connection)
+
+        if stored is None:
+            # Tables created before versioning existed match the baseline (1);
+            # a brand-new database already has the current schema.
+            app_tables = existing_tables - {"schema_version"}
+            stored = 1 if app_tables else SCHEMA_VERSION
+
+        for version in range(stored + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[version](connection)
+
+        _stamp(connection, SCHEMA_VERSION)
+
+
+def add_column_if_missing(connection: Connection, table: str, column: str, ddl: str) -> bool:
+    """Add ``column`` to ``table`` using the given column DDL unless it already exists."""
+    columns = {c["name"] for c in inspect(connection).get_columns(table)}
+    if column in columns:
+        return False
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return True
+
+
+# Migrations, in version order
+
+@migration(2)
+def add_rate_limit_buckets(connection: Connection) -> None:
+    """rate_limit_buckets is a new table, so create_all has already made it."""
+
+
+@migration(3)
+def add_jobs(connection: Connection) -> None:
+    """jobs is a new table, so create_all has already made it."""
+
+
+@migration(4)
+def index_foreign_keys(connection: Connection) -> None:
+    """Index the foreign keys that ownership lookups and cascading deletes filter on."""
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_user_id ON tasks (user_id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_sub_agents_user_id ON sub_agents (user_id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_skills_sub_agent_id ON skills (sub_agent_id)"))
+
+
+@migration(5)
+def add_refresh_and_revoked_tokens(connection: Connection) -> None:
+    """refresh_tokens and revoked_tokens are new tables, so create_all has already made them."""
+
+
+@migration(6)
+def add_row_versions(connection: Connection) -> None:
+    """Add the optimistic-concurrency version counter to tasks, sub-agents and skills."""
+    for table in ("tasks", "sub_agents", "skills"):
+        add_column_if_missing(connection, table, "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+@migration(7)
+def add_idempotency_keys(connection: Connection) -> None:
+    """idempotency_keys is a new table, so create_all has already made it."""
+
+
+@migration(8)
+def database_timestamps(connection: Connection) -> None:
+    """Let the database stamp created_at/updated_at, and index updated_at for delta sync.
+
+    Rows written before this all carry the start time of the process that
+    wrote them, so their updated_at is re-stamped with the migration time: an
+    incremental sync from before the upgrade then fetches them once. On SQLite
+    the column defaults come from the INSERT statements instead, since SQLite
+    can't alter a column's DEFAULT in place.
+    """
+    for table in ("tasks", "sub_agents", "skills"):
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)"))
+        connection.execute(update(SQLModel.metadata.tables[table]).values(updated_at=utcnow()))
+
+    if connection.dialect.name == "postgresql":
+        now = "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+        for table in ("users", "tasks", "sub_agents", "skills"):
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET DEFAULT {now}"))
+        for table in ("tasks", "sub_agents", "skills"):
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN updated_at SET DEFAULT {now}"))
+
+
+@migration(9)
+def add_shard_map(connection: Connection) -> None:
+    """shard_map is a new table, so create_all has already made it."""
+
+
+@migration(10)
+def add_archived_tasks(connection: Connection) -> None:
+    """archived_tasks is a new table, so create_all has already made it."""
+
+
+@migration(11)
+def add_positions(connection: Connection) -> None:
+    """Add the manual-ordering position key to tasks and skills, numbering existing rows by creation."""
+    from positions import keys_after  # positions imports the database module, which imports this one
+
+    ddl = 'VARCHAR COLLATE "C"' if connection.dialect.name == "postgresql" else "VARCHAR"
+    for table in ("tasks", "archived_tasks", "skills"):
+        add_column_if_missing(connection, table, "position", ddl)
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_user_id_position ON tasks (user_id, position, id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_skills_sub_agent_id_position ON skills (sub_agent_id, position, id)"
+    ))
+
+    for table, scope in (("tasks", "user_id"), ("skills", "sub_agent_id")):
+        rows = SQLModel.metadata.tables[table]
+        ordered = connection.execute(
+            select(rows.c[scope], rows.c.id).where(rows.c.position.is_(None))
+            .order_by(rows.c[scope], rows.c.created_at, rows.c.id)
+        ).all()
+        by_scope: Dict[object, list] = {}
+        for scope_id, row_id in ordered:
+            by_scope.setdefault(scope_id, []).append(row_id)
+        for ids in by_scope.values():
+            for row_id, key in zip(ids, keys_after(None, len(ids))):
+                connection.execute(update(rows).where(rows.c.id == row_id).values(position=key))
+
+
+@migration(12)
+def add_normalized_skill_names(connection: Connection) -> None:
+    """Add and index the normalized skill name that GET /api/skills/search looks up."""
+    ddl = 'VARCHAR COLLATE "C"' if connection.dialect.name == "postgresql" else "VARCHAR"
+    add_column_if_missing(connection, "skills", "name_normalized", ddl)
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_skills_name_normalized ON skills (name_normalized, sub_agent_id)"
+    ))
+    skills = SQLModel.metadata.tables["skills"]
+    for skill_id, name in connection.execute(
+        select(skills.c.id, skills.c.name).where(skills.c.name_normalized.is_(None))
+    ).all():
+        connection.execute(update(skills).where(skills.c.id == skill_id).values(name_normalized=normalize_name(name)))
@@ -1,9 +1,17 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
+from sqlalchemy import JSON, Index, LargeBinary, String
 from sqlmodel import SQLModel, Field, Relationship
 from pydantic import BaseModel
 import uuid
 
+from ids import IdType, new_id
+from timestamps import created_at_field, updated_at_field
+
+# Strings compared byte by byte: fractional-index keys (see positions.py) and
+# normalized names searched by prefix with a range scan
+BytewiseString = String().with_variant(String(collation="C"), "postgresql")
+
 
 # Pydantic models for request/response validation
 class UserBase(BaseModel):
@@ -23,18 +31,28 @@ class UserUpdate(BaseModel):
     email: Optional[str] = None
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
 # SQLModel for database
 class User(SQLModel, table=True):
     __tablename__ = "users"
 
-    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4, primary_key=True)
+    id: Optional[uuid.UUID] = Field(default_factory=new_id, primary_key=True, sa_type=IdType)
     email: str = Field(unique=True, index=True)
     hashed_password: str
-    created_at: datetime = Field(default=datetime.utcnow())
+    created_at: Optional[datetime] = created_at_field()
 
     # Relationships
-    tasks: list["Task"] = Relationship(back_populates="user")
-    sub_agents: list["SubAgent"] = Relationship(back_populates="user")
+    # passive_deletes="all": children are removed by the database (ON DELETE CASCADE)
+    # or by cascades.py, never loaded into Python just to be deleted.
+    tasks: list["Task"] = Relationship(back_populates="user", sa_relationship_kwargs={"passive_deletes": "all"})
+    sub_agents: list["SubAgent"] = Relationship(back_populates="user", sa_relationship_kwargs={"passive_deletes": "all"})
 
 
 # Task models
@@ -51,6 +69,8 @@ class TaskCreate(TaskBase):
 class TaskRead(TaskBase):
     id: uuid.UUID
     user_id: uuid.UUID
+    position: Optional[str] = None
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -61,21 +81,52 @@ class TaskUpdate(BaseModel):
     completed: Optional[bool] = None
 
 
+class PositionMove(BaseModel):
+    """Where to move a task or skill: right after ``after_id``, right before ``before_id``, or between both."""
+    after_id: Optional[uuid.UUID] = None
+    before_id: Optional[uuid.UUID] = None
+
+
 class Task(SQLModel, table=True):
     __tablename__ = "tasks"
+    __table_args__ = (Index("ix_tasks_user_id_position", "user_id", "position", "id"),)
 
-    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4, primary_key=True)
+    id: Optional[uuid.UUID] = Field(default_factory=new_id, primary_key=True, sa_type=IdType)
     title: str
     description: Optional[str] = None
     completed: bool = Field(default=False)
-    user_id: uuid.UUID = Field(foreign_key="users.id", ondelete="CASCADE")
-    created_at: datetime = Field(default=datetime.utcnow())
-    updated_at: datetime = Field(default=datetime.utcnow(), sa_column_kwargs={"onupdate": datetime.utcnow()})
+    user_id: uuid.UUID = Field(foreign_key="users.id", sa_type=IdType, ondelete="CASCADE", index=True)
+    position: Optional[str] = Field(default=None, sa_type=BytewiseString)
+    # Bumped on every update; compared by conditional.update_versioned
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
 
     # Relationship
     user: User = Relationship(back_populates="tasks")
 
 
+# Completed tasks moved out of the hot ``tasks`` table (see archive.py); same
+# columns, plus when the row was archived. Timestamps are copied, not maintained.
+class ArchivedTaskRead(TaskRead):
+    archived_at: datetime
+
+
+class ArchivedTask(SQLModel, table=True):
+    __tablename__ = "archived_tasks"
+
+    id: uuid.UUID = Field(primary_key=True, sa_type=IdType)
+    title: str
+    description: Optional[str] = None
+    completed: bool = Field(default=True)
+    user_id: uuid.UUID = Field(foreign_key="users.id", sa_type=IdType, ondelete="CASCADE", index=True)
+    position: Optional[str] = Field(default=None, sa_type=BytewiseString)
+    version: int = Field(default=1)
+    created_at: datetime
+    updated_at: datetime
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 # SubAgent models
 class SubAgentBase(BaseModel):
     name: str
@@ -89,10 +140,15 @@ class SubAgentCreate(SubAgentBase):
 class SubAgentRead(SubAgentBase):
     id: uuid.UUID
     user_id: uuid.UUID
+    version: int
     created_at: datetime
     updated_at: datetime
 
 
+
+class SubAgentSummary(SubAgentRead):
+    skill_count: int
+
 class SubAgentUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -101,16 +157,18 @@ class SubAgentUpdate(BaseModel):
 class SubAgent(SQLModel, table=True):
     __tablename__ = "sub_agents"
 
-    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4, primary_key=True)
+    id: Optional[uuid.UUID] = Field(default_factory=new_id, primary_key=True, sa_type=IdType)
     name: str
     description: Optional[str] = None
-    user_id: uuid.UUID = Field(foreign_key="users.id", ondelete="CASCADE")
-    created_at: datetime = Field(default=datetime.utcnow())
-    updated_at: datetime = Field(default=datetime.utcnow(), sa_column_kwargs={"onupdate": datetime.utcnow()})
+    user_id: uuid.UUID = Field(foreign_key="users.id", sa_type=IdType, ondelete="CASCADE", index=True)
+    # Bumped on every update; compared by conditional.update_versioned
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
 
     # Relationship
     user: User = Relationship(back_populates="sub_agents")
-    skills: list["Skill"] = Relationship(back_populates="sub_agent")
+    skills: list["Skill"] = Relationship(back_populates="sub_agent", sa_relationship_kwargs={"passive_deletes": "all"})
 
 
 # Skill models
@@ -127,6 +185,8 @@ class SkillCreate(SkillBase):
 class SkillRead(SkillBase):
     id: uuid.UUID
     sub_agent_id: uuid.UUID
+    position: Optional[str] = None
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -136,15 +196,147 @@ class SkillUpdate(BaseModel):
     description: Optional[str] = None
 
 
+class SkillSearchRead(BaseModel):
+    sub_agent_ids: List[uuid.UUID]
+
+
+def normalize_name(name: str) -> str:
+    """The form skill names are searched in: case-folded, with whitespace collapsed."""
+    return " ".join(name.split()).casefold()
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """The smallest string greater than every string starting with ``prefix``, or None if there is none.
+
+    That's the prefix with its last character bumped, stepping over the
+    surrogate range; trailing U+10FFFF can't be bumped, so they're dropped and
+    the character before them is bumped instead.
+    """
+    prefix = prefix.rstrip("\U0010ffff")
+    if not prefix:
+        return None
+    last = ord(prefix[-1]) + 1
+    if 0xD800 <= last <= 0xDFFF:
+        last = 0xE000
+    return prefix[:-1] + chr(last)
+
+
+def _normalized_name_default(context) -> Optional[str]:
+    name = context.get_current_parameters().get("name")
+    return normalize_name(name) if name is not None else None
+
+
 class Skill(SQLModel, table=True):
     __tablename__ = "skills"
+    __table_args__ = (
+        Index("ix_skills_sub_agent_id_position", "sub_agent_id", "position", "id"),
+        Index("ix_skills_name_normalized", "name_normalized", "sub_agent_id"),
+    )
 
-    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4, primary_key=True)
+    id: Optional[uuid.UUID] = Field(default_factory=new_id, primary_key=True, sa_type=IdType)
     name: str
+    # normalize_name(name), filled in on INSERT; set it alongside name on UPDATE
+    name_normalized: Optional[str] = Field(
+        default=None, sa_type=BytewiseString, sa_column_kwargs={"default": _normalized_name_default}
+    )
     description: Optional[str] = None
-    sub_agent_id: uuid.UUID = Field(foreign_key="sub_agents.id", ondelete="CASCADE")
-    created_at: datetime = Field(default=datetime.utcnow())
-    updated_at: datetime = Field(default=datetime.utcnow(), sa_column_kwargs={"onupdate": datetime.utcnow()})
+    sub_agent_id: uuid.UUID = Field(foreign_key="sub_agents.id", sa_type=IdType, ondelete="CASCADE", index=True)
+    position: Optional[str] = Field(default=None, sa_type=BytewiseString)
+    # Bumped on every update; compared by conditional.update_versioned
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
 
     # Relationship
-    sub_agent: SubAgent = Relationship(back_populates="skills")
\ No newline at end of file
+    sub_agent: SubAgent = Relationship(back_populates="skills")
+
+
+# Everything the frontend loads on start (see bootstrap_routes)
+class BootstrapRead(BaseModel):
+    tasks: List[TaskRead]
+    sub_agents: List[SubAgentSummary]
+    skills: List[SkillRead]
+
+# Rate limiter state shared between worker processes (see rate_limit.DatabaseBackend)
+class RateLimitBucket(SQLModel, table=True):
+    __tablename__ = "rate_limit_buckets"
+
+    key: str = Field(primary_key=True)
+    tokens: float
+    updated_at: float = Field(index=True)
+
+
+# Responses stored for replay under an Idempotency-Key (see idempotency.DatabaseStore)
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+
+    key: str = Field(primary_key=True)
+    fingerprint: str
+    status_code: Optional[int] = None  # None while the first request is still running
+    headers: Optional[list] = Field(default=None, sa_type=JSON)
+    body: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
+    expires_at: float = Field(index=True)
+
+
+# Background job models
+class JobRead(BaseModel):
+    id: uuid.UUID
+    kind: str
+    status: str
+    attempts: int
+    progress: Optional[Any] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class Job(SQLModel, table=True):
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+    id: Optional[uuid.UUID] = Field(default_factory=new_id, primary_key=True, sa_type=IdType)
+    kind: str
+    status: str = Field(default="queued")  # queued, running, succeeded, failed
+    user_id: uuid.UUID = Field(foreign_key="users.id", sa_type=IdType, ondelete="CASCADE", index=True)
+    payload: dict = Field(default_factory=dict, sa_type=JSON)
+    progress: Optional[dict] = Field(default=None, sa_type=JSON)
+    result: Optional[dict] = Field(default=None, sa_type=JSON)
+    error: Optional[str] = None
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# Refresh tokens are opaque random strings; only their SHA-256 is stored.
+class RefreshToken(SQLModel, table=True):
+    __tablename__ = "refresh_tokens"
+
+    id: Optional[uuid.UUID] = Field(default_factory=new_id, primary_key=True, sa_type=IdType)
+    token_hash: str = Field(unique=True, index=True)
+    user_id: uuid.UUID = Field(foreign_key="users.id", sa_type=IdType, ondelete="CASCADE", index=True)
+    expires_at: datetime
+    revoked_at: Optional[datetime] = None
+    replaced_by: Optional[uuid.UUID] = Field(default=None, sa_type=IdType)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# Revoked access-token IDs, kept until the token would have expired anyway
+class RevokedToken(SQLModel, table=True):
+    __tablename__ = "revoked_tokens"
+
+    jti: str = Field(primary_key=True)
+    expires_at: datetime = Field(index=True)
+    revoked_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+# Which shard holds each user's tasks, sub-agents and skills (see sharding.ShardRouter)
+class ShardAssignment(SQLModel, table=True):
+    __tablename__ = "shard_map"
+
+    user_id: uuid.UUID = Field(primary_key=True, foreign_key="users.id", sa_type=IdType, ondelete="CASCADE")
+    shard: str = Field(index=True)
+    moving: bool = Field(default=False)  # set while rebalancing copies the user's rows
+    assigned_at: datetime = Field(default_factory=datetime.utcnow)
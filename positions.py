@@ -0,0 +1,241 @@
+"""Manual ordering of tasks and skills with fractional indexes.
+
+Each row's ``position`` is a string key; lists are ordered by it (then by id).
+A key can always be generated strictly between two others, so moving a row
+is a single-row update: its new key goes between its new neighbours'. Keys
+follow the scheme described in David Greenspan's "Implementing Fractional
+Indexing": a variable-length integer part, whose first character encodes its
+length, followed by a base-62 fraction. Appending at the end increments the
+integer part and keeps keys short; repeated inserts at the same spot lengthen
+the fraction, so once a key exceeds ``POSITION_REBALANCE_LENGTH`` characters a
+background job rewrites the list with fresh, short keys.
+
+Keys compare by byte value (``COLLATE "C"`` on PostgreSQL; SQLite's default).
+"""
+from typing import List, Optional
+import uuid
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from conditional import etag, parse_if_match, precondition_failed, update_versioned
+from config import POSITION_REBALANCE_LENGTH
+from jobs import job_queue
+from models import Skill, Task
+from sharding import shard_router
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+ZERO = DIGITS[0]
+SMALLEST_INTEGER = "A" + ZERO * 26
+
+# Scope each model's ordering applies within
+SCOPES = {Task: Task.user_id, Skill: Skill.sub_agent_id}
+MODELS = {"task": Task, "skill": Skill}
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """A fraction strictly between ``a`` and ``b`` (None meaning the end)."""
+    if b is not None:
+        n = 0
+        while (a[n] if n < len(a) else ZERO) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"invalid position key head {head!r}")
+
+
+def _split(key: str):
+    length = _integer_length(key[0])
+    if length > len(key) or key == SMALLEST_INTEGER or key[length:].endswith(ZERO):
+        raise ValueError(f"invalid position key {key!r}")
+    return key[:length], key[length:]
+
+
+def _increment(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        value = DIGITS.index(digits[i]) + 1
+        if value < len(DIGITS):
+            digits[i] = DIGITS[value]
+            return head + "".join(digits)
+        digits[i] = ZERO
+    if head == "Z":
+        return "a" + ZERO
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(ZERO)
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        value = DIGITS.index(digits[i]) - 1
+        if value >= 0:
+            digits[i] = DIGITS[value]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """A position key sorting strictly after ``a`` and before ``b`` (None = open end)."""
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} is not before {b!r}")
+    if a is None and b is None:
+        return "a" + ZERO
+    if a is None:
+        integer, fraction = _split(b)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint("", fraction)
+        if integer < b:
+            return integer
+        decremented = _decrement(integer)
+        if decremented is None:
+            raise ValueError("cannot position before the smallest key")
+        return decremented
+    integer, fraction = _split(a)
+    if b is None:
+        incremented = _increment(integer)
+        return integer + _midpoint(fraction, None) if incremented is None else incremented
+    integer_b, fraction_b = _split(b)
+    if integer == integer_b:
+        return integer + _midpoint(fraction, fraction_b)
+    incremented = _increment(integer)
+    if incremented is not None and incremented < b:
+        return incremented
+    return integer + _midpoint(fraction, None)
+
+
+def keys_after(a: Optional[str], count: int) -> List[str]:
+    """``count`` ascending keys after ``a``, as short as possible."""
+    keys = []
+    for _ in range(count):
+        a = key_between(a, None)
+        keys.append(a)
+    return keys
+
+
+def last_position(session: Session, model, scope_id: uuid.UUID) -> Optional[str]:
+    return session.execute(select(func.max(model.position)).where(SCOPES[model] == scope_id)).scalar()
+
+
+def next_position(session: Session, model, scope_id: uuid.UUID) -> str:
+    """Key for a row appended to the end of its list."""
+    return key_between(last_position(session, model, scope_id), None)
+
+
+def rebalance(session: Session, model, scope_id: uuid.UUID) -> int:
+    """Give every row in the list a fresh short key, keeping the order. Returns the rows updated."""
+    ids = session.execute(
+        select(model.id).where(SCOPES[model] == scope_id).order_by(model.position, model.id)
+    ).scalars().all()
+    if ids:
+        table = model.__table__
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id", type_=table.c.id.type))
+            .values(position=bindparam("key"), version=table.c.version + 1),
+            [{"row_id": row_id, "key": key} for row_id, key in zip(ids, keys_after(None, len(ids)))],
+        )
+    session.commit()
+    return len(ids)
+
+
+def _neighbour(session: Session, model, row, scope_id, key: str, after: bool) -> Optional[str]:
+    """Position of the row right after (or before) ``key``, other than ``row`` itself."""
+    scope = (SCOPES[model] == scope_id) & (model.id != row.id)
+    if after:
+        return session.execute(select(func.min(model.position)).where(scope, model.position > key)).scalar()
+    return session.execute(select(func.max(model.position)).where(scope, model.position < key)).scalar()
+
+
+def _position_of(session: Session, model, scope_id, row_id: uuid.UUID, label: str) -> str:
+    position = session.execute(
+        select(model.position).where(model.id == row_id, SCOPES[model] == scope_id)
+    ).scalar()
+    if position is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{label} not found in this list")
+    return position
+
+
+def move(session: Session, row, after_id: Optional[uuid.UUID], before_id: Optional[uuid.UUID],
+         user_id: uuid.UUID, if_match: Optional[str], response: Response, rebalanced: bool = False):
+    """Place ``row`` right after ``after_id`` and/or right before ``before_id``, updating only ``row``."""
+    model = type(row)
+    scope_id = getattr(row, SCOPES[model].key)
+    if after_id is None and before_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Give after_id, before_id or both"
+        )
+    if row.id in (after_id, before_id):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Cannot move relative to itself")
+
+    lower = _position_of(session, model, scope_id, after_id, "after_id") if after_id else None
+    upper = _position_of(session, model, scope_id, before_id, "before_id") if before_id else None
+    if before_id is None:
+        upper = _neighbour(session, model, row, scope_id, lower, after=True)
+    elif after_id is None:
+        lower = _neighbour(session, model, row, scope_id, upper, after=False)
+    elif lower > upper:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="after_id must come before before_id"
+        )
+
+    if lower is not None and lower == upper:
+        # Two rows share a key (created concurrently); spread the list out first.
+        if rebalanced:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The list changed; please retry")
+        # That bumps every row's version, this one's included, so If-Match is checked
+        # now and the retry expects the version the rebalance left.
+        expected = parse_if_match(if_match)
+        if expected is not None and row.version != expected:
+            raise precondition_failed(row.version)
+        rebalance(session, model, scope_id)
+        session.refresh(row)
+        if_match = etag(row.version) if expected is not None else None
+        return move(session, row, after_id, before_id, user_id, if_match, response, rebalanced=True)
+
+    key = key_between(lower, upper)
+    row = update_versioned(session, row, {"position": key}, if_match, response)
+    if len(key) > POSITION_REBALANCE_LENGTH:
+        kind = next(name for name, candidate in MODELS.items() if candidate is model)
+        job_queue.enqueue("rebalance_positions", user_id, {"model": kind, "scope_id": str(scope_id)})
+    return row
+
+
+@job_queue.handler("rebalance_positions")
+def run_rebalance(session: Session, job) -> dict:
+    """Rewrite a list's position keys once repeated moves have made them long."""
+    model = MODELS[job.payload["model"]]
+    with shard_router.session_for(job.user_id) as shard_session:
+        updated = rebalance(shard_session, model, uuid.UUID(job.payload["scope_id"]))
+    return {"updated": updated}
@@ -0,0 +1,286 @@
+"""Token-bucket rate limiting and per-user concurrency caps.
+
+``RateLimitMiddleware`` matches each request against an ordered list of
+``RouteLimit`` rules (first match wins) and charges one token from a per-IP
+and/or per-user bucket. An empty bucket means a ``429`` with ``Retry-After``
+set to the number of seconds until a token is available again.
+
+Buckets live in a backend. ``InMemoryBackend`` keeps them in an LRU-ordered
+dict with TTL eviction and is the right choice for a single process;
+``DatabaseBackend`` keeps them in the ``rate_limit_buckets`` table so that all
+workers of a multi-process deployment share the same limits.
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from config import (
+    AUTH_RATE_LIMIT,
+    MAX_CONCURRENT_REQUESTS_PER_USER,
+    READ_RATE_LIMIT,
+    WRITE_RATE_LIMIT,
+)
+from utils import verify_access_token
+
+PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0}
+
+
+@dataclass(frozen=True)
+class Rate:
+    """``burst`` requests at once, refilled at ``per_second`` tokens per second."""
+    burst: float
+    per_second: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        """Parse ``"<count>/<second|minute|hour>"``, e.g. ``"30/minute"``."""
+        count, _, period = value.partition("/")
+        seconds = PERIODS[period.strip().rstrip("s") or "second"]
+        return cls(burst=float(count), per_second=float(count) / seconds)
+
+
+@dataclass(frozen=True)
+class RouteLimit:
+    """Limits for requests whose path starts with ``path`` (and method matches, if given)."""
+    path: str
+    method: Optional[str] = None
+    per_ip: Optional[Rate] = None
+    per_user: Optional[Rate] = None
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method is None or self.method == method) and path.startswith(self.path)
+
+    @property
+    def key(self) -> str:
+        """Identifies the rule in bucket keys, so rules on the same path don't share buckets."""
+        return f"{self.method or '*'}:{self.path}"
+
+
+def default_limits() -> List[RouteLimit]:
+    """Limits used by the app: tight per-IP limits on bcrypt-heavy auth, per-user limits elsewhere."""
+    auth = Rate.parse(AUTH_RATE_LIMIT)
+    read = Rate.parse(READ_RATE_LIMIT)
+    write = Rate.parse(WRITE_RATE_LIMIT)
+    return [
+        RouteLimit("/api/auth/login", "POST", per_ip=auth),
+        RouteLimit("/api/auth/signup", "POST", per_ip=auth),
+        RouteLimit("/api/", "GET", per_ip=read, per_user=read),
+        RouteLimit("/api/", per_ip=write, per_user=write),
+    ]
+
+
+class InMemoryBackend:
+    """Token buckets in an LRU-ordered dict.
+
+    Every access moves the bucket to the end, so the least recently used
+    buckets are always at the front; idle ones are evicted from there once
+    they're older than ``ttl`` seconds (an idle bucket is full again long
+    before that), and the dict never grows past ``max_entries``.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, rate: Rate, now: Optional[float] = None) -> float:
+        """Take one token; return 0 if allowed, otherwise seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [rate.burst, now]
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(rate.burst, bucket[0] + (now - bucket[1]) * rate.per_second)
+                bucket[1] = now
+            self._evict(now)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate.per_second
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self.ttl and len(buckets) <= self.max_entries:
+                break
+            del buckets[key]
+
+
+class DatabaseBackend:
+    """Token buckets in the ``rate_limit_buckets`` table, shared by all workers.
+
+    A request costs a single conditional UPDATE that refills and charges the
+    bucket atomically, so concurrent workers can't both spend the last token.
+    """
+
+    REFILLED = (
+        "CASE WHEN tokens + (:now - updated_at) * :per_second > :burst THEN :burst "
+        "ELSE tokens + (:now - updated_at) * :per_second END"
+    )
+
+    def __init__(self, engine: Engine, ttl: float = 3600.0, cleanup_every: int = 1000):
+        self.engine = engine
+        self.ttl = ttl
+        self.cleanup_every = cleanup_every
+        self._calls = 0
+
+    def acquire(self, key: str, rate: Rate, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        params = {"key": key, "now": now, "burst": rate.burst, "per_second": rate.per_second}
+        with self.engine.begin() as connection:
+            self._calls += 1
+            if self._calls % self.cleanup_every == 0:
+                connection.execute(
+                    text("DELETE FROM rate_limit_buckets WHERE updated_at < :cutoff"),
+                    {"cutoff": now - self.ttl},
+                )
+
+            charged = connection.execute(
+                text(
+                    f"UPDATE rate_limit_buckets SET tokens = {self.REFILLED} - 1, updated_at = :now "
+                    f"WHERE key = :key AND {self.REFILLED} >= 1"
+                ),
+                params,
+            ).rowcount
+            if charged:
+                return 0.0
+
+            tokens = connection.execute(
+                text(f"SELECT {self.REFILLED} FROM rate_limit_buckets WHERE key = :key"), params
+            ).scalar()
+            if tokens is not None:
+                return (1 - tokens) / rate.per_second
+
+        # First request for this key: start from a full bucket minus this request.
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    text("INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (:key, :tokens, :now)"),
+                    {"key": key, "tokens": rate.burst - 1, "now": now},
+                )
+            return 0.0
+        except IntegrityError:
+            # Another worker created it first; charge the bucket it made.
+            return self.acquire(key, rate, now)
+
+
+class ConcurrencyLimiter:
+    """Caps how many requests a single user may have in flight at once."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str) -> bool:
+        with self._lock:
+            count = self._in_flight.get(key, 0)
+            if count >= self.limit:
+                return False
+            self._in_flight[key] = count + 1
+            return True
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            count = self._in_flight.pop(key, 1) - 1
+            if count > 0:
+                self._in_flight[key] = count
+
+
+def user_id_from_scope(scope) -> Optional[str]:
+    """Return the ``sub`` claim of a valid bearer token on the request, if any."""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            payload = verify_access_token(token.strip())
+            return payload.get("sub") if payload else None
+    return None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing ``RouteLimit`` rules and per-user concurrency caps."""
+
+    def __init__(
+        self,
+        app,
+        limits: Optional[List[RouteLimit]] = None,
+        backend=None,
+        max_concurrent_per_user: int = MAX_CONCURRENT_REQUESTS_PER_USER,
+    ):
+        self.app = app
+        self.limits = default_limits() if limits is None else limits
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.concurrency = ConcurrencyLimiter(max_concurrent_per_user) if max_concurrent_per_user else None
+        # Only the in-memory backend is cheap enough to call on the event loop.
+        self._blocking_backend = not isinstance(self.backend, InMemoryBackend)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        limit = next((rule for rule in self.limits if rule.matches(scope["method"], scope["path"])), None)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        user_id = user_id_from_scope(scope) if (limit.per_user or self.concurrency) else None
+        retry_after = 0.0
+        if limit.per_ip:
+            client = scope.get("client")
+            ip = client[0] if client else "unknown"
+            retry_after = await self._acquire(f"ip:{limit.key}:{ip}", limit.per_ip)
+        if not retry_after and limit.per_user and user_id:
+            retry_after = await self._acquire(f"user:{limit.key}:{user_id}", limit.per_user)
+        if retry_after:
+            await self._reject(send, "Too many requests", retry_after)
+            return
+
+        if self.concurrency is None or not user_id:
+            await self.app(scope, receive, send)
+            return
+        if not self.concurrency.try_acquire(user_id):
+            await self._reject(send, "Too many concurrent requests", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.concurrency.release(user_id)
+
+    async def _acquire(self, key: str, rate: Rate) -> float:
+        if self._blocking_backend:
+            return await run_in_threadpool(self.backend.acquire, key, rate)
+        return self.backend.acquire(key, rate)
+
+    @staticmethod
+    async def _reject(send, detail: str, retry_after: float) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
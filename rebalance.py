@@ -0,0 +1,65 @@
+"""Move users' tasks, sub-agents and skills between shards while the app is running.
+
+``python rebalance.py status`` shows how many users each shard holds and how
+many the hash ring would now place elsewhere (e.g. after adding a shard to
+``SHARDS``). ``python rebalance.py apply [--limit N]`` moves those users, one
+at a time; ``python rebalance.py move USER_ID SHARD`` moves a single user.
+Each user's requests get a 503 for about ``SHARD_MAP_CACHE_SECONDS`` while
+their last changes are copied (see ``ShardRouter.move_user``). A user whose
+old shard was written to after that copy is reported, and their rows there
+are kept for reconciling by hand.
+"""
+import argparse
+import uuid
+from collections import Counter
+
+from sqlmodel import Session, select
+
+from database import create_db_and_tables
+from models import ShardAssignment
+from sharding import ShardRouter, SourceChanged, shard_router
+
+
+def misplaced(router: ShardRouter):
+    """``[(user_id, current shard, ring's shard), ...]`` for users not on their ring position."""
+    with Session(router.directory) as session:
+        assignments = session.exec(select(ShardAssignment.user_id, ShardAssignment.shard)).all()
+    return [
+        (user_id, shard, router.place(user_id))
+        for user_id, shard in assignments
+        if router.place(user_id) != shard
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    apply = commands.add_parser("apply")
+    apply.add_argument("--limit", type=int, default=None, help="move at most this many users")
+    move = commands.add_parser("move")
+    move.add_argument("user_id", type=uuid.UUID)
+    move.add_argument("shard", choices=sorted(shard_router.shards))
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    if args.command == "status":
+        with Session(shard_router.directory) as session:
+            counts = Counter(session.exec(select(ShardAssignment.shard)).all())
+        for name in sorted(shard_router.shards):
+            print(f"{name:<20} {counts.get(name, 0)} users")
+        print(f"{len(misplaced(shard_router))} users to move")
+    elif args.command == "move":
+        print(shard_router.move_user(args.user_id, args.shard))
+    else:
+        for user_id, source, target in misplaced(shard_router)[:args.limit]:
+            try:
+                result = shard_router.move_user(user_id, target)
+            except SourceChanged as error:
+                print(f"{user_id} {source} -> {target}: {error}")
+                continue
+            print(f"{user_id} {source} -> {target}: {result.get('copied')}")
+
+
+if __name__ == "__main__":
+    main()
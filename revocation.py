@@ -0,0 +1,170 @@
+"""In-memory revocation list for access tokens.
+
+Access tokens are short-lived and stateless; logging out records the token's
+``jti`` until the moment it would have expired anyway. Every process keeps the
+live revocations in memory - a bloom filter that answers "definitely not
+revoked" for almost every request, backed by an exact ``jti -> expiry`` map
+for the rare maybe - so ``get_current_principal`` never queries the database
+for them.
+
+Revocations are also written to the ``revoked_tokens`` table. A background
+thread pulls the ones made by other workers every ``REVOCATION_SYNC_SECONDS``
+and drops expired entries, rebuilding the filter so it never fills up.
+``revoked_at`` is stamped by the revoking process before it commits, so a row
+can become visible after a sync has already moved past its timestamp; each
+sync therefore re-reads an overlap window before its watermark.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, REVOCATION_SYNC_SECONDS
+from database import engine
+from models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+def user_key(user_id) -> str:
+    """Revocation-list key covering every access token issued to ``user_id``."""
+    return f"user:{user_id}"
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings."""
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from the two halves of one 128-bit digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    def __init__(
+        self,
+        engine: Engine,
+        sync_interval: float = REVOCATION_SYNC_SECONDS,
+        capacity: int = 100_000,
+        overlap: Optional[float] = None,
+    ):
+        self.engine = engine
+        self.sync_interval = sync_interval
+        # How late a revocation may commit (or how far clocks may drift) and still be picked up.
+        self.overlap = timedelta(seconds=max(sync_interval, 1.0) if overlap is None else overlap)
+        self.capacity = capacity
+        self._expiries: Dict[str, float] = {}
+        self._filter = BloomFilter(capacity)
+        self._lock = threading.Lock()
+        self._synced_until: Optional[datetime] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._expiries)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Pure in-memory check; never touches the database."""
+        if not jti or jti not in self._filter:
+            return False
+        expires = self._expiries.get(jti)
+        return expires is not None and expires > time.time()
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """Revoke ``jti`` (an access token expiring at unix time ``expires_at``) everywhere."""
+        if expires_at <= time.time():
+            return
+        self._remember(jti, expires_at)
+        try:
+            with Session(self.engine) as session:
+                session.add(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(expires_at)))
+                session.commit()
+        except IntegrityError:
+            pass  # already revoked
+
+    def revoke_user(self, user_id) -> None:
+        """Revoke every access token ``user_id`` holds, until the newest of them would have expired."""
+        self.revoke(user_key(user_id), time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+    def _remember(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._expiries[jti] = expires_at
+            self._filter.add(jti)
+
+    def sync(self) -> None:
+        """Load revocations made by other processes and forget expired ones."""
+        now = datetime.utcnow()
+        with Session(self.engine) as session:
+            statement = select(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+            if self._synced_until is None:
+                statement = statement.where(RevokedToken.expires_at > now)
+            else:
+                # Re-reading the overlap is harmless: _remember is idempotent.
+                statement = statement.where(RevokedToken.revoked_at >= self._synced_until - self.overlap)
+            rows = session.exec(statement).all()
+            session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            session.commit()
+
+        for jti, expires_at, revoked_at in rows:
+            self._remember(jti, (expires_at - datetime(1970, 1, 1)).total_seconds())
+            if self._synced_until is None or revoked_at > self._synced_until:
+                self._synced_until = revoked_at
+        if self._synced_until is None:
+            self._synced_until = now
+        self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time()
+        with self._lock:
+            live = {jti: exp for jti, exp in self._expiries.items() if exp > cutoff}
+            if len(live) == len(self._expiries):
+                return
+            rebuilt = BloomFilter(max(self.capacity, 2 * len(live)))
+            for jti in live:
+                rebuilt.add(jti)
+            self._expiries, self._filter = live, rebuilt
+
+    def start(self) -> None:
+        """Load current revocations and keep syncing them in a daemon thread."""
+        self.sync()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.sync_interval):
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("revocation sync failed")
+
+
+revocation_list = RevocationList(engine)
@@ -0,0 +1,73 @@
+"""Production entry point: gunicorn master with preloaded uvicorn workers.
+
+Run with ``python server.py``. All tuning comes from the environment:
+
+- ``HOST`` / ``PORT``: bind address (defaults ``0.0.0.0`` / ``7860``)
+- ``WEB_CONCURRENCY``: number of worker processes (defaults to the CPU count)
+- ``KEEP_ALIVE``: seconds to hold idle keep-alive connections open
+- ``BACKLOG``: maximum number of pending connections on the listen socket
+- ``GRACEFUL_TIMEOUT``: seconds workers get to finish in-flight requests on shutdown
+- ``WORKER_TIMEOUT``: seconds of silence before the master restarts a worker
+"""
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+
+class ProductionWorker(UvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools instead of the pure-Python fallbacks."""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+
+def get_worker_count() -> int:
+    """Number of worker processes, defaulting to one per CPU."""
+    workers = os.getenv("WEB_CONCURRENCY")
+    if workers:
+        return max(int(workers), 1)
+    return multiprocessing.cpu_count()
+
+
+def get_options() -> dict:
+    """Build the gunicorn settings from the environment."""
+    return {
+        "bind": f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '7860')}",
+        "workers": get_worker_count(),
+        "worker_class": "server.ProductionWorker",
+        "preload_app": True,
+        "keepalive": int(os.getenv("KEEP_ALIVE", "5")),
+        "backlog": int(os.getenv("BACKLOG", "2048")),
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        "timeout": int(os.getenv("WORKER_TIMEOUT", "60")),
+        "accesslog": "-",
+    }
+
+
+class ProductionServer(BaseApplication):
+    """Gunicorn application that imports the app and prepares the schema once in the master."""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # preload_app makes this run once in the master before forking, so the
+        # schema is created a single time and every worker inherits the
+        # imported app instead of re-importing it.
+        from database import create_db_and_tables, engine
+        from main import app
+
+        create_db_and_tables()
+        # Don't let forked workers share the master's pooled connections.
+        engine.dispose()
+        return app
+
+
+if __name__ == "__main__":
+    ProductionServer(get_options()).run()
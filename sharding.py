@@ -0,0 +1,325 @@
+"""Horizontal sharding of users' tasks, sub-agents and skills by ``user_id``.
+
+The main database keeps the global tables (users, tokens, jobs, ...) and the
+``shard_map``, which records the shard each user's rows live on. A user without
+an entry is placed by a consistent-hash ring over the configured shards and
+the choice is stored, so adding a shard later doesn't silently move anyone:
+``rebalance.py`` moves users to their new ring position explicitly. Each shard
+also holds a copy of the user row, so foreign keys and cascades work within it.
+
+Lookups are cached per process for ``SHARD_MAP_CACHE_SECONDS``. Without
+``SHARDS`` configured the main database is the only shard and no lookup is
+made at all.
+
+``move_user`` moves a user online: rows are bulk-copied while the user keeps
+working, then writes are paused (requests get a 503) just long enough to copy
+whatever changed in the meantime, compared by row version, before the map
+flips to the new shard. The pause only stops new lookups: a writer that found
+the source shard earlier (a long import, a background job) can still write to
+it. So the source rows are only deleted if they still match, id and version,
+what was copied; otherwise they are kept and ``SourceChanged`` is raised.
+"""
+import bisect
+import hashlib
+import math
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from auth import get_current_principal
+from cascades import DELETE_CHUNK_SIZE, delete_in_chunks
+from config import SHARD_MAP_CACHE_SECONDS
+from database import engine, shard_engines
+from jobs import RetryLater
+from models import ArchivedTask, ShardAssignment, Skill, SubAgent, Task, User
+
+# Tables whose rows follow their user to a shard, parents first
+SHARDED_MODELS = (SubAgent, Skill, Task, ArchivedTask)
+MOVE_CHUNK_SIZE = 1000
+
+
+class ShardMoving(RetryLater):
+    """The user's rows are being moved to another shard; retry shortly.
+
+    Requests get a 503 (see ``shard_moving_error``); background jobs are requeued.
+    """
+
+
+class SourceChanged(Exception):
+    """Rows on a moved user's old shard changed after they were copied, so they were kept there.
+
+    The user is already served from the new shard; reconcile the kept rows by
+    hand before moving the user again.
+    """
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def owned_rows(model, user_id: uuid.UUID):
+    """Condition selecting the rows of ``model`` that belong to ``user_id``."""
+    if model is Skill:
+        return Skill.sub_agent_id.in_(select(SubAgent.id).where(SubAgent.user_id == user_id))
+    return model.user_id == user_id
+
+
+class ShardRouter:
+    def __init__(self, directory: Engine, shards: Dict[str, Engine], virtual_nodes: int = 128,
+                 cache_seconds: float = SHARD_MAP_CACHE_SECONDS, max_cached: int = 100_000):
+        self.directory = directory
+        self.shards = shards
+        self.cache_seconds = cache_seconds
+        self.max_cached = max_cached
+        self._ring = sorted((_hash(f"{name}#{i}"), name) for name in shards for i in range(virtual_nodes))
+        self._points = [point for point, _ in self._ring]
+        self._cache: Dict[uuid.UUID, Tuple[str, bool, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def unsharded(self) -> bool:
+        return len(self.shards) == 1 and next(iter(self.shards.values())) is self.directory
+
+    def place(self, user_id: uuid.UUID) -> str:
+        """The shard the hash ring picks for ``user_id``."""
+        index = bisect.bisect(self._points, _hash(str(user_id))) % len(self._ring)
+        return self._ring[index][1]
+
+    def shard_for(self, user_id: uuid.UUID) -> str:
+        """Name of the shard holding ``user_id``'s rows, assigning one on first use."""
+        if self.unsharded:
+            return next(iter(self.shards))
+        now = time.monotonic()
+        cached = self._cache.get(user_id)
+        if cached is None or cached[2] <= now:
+            shard, moving = self._assignment(user_id)
+            with self._lock:
+                if len(self._cache) >= self.max_cached:
+                    self._cache.clear()
+                cached = self._cache[user_id] = (shard, moving, now + self.cache_seconds)
+        if cached[1]:
+            raise ShardMoving(f"user {user_id} is being moved", retry_after=self.retry_after)
+        return cached[0]
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until a moving user's assignment is read again."""
+        return max(1, math.ceil(self.cache_seconds))
+
+    def engine_for(self, user_id: uuid.UUID) -> Engine:
+        return self.shards[self.shard_for(user_id)]
+
+    def session_for(self, user_id: uuid.UUID) -> Session:
+        return Session(self.engine_for(user_id))
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        self._cache.pop(user_id, None)
+
+    def _assignment(self, user_id: uuid.UUID, retry: bool = True) -> Tuple[str, bool]:
+        with Session(self.directory) as session:
+            assignment = session.get(ShardAssignment, user_id)
+            if assignment is not None:
+                if assignment.shard not in self.shards:
+                    raise LookupError(f"user {user_id} is on unknown shard {assignment.shard!r}")
+                return assignment.shard, assignment.moving
+
+        shard = self.place(user_id)
+        self._copy_user(user_id, self.shards[shard])
+        try:
+            with Session(self.directory) as session:
+                session.add(ShardAssignment(user_id=user_id, shard=shard))
+                session.commit()
+        except IntegrityError:
+            if not retry:
+                raise
+            return self._assignment(user_id, retry=False)  # assigned concurrently
+        return shard, False
+
+    def _set_assignment(self, user_id: uuid.UUID, shard: str, moving: bool) -> None:
+        with Session(self.directory) as session:
+            session.execute(
+                update(ShardAssignment).where(ShardAssignment.user_id == user_id).values(shard=shard, moving=moving)
+            )
+            session.commit()
+        self.invalidate(user_id)
+
+    def _copy_user(self, user_id: uuid.UUID, target: Engine) -> None:
+        """Give ``target`` the user row its foreign keys point at (without the password hash)."""
+        if target is self.directory:
+            return
+        with Session(self.directory) as session:
+            user = session.get(User, user_id)
+        if user is None:
+            raise LookupError(f"user {user_id} does not exist")
+        try:
+            with Session(target) as session:
+                session.execute(insert(User).values(
+                    id=user.id, email=user.email, hashed_password="", created_at=user.created_at
+                ))
+                session.commit()
+        except IntegrityError:
+            pass  # already there
+
+    # Rebalancing
+
+    def move_user(self, user_id: uuid.UUID, target: str, chunk_size: int = MOVE_CHUNK_SIZE,
+                  settle_seconds: float = None) -> dict:
+        """Move ``user_id``'s rows to the ``target`` shard while the user stays online."""
+        if target not in self.shards:
+            raise LookupError(f"unknown shard {target!r}")
+        settle = self.cache_seconds if settle_seconds is None else settle_seconds
+        self.invalidate(user_id)
+        source = self.shard_for(user_id)
+        if source == target:
+            return {"moved": False, "shard": source}
+        source_engine, target_engine = self.shards[source], self.shards[target]
+
+        # 1. Bulk copy while the user keeps reading and writing the source.
+        self._copy_user(user_id, target_engine)
+        with Session(target_engine) as session:
+            self._delete_rows(session, user_id, chunk_size)  # leftovers of an interrupted move
+        copied = copy_rows(source_engine, target_engine, user_id, chunk_size)
+
+        # 2. Pause writes: every process sees `moving` once its cached lookup expires.
+        self._set_assignment(user_id, source, moving=True)
+        time.sleep(settle)
+        copied_versions = {}
+        try:
+            # 3. Catch up with whatever changed during the bulk copy.
+            reconciled = reconcile_rows(source_engine, target_engine, user_id, chunk_size, copied_versions)
+        except Exception:
+            self._set_assignment(user_id, source, moving=False)
+            raise
+
+        # 4. Switch over, then clean up the source unless a writer that was
+        # already past its lookup changed it after the catch-up.
+        self._set_assignment(user_id, target, moving=False)
+        changed = self._delete_copied_rows(source_engine, user_id, copied_versions, chunk_size)
+        if changed:
+            raise SourceChanged(
+                f"{changed} rows of user {user_id} changed on shard {source!r} after they were copied "
+                f"to {target!r}; they were kept on {source!r}"
+            )
+        return {"moved": True, "source": source, "target": target, "copied": copied, "reconciled": reconciled}
+
+    def _delete_copied_rows(self, source: Engine, user_id: uuid.UUID, versions: dict, chunk_size: int) -> int:
+        """Delete the user's rows from ``source`` if they all still have the copied versions.
+
+        Each row is deleted only where its ``(id, version)`` matches, so a
+        concurrent update makes the delete miss it. If any row was missed, or
+        rows were added, everything is rolled back; returns how many rows
+        differed (0 once deleted).
+        """
+        changed = 0
+        with Session(source) as session:
+            for model in reversed(SHARDED_MODELS):
+                table = model.__table__
+                pairs = list(versions[model].items())
+                for start in range(0, len(pairs), chunk_size):
+                    chunk = pairs[start:start + chunk_size]
+                    deleted = session.execute(
+                        delete(table).where(tuple_(table.c.id, table.c.version).in_(chunk))
+                    ).rowcount
+                    changed += len(chunk) - deleted
+                changed += session.execute(
+                    select(func.count()).select_from(table).where(owned_rows(model, user_id))
+                ).scalar_one()
+            if changed:
+                session.rollback()
+                return changed
+            if source is not self.directory:
+                session.execute(delete(User).where(User.id == user_id))
+            session.commit()
+        return 0
+
+    @staticmethod
+    def _delete_rows(session: Session, user_id: uuid.UUID, chunk_size: int = DELETE_CHUNK_SIZE) -> None:
+        for model in reversed(SHARDED_MODELS):
+            delete_in_chunks(session, model, owned_rows(model, user_id), chunk_size)
+
+
+def copy_rows(source: Engine, target: Engine, user_id: uuid.UUID, chunk_size: int = MOVE_CHUNK_SIZE) -> dict:
+    """Copy all of ``user_id``'s rows from ``source`` to ``target`` in keyset-paginated chunks."""
+    counts = {}
+    with source.connect() as reader, target.begin() as writer:
+        for model in SHARDED_MODELS:
+            table, counts[model.__tablename__], last_id = model.__table__, 0, None
+            while True:
+                statement = select(table).where(owned_rows(model, user_id)).order_by(table.c.id).limit(chunk_size)
+                if last_id is not None:
+                    statement = statement.where(table.c.id > last_id)
+                rows = [dict(row._mapping) for row in reader.execute(statement)]
+                if not rows:
+                    break
+                writer.execute(insert(table), rows)
+                counts[model.__tablename__] += len(rows)
+                last_id = rows[-1]["id"]
+    return counts
+
+
+def reconcile_rows(source: Engine, target: Engine, user_id: uuid.UUID, chunk_size: int = MOVE_CHUNK_SIZE,
+                   copied_versions: Optional[dict] = None) -> dict:
+    """Make ``target`` match ``source`` for ``user_id``, copying only rows whose version differs.
+
+    ``copied_versions``, if given, is filled with ``{model: {id: version}}`` of
+    the source rows ``target`` now matches.
+    """
+    counts = {}
+    stale_by_model = {}
+    with source.connect() as reader, target.begin() as writer:
+        for model in SHARDED_MODELS:
+            table = model.__table__
+            versions = select(table.c.id, table.c.version).where(owned_rows(model, user_id))
+            in_source = dict(reader.execute(versions).all())
+            in_target = dict(writer.execute(versions).all())
+            changed = [row_id for row_id, version in in_source.items() if in_target.get(row_id) != version]
+            stale_by_model[model] = [row_id for row_id in in_target if row_id not in in_source]
+            if copied_versions is not None:
+                copied_versions[model] = in_source
+
+            for start in range(0, len(changed), chunk_size):
+                ids = changed[start:start + chunk_size]
+                for row in reader.execute(select(table).where(table.c.id.in_(ids))):
+                    values = dict(row._mapping)
+                    in_source[values["id"]] = values["version"]  # it may have changed since it was listed
+                    if values["id"] in in_target:
+                        writer.execute(update(table).where(table.c.id == values["id"]).values(**values))
+                    else:
+                        writer.execute(insert(table).values(**values))
+            counts[model.__tablename__] = {"copied": len(changed), "deleted": len(stale_by_model[model])}
+
+        # Children first, so a deleted sub-agent's skills aren't left dangling.
+        for model in reversed(SHARDED_MODELS):
+            stale = stale_by_model[model]
+            for start in range(0, len(stale), chunk_size):
+                writer.execute(delete(model.__table__).where(model.__table__.c.id.in_(stale[start:start + chunk_size])))
+    return counts
+
+
+shard_router = ShardRouter(engine, shard_engines)
+
+
+def shard_moving_error() -> HTTPException:
+    """The 503 for a request whose user's rows are being moved."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Your data is being moved to another database; please retry shortly",
+        headers={"Retry-After": str(shard_router.retry_after)},
+    )
+
+
+def get_shard_session(current_user=Depends(get_current_principal)):
+    """Dependency to get a session on the shard that holds the current user's data."""
+    try:
+        shard_engine = shard_router.engine_for(current_user.id)
+    except ShardMoving:
+        raise shard_moving_error()
+    with Session(shard_engine) as session:
+        yield session
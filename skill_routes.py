@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.orm import Session
-from database import get_session
-from models import Skill, SkillCreate, SkillRead, SkillUpdate, SubAgent
-from auth import get_current_user
-from typing import List
+from sharding import get_shard_session
+from models import PositionMove, Skill, SkillCreate, SkillRead, SkillSearchRead, SkillUpdate, SubAgent, normalize_name, prefix_upper_bound
+from auth import get_current_principal
+from streaming import stream_json_list
+from conditional import etag, is_not_modified, list_etag, not_modified, update_versioned
+from positions import move, next_position
+from timestamps import naive_utc
+from datetime import datetime
+from typing import List, Optional
+from sqlmodel import select
 import uuid
 
 router = APIRouter(prefix="/api/skills", tags=["Skills"])
@@ -11,32 +17,62 @@ router = APIRouter(prefix="/api/skills", tags=["Skills"])
 
 @router.get("/", response_model=List[SkillRead])
 def get_skills(
+    response: Response,
     sub_agent_id: str = None,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    stream: bool = False,
+    updated_since: Optional[datetime] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Get all skills for the current user, optionally filtered by sub-agent."""
-    query = session.query(Skill).join(SubAgent).filter(SubAgent.user_id == current_user.id)
+    """Get all skills for the current user, optionally filtered by sub-agent.
+
+    Skills are grouped by sub-agent and in each sub-agent's manual order (see
+    ``/{skill_id}/move``).
+
+    ``updated_since`` limits the list to skills created or changed after that
+    time, for incremental sync (deletions are not reported). The response
+    carries an ``ETag``; sending it back in ``If-None-Match`` gets a 304 when
+    nothing changed, without the rows being loaded.
+
+    With ``stream=true`` the same JSON array is streamed straight from the
+    database cursor instead of being built in memory first.
+    """
+    statement = select(Skill).join(SubAgent).where(SubAgent.user_id == current_user.id)
 
     if sub_agent_id:
         try:
             sub_agent_uuid = uuid.UUID(sub_agent_id)
-            query = query.filter(Skill.sub_agent_id == sub_agent_uuid)
+            statement = statement.where(Skill.sub_agent_id == sub_agent_uuid)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail="Invalid sub-agent ID format"
             )
 
-    skills = query.all()
+    if updated_since is not None:
+        statement = statement.where(Skill.updated_at > naive_utc(updated_since))
+    statement = statement.order_by(Skill.sub_agent_id, Skill.position, Skill.id)
+
+    tag = list_etag(session, statement, Skill)
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+
+    if stream:
+        streamed = stream_json_list(session, statement, SkillRead)
+        streamed.headers["ETag"] = tag
+        return streamed
+
+    response.headers["ETag"] = tag
+    skills = session.execute(statement).scalars().all()
     return skills
 
 
 @router.post("/", response_model=SkillRead)
 def create_skill(
     skill_data: SkillCreate,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Create a new skill for a sub-agent belonging to the current user."""
     # Validate that name is provided
@@ -47,13 +83,8 @@ def create_skill(
         )
 
     # Verify that the sub-agent belongs to the current user
-    try:
-        sub_agent_uuid = uuid.UUID(skill_data.sub_agent_id)
-    except ValueError:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Invalid sub-agent ID format"
-        )
+    # (SkillCreate has already parsed sub_agent_id into a UUID)
+    sub_agent_uuid = skill_data.sub_agent_id
 
     sub_agent = session.query(SubAgent).filter(SubAgent.id == sub_agent_uuid, SubAgent.user_id == current_user.id).first()
 
@@ -67,7 +98,8 @@ def create_skill(
     skill = Skill(
         name=skill_data.name,
         description=skill_data.description,
-        sub_agent_id=sub_agent_uuid
+        sub_agent_id=sub_agent_uuid,
+        position=next_position(session, Skill, sub_agent_uuid)
     )
 
     session.add(skill)
@@ -77,11 +109,51 @@ def create_skill(
     return skill
 
 
+@router.get("/search", response_model=SkillSearchRead)
+def search_skills(
+    name: str,
+    prefix: bool = False,
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Find which of the current user's sub-agents have a skill called ``name``.
+
+    Names match ignoring case and runs of whitespace; with ``prefix=true`` any
+    skill name starting with ``name`` matches. The lookup is a range scan of
+    the ``(name_normalized, sub_agent_id)`` index, so its cost depends on the
+    matches rather than on how many skills the user has.
+    """
+    normalized = normalize_name(name)
+    if not normalized:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=[{"loc": ["query", "name"], "msg": "name is required", "type": "value_error"}]
+        )
+
+    if prefix:
+        upper = prefix_upper_bound(normalized)
+        matches = Skill.name_normalized >= normalized
+        if upper is not None:
+            matches &= Skill.name_normalized < upper
+    else:
+        matches = Skill.name_normalized == normalized
+
+    sub_agent_ids = session.execute(
+        select(Skill.sub_agent_id).distinct()
+        .join(SubAgent, SubAgent.id == Skill.sub_agent_id)
+        .where(matches, SubAgent.user_id == current_user.id)
+        .order_by(Skill.sub_agent_id)
+    ).scalars().all()
+    return {"sub_agent_ids": sub_agent_ids}
+
+
 @router.get("/{skill_id}", response_model=SkillRead)
 def get_skill(
     skill_id: str,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Get a specific skill by ID if it belongs to a sub-agent of the current user."""
     try:
@@ -103,6 +175,10 @@ def get_skill(
             detail="Skill not found or access denied"
         )
 
+    tag = etag(skill.version)
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+    response.headers["ETag"] = tag
     return skill
 
 
@@ -110,10 +186,15 @@ def get_skill(
 def update_skill(
     skill_id: str,
     skill_data: SkillUpdate,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Update a specific skill if it belongs to a sub-agent of the current user."""
+    """Update a specific skill if it belongs to a sub-agent of the current user.
+
+    With ``If-Match`` the update only applies to the version the client last read.
+    """
     try:
         skill_uuid = uuid.UUID(skill_id)
     except ValueError:
@@ -134,23 +215,18 @@ def update_skill(
         )
 
     # Update skill fields if provided
-    if skill_data.name is not None:
-        skill.name = skill_data.name
-    if skill_data.description is not None:
-        skill.description = skill_data.description
+    values = skill_data.model_dump(exclude_none=True)
+    if "name" in values:
+        values["name_normalized"] = normalize_name(values["name"])
 
-    session.add(skill)
-    session.commit()
-    session.refresh(skill)
-
-    return skill
+    return update_versioned(session, skill, values, if_match, response)
 
 
 @router.delete("/{skill_id}")
 def delete_skill(
     skill_id: str,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Delete a specific skill if it belongs to a sub-agent of the current user."""
     try:
@@ -175,4 +251,39 @@ def delete_skill(
     session.delete(skill)
     session.commit()
 
-    return {"message": "Skill deleted successfully"}
\ No newline at end of file
+    return {"message": "Skill deleted successfully"}
+
+@router.post("/{skill_id}/move", response_model=SkillRead)
+def move_skill(
+    skill_id: str,
+    placement: PositionMove,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Move a skill right after ``after_id`` and/or right before ``before_id`` among its sub-agent's skills.
+
+    Only the moved skill is written. With ``If-Match`` the move only applies
+    to the version the client last read.
+    """
+    try:
+        skill_uuid = uuid.UUID(skill_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Skill not found"
+        )
+
+    skill = session.query(Skill).join(SubAgent).filter(
+        Skill.id == skill_uuid,
+        SubAgent.user_id == current_user.id
+    ).first()
+
+    if not skill:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Skill not found or access denied"
+        )
+
+    return move(session, skill, placement.after_id, placement.before_id, current_user.id, if_match, response)
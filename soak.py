@@ -0,0 +1,220 @@
+"""Soak test: drive the CRUD routes of a running server for hours and report memory growth.
+
+Each of ``--clients`` threads signs up its own user, imports ``--tasks`` tasks
+(so every list read returns a large result) and then repeats a cycle of task,
+sub-agent and skill requests until ``--requests`` requests or ``--hours``
+hours have been sent. Every ``--report-every`` requests it prints the request
+rate, the response statuses and the server's RSS; at the end, the memory
+growth per 100k requests, from a least-squares fit of RSS against requests
+after the first ``--warmup`` requests.
+
+RSS is read from ``/proc/<pid>/status`` with ``--pid`` (server on this
+machine), or from ``GET /api/admin/memory`` with ``--admin-token``. With the
+admin token, tracemalloc is also started once warm-up is over, and the
+allocation sites that grew most and the live ORM objects are printed at the
+end. Run the server as a single worker with rate limiting off, e.g.
+``RATE_LIMIT_ENABLED=0 MEMORY_PROFILING_ENABLED=1 ADMIN_TOKEN=secret uvicorn main:app``.
+
+Usage: ``python soak.py [--url http://127.0.0.1:8000] [--clients 8] [--hours 4 | --requests N]
+[--tasks 200] [--report-every 10000] [--warmup 10000] [--pid PID] [--admin-token TOKEN]``
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class Client:
+    """A keep-alive connection to the server, authenticated as one user once signed up."""
+
+    def __init__(self, url: str, headers: Optional[dict] = None):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.headers = dict(headers or {})
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def request(self, method: str, path: str, body=None, raw: Optional[bytes] = None) -> Tuple[int, object]:
+        """Send a request; returns ``(status, parsed JSON body)``, with status 0 if the connection failed."""
+        headers = dict(self.headers)
+        if body is not None:
+            raw = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            try:
+                self.connection.request(method, path, body=raw, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection: reconnect and retry once.
+                self.connection.close()
+            except (http.client.HTTPException, OSError):
+                self.connection.close()  # reconnects on the next request
+                return 0, None
+        else:
+            return 0, None
+        is_json = data and response.getheader("Content-Type", "").startswith("application/json")
+        return response.status, json.loads(data) if is_json else None
+
+
+class Soak:
+    def __init__(self, url: str, tasks: int, limit: Optional[int], deadline: Optional[float]):
+        self.url = url
+        self.tasks = tasks
+        self.limit = limit
+        self.deadline = deadline
+        self.sent = 0
+        self.statuses: Counter = Counter()
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, status: int) -> None:
+        with self._lock:
+            self.sent += 1
+            self.statuses[status] += 1
+            if self.limit is not None and self.sent >= self.limit:
+                self.stopped.set()
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.stopped.set()
+
+    def call(self, client: Client, method: str, path: str, body=None, raw: Optional[bytes] = None):
+        status, data = client.request(method, path, body, raw)
+        self.record(status)
+        return data if 200 <= status < 300 else None
+
+    def run_client(self) -> None:
+        client = Client(self.url)
+        tokens = self.call(client, "POST", "/api/auth/signup", {
+            "email": f"soak_{uuid.uuid4().hex[:12]}@example.com", "password": "soak-password",
+        })
+        if tokens is None:
+            return
+        client.headers["Authorization"] = f"Bearer {tokens['access_token']}"
+        seed = "\n".join(json.dumps({"type": "task", "title": f"seed {i}"}) for i in range(self.tasks))
+        self.call(client, "POST", "/api/import", raw=seed.encode())
+        while not self.stopped.is_set():
+            self.cycle(client)
+
+    def cycle(self, client: Client) -> None:
+        """One pass over the CRUD routes, deleting everything it creates."""
+        tasks = self.call(client, "GET", "/api/tasks/")
+        task = self.call(client, "POST", "/api/tasks/", {"title": "soak", "description": "x" * 200})
+        if task is not None:
+            path = f"/api/tasks/{task['id']}"
+            self.call(client, "GET", path)
+            self.call(client, "PUT", path, {"title": "soak (edited)"})
+            self.call(client, "PATCH", f"{path}/complete?completed=true")
+            if tasks:
+                self.call(client, "POST", f"{path}/move", {"before_id": tasks[0]["id"]})
+            self.call(client, "DELETE", path)
+
+        sub_agent = self.call(client, "POST", "/api/sub-agents/", {"name": "soak"})
+        if sub_agent is not None:
+            skill = self.call(client, "POST", "/api/skills/", {"name": "soak", "sub_agent_id": sub_agent["id"]})
+            if skill is not None:
+                self.call(client, "PUT", f"/api/skills/{skill['id']}", {"name": "soak skill"})
+            self.call(client, "GET", f"/api/skills/?sub_agent_id={sub_agent['id']}")
+            self.call(client, "GET", "/api/skills/search?name=soak&prefix=true")
+            self.call(client, "GET", "/api/bootstrap")
+            self.call(client, "DELETE", f"/api/sub-agents/{sub_agent['id']}")
+
+
+def proc_rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def growth_per_100k(samples: List[Tuple[int, int]]) -> Optional[float]:
+    """Least-squares slope of RSS (kB) against requests, scaled to MB per 100k requests."""
+    if len(samples) < 2:
+        return None
+    n = len(samples)
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    spread = sum((x - mean_x) ** 2 for x, _ in samples)
+    if not spread:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in samples) / spread
+    return slope * 100_000 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--hours", type=float, default=None)
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--tasks", type=int, default=200, help="tasks imported per client")
+    parser.add_argument("--report-every", type=int, default=10_000)
+    parser.add_argument("--warmup", type=int, default=10_000, help="requests left out of the growth fit")
+    parser.add_argument("--pid", type=int, default=None, help="server process to read RSS from")
+    parser.add_argument("--admin-token", default=None, help="ADMIN_TOKEN of a server with MEMORY_PROFILING_ENABLED")
+    args = parser.parse_args()
+    if args.hours is None and args.requests is None:
+        args.hours = 1.0
+
+    admin = Client(args.url, {"X-Admin-Token": args.admin_token}) if args.admin_token else None
+
+    def rss_kb() -> Optional[int]:
+        if args.pid is not None:
+            return proc_rss_kb(args.pid)
+        if admin is not None:
+            status, data = admin.request("GET", "/api/admin/memory")
+            return data.get("rss_kb") if status == 200 else None
+        return None
+
+    started = time.monotonic()
+    deadline = started + args.hours * 3600 if args.hours is not None else None
+    soak = Soak(args.url, args.tasks, args.requests, deadline)
+    threads = [threading.Thread(target=soak.run_client, daemon=True) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+
+    samples: List[Tuple[int, int]] = []
+    next_report, tracing = args.report_every, False
+    print(f"{'requests':>10} {'req/s':>8} {'rss MB':>8}  statuses")
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(0.2)
+        sent = soak.sent
+        if admin is not None and not tracing and sent >= args.warmup:
+            tracing = admin.request("POST", "/api/admin/memory/start")[0] == 200
+        if sent < next_report:
+            continue
+        next_report = (sent // args.report_every + 1) * args.report_every
+        rss = rss_kb()
+        if rss is not None and sent >= args.warmup:
+            samples.append((sent, rss))
+        rate = sent / (time.monotonic() - started)
+        shown = f"{rss / 1024:8.1f}" if rss is not None else f"{'-':>8}"
+        print(f"{sent:>10} {rate:>8.0f} {shown}  {dict(sorted(soak.statuses.items()))}", flush=True)
+
+    growth = growth_per_100k(samples)
+    print(f"\n{soak.sent} requests in {(time.monotonic() - started) / 60:.1f} minutes")
+    if growth is None:
+        print("memory growth: not enough RSS samples (pass --pid or --admin-token, and run past --warmup)")
+    else:
+        print(f"memory growth: {growth:+.2f} MB per 100k requests")
+
+    if tracing:
+        _, diff = admin.request("POST", "/api/admin/memory/snapshot?limit=15")
+        print(f"\nallocation sites that grew most since warm-up ({diff['size_diff_kb']:+.0f} kB in total):")
+        for stat in diff["top"]:
+            print(f"{stat['size_diff_kb']:>+10.1f} kB {stat['count_diff']:>+8} blocks  {stat['sites'][0]}")
+        _, status = admin.request("GET", "/api/admin/memory?objects=true")
+        print(f"\nlive ORM objects and sessions: {status['objects']}")
+        admin.request("POST", "/api/admin/memory/stop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Streamed list responses that serialize rows as they come off the DB cursor.
+
+Rows are fetched ``STREAM_BATCH_SIZE`` at a time with ``yield_per`` (a
+server-side cursor on Postgres), so memory use doesn't grow with the size of
+the collection. The generator runs after the endpoint has returned, so it
+opens its own session on the same engine as the request's session.
+"""
+from typing import Iterator, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from config import STREAM_BATCH_SIZE
+
+
+def iter_rows(session: Session, statement: Select, batch_size: int = STREAM_BATCH_SIZE) -> Iterator:
+    """Yield ORM objects for ``statement`` from a fresh session, ``batch_size`` rows at a time."""
+    with Session(session.get_bind()) as stream_session:
+        result = stream_session.execute(statement.execution_options(yield_per=batch_size)).scalars()
+        for row in result:
+            yield row
+            # Rows already serialized aren't needed any more; keep the identity map small.
+            stream_session.expunge(row)
+
+
+def iter_json_array(rows: Iterator, schema: Type[BaseModel], batch_size: int = STREAM_BATCH_SIZE) -> Iterator[bytes]:
+    """Serialize ``rows`` as a JSON array, emitting one chunk per batch."""
+    chunk = [b"["]
+    separator = b""
+    for count, row in enumerate(rows, 1):
+        chunk.append(separator + schema.model_validate(row, from_attributes=True).model_dump_json().encode())
+        separator = b","
+        if count % batch_size == 0:
+            yield b"".join(chunk)
+            chunk = []
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+
+def stream_json_list(session: Session, statement: Select, schema: Type[BaseModel]) -> StreamingResponse:
+    """Stream the result of ``statement`` as the same JSON array the non-streamed endpoint returns."""
+    return StreamingResponse(iter_json_array(iter_rows(session, statement), schema), media_type="application/json")
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database import get_session
-from models import SubAgent, SubAgentCreate, SubAgentRead, SubAgentUpdate
-from auth import get_current_user
-from typing import List
+from sharding import get_shard_session, shard_router
+from models import SubAgent, SubAgentCreate, SubAgentRead, SubAgentUpdate, Skill
+from auth import get_current_principal
+from jobs import job_queue, prefers_async, accepted_response
+from cascades import delete_sub_agent_cascade
+from conditional import etag, is_not_modified, list_etag, not_modified, update_versioned
+from timestamps import naive_utc
+from datetime import datetime
+from sqlmodel import select
+from config import ASYNC_DELETE_THRESHOLD
+from typing import List, Optional
 import uuid
 
 router = APIRouter(prefix="/api/sub-agents", tags=["Sub-Agents"])
@@ -11,19 +19,37 @@ router = APIRouter(prefix="/api/sub-agents", tags=["Sub-Agents"])
 
 @router.get("/", response_model=List[SubAgentRead])
 def get_sub_agents(
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    updated_since: Optional[datetime] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Get all sub-agents for the current user."""
-    sub_agents = session.query(SubAgent).filter(SubAgent.user_id == current_user.id).all()
+    """Get all sub-agents for the current user.
+
+    ``updated_since`` limits the list to sub-agents created or changed after that
+    time, for incremental sync (deletions are not reported). The response
+    carries an ``ETag``; sending it back in ``If-None-Match`` gets a 304 when
+    nothing changed, without the rows being loaded.
+    """
+    statement = select(SubAgent).where(SubAgent.user_id == current_user.id)
+    if updated_since is not None:
+        statement = statement.where(SubAgent.updated_at > naive_utc(updated_since))
+
+    tag = list_etag(session, statement, SubAgent)
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+
+    response.headers["ETag"] = tag
+    sub_agents = session.execute(statement).scalars().all()
     return sub_agents
 
 
 @router.post("/", response_model=SubAgentRead)
 def create_sub_agent(
     sub_agent_data: SubAgentCreate,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Create a new sub-agent for the current user."""
     # Validate that name is provided
@@ -50,8 +76,10 @@ def create_sub_agent(
 @router.get("/{sub_agent_id}", response_model=SubAgentRead)
 def get_sub_agent(
     sub_agent_id: str,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Get a specific sub-agent by ID if it belongs to the current user."""
     try:
@@ -70,6 +98,10 @@ def get_sub_agent(
             detail="Sub-agent not found or access denied"
         )
 
+    tag = etag(sub_agent.version)
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+    response.headers["ETag"] = tag
     return sub_agent
 
 
@@ -77,10 +109,15 @@ def get_sub_agent(
 def update_sub_agent(
     sub_agent_id: str,
     sub_agent_data: SubAgentUpdate,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Update a specific sub-agent if it belongs to the current user."""
+    """Update a specific sub-agent if it belongs to the current user.
+
+    With ``If-Match`` the update only applies to the version the client last read.
+    """
     try:
         sub_agent_uuid = uuid.UUID(sub_agent_id)
     except ValueError:
@@ -98,25 +135,24 @@ def update_sub_agent(
         )
 
     # Update sub-agent fields if provided
-    if sub_agent_data.name is not None:
-        sub_agent.name = sub_agent_data.name
-    if sub_agent_data.description is not None:
-        sub_agent.description = sub_agent_data.description
+    values = sub_agent_data.model_dump(exclude_none=True)
 
-    session.add(sub_agent)
-    session.commit()
-    session.refresh(sub_agent)
-
-    return sub_agent
+    return update_versioned(session, sub_agent, values, if_match, response)
 
 
 @router.delete("/{sub_agent_id}")
 def delete_sub_agent(
     sub_agent_id: str,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    prefer: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Delete a specific sub-agent if it belongs to the current user."""
+    """Delete a specific sub-agent if it belongs to the current user.
+
+    Sub-agents with more than ``ASYNC_DELETE_THRESHOLD`` skills (or any
+    sub-agent, if the client sends ``Prefer: respond-async``) are deleted by a
+    background job; the response is then a 202 with the job's ID.
+    """
     try:
         sub_agent_uuid = uuid.UUID(sub_agent_id)
     except ValueError:
@@ -133,7 +169,30 @@ def delete_sub_agent(
             detail="Sub-agent not found or access denied"
         )
 
-    session.delete(sub_agent)
-    session.commit()
+    skill_count = session.query(func.count(Skill.id)).filter(Skill.sub_agent_id == sub_agent.id).scalar()
+    if prefers_async(prefer) or skill_count > ASYNC_DELETE_THRESHOLD:
+        job = job_queue.enqueue("delete_sub_agent", current_user.id, {"sub_agent_id": str(sub_agent.id)})
+        return accepted_response(job, "Sub-agent deletion queued")
+
+    delete_sub_agent_cascade(session, sub_agent.id)
+
+    return {"message": "Sub-agent deleted successfully"}
+
+
+@job_queue.handler("delete_sub_agent")
+def run_delete_sub_agent(session: Session, job) -> dict:
+    """Background half of ``delete_sub_agent`` for sub-agents with many skills."""
+    sub_agent_uuid = uuid.UUID(job.payload["sub_agent_id"])
+    with shard_router.session_for(job.user_id) as shard_session:
+        owned = shard_session.query(SubAgent.id).filter(
+            SubAgent.id == sub_agent_uuid, SubAgent.user_id == job.user_id
+        ).first()
+        if owned is None:
+            return {"deleted": False, "skills_deleted": 0}
+
+        skills_deleted = delete_sub_agent_cascade(
+            shard_session, sub_agent_uuid,
+            on_progress=lambda deleted: job_queue.report_progress(job, {"skills_deleted": deleted}),
+        )
 
-    return {"message": "Sub-agent deleted successfully"}
\ No newline at end of file
+    return {"deleted": True, "skills_deleted": skills_deleted}
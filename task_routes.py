@@ -1,9 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from database import get_session
-from models import Task, TaskCreate, TaskRead, TaskUpdate
-from auth import get_current_user
-from typing import List
+from sharding import get_shard_session
+from fastapi.responses import StreamingResponse
+from models import ArchivedTask, ArchivedTaskRead, PositionMove, Task, TaskCreate, TaskRead, TaskUpdate
+from auth import get_current_principal
+from streaming import iter_json_array, iter_rows, stream_json_list
+from conditional import etag, is_not_modified, list_etag, not_modified, update_versioned
+from group_commit import run_write
+from positions import move, next_position
+from archive import archive_completed_tasks, archive_cutoff, restore_task
+from config import ARCHIVE_AFTER_DAYS
+from timestamps import naive_utc
+from datetime import datetime
+from typing import List, Optional
+import itertools
+from sqlmodel import select
 import uuid
 
 router = APIRouter(prefix="/api/tasks", tags=["Tasks"])
@@ -11,21 +22,63 @@ router = APIRouter(prefix="/api/tasks", tags=["Tasks"])
 
 @router.get("/", response_model=List[TaskRead])
 def get_tasks(
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    stream: bool = False,
+    updated_since: Optional[datetime] = None,
+    include_archived: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Get all tasks for the current user."""
-    tasks = session.query(Task).filter(Task.user_id == current_user.id).all()
+    """Get all tasks for the current user, in their manual order (see ``/{task_id}/move``).
+
+    Archived tasks (old completed ones, see archive.py) are left out unless
+    ``include_archived=true``, in which case they follow the active ones.
+
+    ``updated_since`` limits the list to tasks created or changed after that
+    time, for incremental sync (deletions are not reported). The response
+    carries an ``ETag``; sending it back in ``If-None-Match`` gets a 304 when
+    nothing changed, without the rows being loaded.
+
+    With ``stream=true`` the same JSON array is streamed straight from the
+    database cursor instead of being built in memory first.
+    """
+    statements = [(select(Task).where(Task.user_id == current_user.id).order_by(Task.position, Task.id), Task)]
+    if include_archived:
+        statements.append((
+            select(ArchivedTask).where(ArchivedTask.user_id == current_user.id)
+            .order_by(ArchivedTask.position, ArchivedTask.id),
+            ArchivedTask,
+        ))
+    if updated_since is not None:
+        statements = [
+            (statement.where(model.updated_at > naive_utc(updated_since)), model) for statement, model in statements
+        ]
+
+    tag = list_etag(session, *statements[0], *statements[1:])
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+
+    if stream:
+        rows = itertools.chain.from_iterable(iter_rows(session, statement) for statement, _ in statements)
+        streamed = StreamingResponse(iter_json_array(rows, TaskRead), media_type="application/json")
+        streamed.headers["ETag"] = tag
+        return streamed
+
+    response.headers["ETag"] = tag
+    tasks = []
+    for statement, _ in statements:
+        tasks.extend(session.execute(statement).scalars().all())
     return tasks
 
 
 @router.post("/", response_model=TaskRead)
 def create_task(
     task_data: TaskCreate,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Create a new task for the current user."""
+    """Create a new task for the current user, at the end of their list."""
     # Validate that title is provided
     if not task_data.title or not task_data.title.strip():
         raise HTTPException(
@@ -41,18 +94,86 @@ def create_task(
         user_id=current_user.id
     )
 
-    session.add(task)
-    session.commit()
-    session.refresh(task)
+    def insert(write_session: Session) -> Task:
+        task.position = next_position(write_session, Task, current_user.id)
+        write_session.add(task)
+        write_session.flush()  # RETURNING fills in the database-generated timestamps
+        return task
 
-    return task
+    return run_write(session, insert)
+
+
+@router.get("/archived", response_model=List[ArchivedTaskRead])
+def get_archived_tasks(
+    response: Response,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Get the current user's archived tasks, most recently archived first."""
+    statement = (
+        select(ArchivedTask)
+        .where(ArchivedTask.user_id == current_user.id)
+        .order_by(ArchivedTask.archived_at.desc())
+    )
+
+    tag = list_etag(session, statement, ArchivedTask)
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+
+    if stream:
+        streamed = stream_json_list(session, statement, ArchivedTaskRead)
+        streamed.headers["ETag"] = tag
+        return streamed
+
+    response.headers["ETag"] = tag
+    return session.execute(statement).scalars().all()
+
+
+@router.post("/archive")
+def archive_tasks(
+    older_than_days: int = Query(ARCHIVE_AFTER_DAYS, ge=0),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Archive the current user's completed tasks not updated for ``older_than_days`` days."""
+    archived = archive_completed_tasks(session, archive_cutoff(older_than_days), current_user.id)
+
+    return {"archived": archived}
+
+
+@router.post("/archived/{task_id}/restore", response_model=TaskRead)
+def restore_archived_task(
+    task_id: str,
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Move an archived task back to the active list."""
+    try:
+        task_uuid = uuid.UUID(task_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archived task not found"
+        )
+
+    if not restore_task(session, task_uuid, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archived task not found or access denied"
+        )
+
+    return session.get(Task, task_uuid)
 
 
 @router.get("/{task_id}", response_model=TaskRead)
 def get_task(
     task_id: str,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Get a specific task by ID if it belongs to the current user."""
     try:
@@ -71,6 +192,10 @@ def get_task(
             detail="Task not found or access denied"
         )
 
+    tag = etag(task.version)
+    if is_not_modified(if_none_match, tag):
+        return not_modified(tag)
+    response.headers["ETag"] = tag
     return task
 
 
@@ -78,10 +203,15 @@ def get_task(
 def update_task(
     task_id: str,
     task_data: TaskUpdate,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
-    """Update a specific task if it belongs to the current user."""
+    """Update a specific task if it belongs to the current user.
+
+    With ``If-Match`` the update only applies to the version the client last read.
+    """
     try:
         task_uuid = uuid.UUID(task_id)
     except ValueError:
@@ -99,25 +229,16 @@ def update_task(
         )
 
     # Update task fields if provided
-    if task_data.title is not None:
-        task.title = task_data.title
-    if task_data.description is not None:
-        task.description = task_data.description
-    if task_data.completed is not None:
-        task.completed = task_data.completed
-
-    session.add(task)
-    session.commit()
-    session.refresh(task)
+    values = task_data.model_dump(exclude_none=True)
 
-    return task
+    return update_versioned(session, task, values, if_match, response)
 
 
 @router.delete("/{task_id}")
 def delete_task(
     task_id: str,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Delete a specific task if it belongs to the current user."""
     try:
@@ -146,8 +267,10 @@ def delete_task(
 def toggle_task_completion(
     task_id: str,
     completed: bool,
-    current_user=Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
 ):
     """Toggle completion status of a specific task if it belongs to the current user."""
     try:
@@ -158,6 +281,42 @@ def toggle_task_completion(
             detail="Task not found"
         )
 
+    def toggle(write_session: Session) -> Task:
+        task = write_session.query(Task).filter(Task.id == task_uuid, Task.user_id == current_user.id).first()
+
+        if not task:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Task not found or access denied"
+            )
+
+        return update_versioned(write_session, task, {"completed": completed}, if_match, response, commit=False)
+
+    return run_write(session, toggle)
+
+@router.post("/{task_id}/move", response_model=TaskRead)
+def move_task(
+    task_id: str,
+    placement: PositionMove,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_principal),
+    session: Session = Depends(get_shard_session)
+):
+    """Move a task right after ``after_id`` and/or right before ``before_id`` in the current user's list.
+
+    Only the moved task is written (it gets a new position key between its
+    new neighbours'). With ``If-Match`` the move only applies to the version
+    the client last read.
+    """
+    try:
+        task_uuid = uuid.UUID(task_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+
     task = session.query(Task).filter(Task.id == task_uuid, Task.user_id == current_user.id).first()
 
     if not task:
@@ -166,10 +325,4 @@ def toggle_task_completion(
             detail="Task not found or access denied"
         )
 
-    task.completed = completed
-
-    session.add(task)
-    session.commit()
-    session.refresh(task)
-
-    return task
\ No newline at end of file
+    return move(session, task, placement.after_id, placement.before_id, current_user.id, if_match, response)
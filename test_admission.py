@@ -0,0 +1,186 @@
+"""Tests for adaptive admission control."""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from admission import AdmissionController, AdmissionMiddleware, ClassLimit, RouteClass
+from main import app
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def controller(max_concurrency=1, **kwargs):
+    limits = {
+        "read": ClassLimit(priority=0, max_limit=max_concurrency),
+        "auth": ClassLimit(priority=2, max_limit=max_concurrency),
+    }
+    classes = [RouteClass("auth", "/api/auth/"), RouteClass("read", "/api/", "GET")]
+    return AdmissionController(classes, limits, max_concurrency=max_concurrency, **kwargs)
+
+
+def test_requests_are_classified_by_route():
+    admission = AdmissionController()
+    assert admission.classify("POST", "/api/auth/login").name == "auth"
+    assert admission.classify("GET", "/api/tasks/").name == "read"
+    assert admission.classify("PUT", "/api/tasks/1").name == "write"
+    assert admission.classify("GET", "/metrics") is None
+
+
+def test_waiters_beyond_the_queue_are_shed_at_once():
+    admission = controller(max_queue=1, interval=0.2)
+    read = admission.states["read"]
+
+    async def scenario():
+        held = await admission.acquire(read)
+        waiting = asyncio.ensure_future(admission.acquire(read))
+        await asyncio.sleep(0)
+        assert await admission.acquire(read) is None  # queue full
+        admission.release(read, held)
+        return await waiting
+
+    assert asyncio.run(scenario()) is not None
+    assert read.shed == 1 and read.admitted == 2
+
+
+def test_queued_requests_time_out_sooner_once_overloaded():
+    admission = controller(target=0.005, interval=0.05)
+    read = admission.states["read"]
+
+    async def scenario():
+        held = await admission.acquire(read)
+        waiting = asyncio.ensure_future(admission.acquire(read))
+        await asyncio.sleep(0.06)
+        admission.release(read, held)
+        held = await waiting  # the only request to leave the queue this interval waited 60ms: standing
+        assert await admission.acquire(read) is None
+        await asyncio.sleep(0.01)
+        started = asyncio.get_running_loop().time()
+        assert await admission.acquire(read) is None
+        waited = asyncio.get_running_loop().time() - started
+        admission.release(read, held)
+        return waited
+
+    waited = asyncio.run(scenario())
+    assert read.overloaded and waited < 0.04
+
+
+def test_a_burst_on_a_healthy_class_is_queued_not_shed():
+    admission = controller(max_concurrency=2, target=0.005, interval=0.02)
+    read = admission.states["read"]
+
+    async def request():
+        admitted_at = await admission.acquire(read)
+        if admitted_at is None:
+            return False
+        await asyncio.sleep(0.1)  # five intervals, like a bcrypt login
+        admission.release(read, admitted_at)
+        return True
+
+    async def scenario():
+        return await asyncio.gather(*(request() for _ in range(3)))
+
+    assert asyncio.run(scenario()) == [True, True, True]
+    assert read.shed == 0 and read.admitted == 3
+
+
+def test_freed_slots_go_to_reads_before_auth():
+    admission = controller()
+    read, auth = admission.states["read"], admission.states["auth"]
+    order = []
+
+    async def wait(state):
+        admitted_at = await admission.acquire(state)
+        order.append(state.name)
+        admission.release(state, admitted_at)
+
+    async def scenario():
+        held = await admission.acquire(auth)
+        waiters = [asyncio.ensure_future(wait(auth)), asyncio.ensure_future(wait(read))]
+        await asyncio.sleep(0)
+        admission.release(auth, held)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(scenario())
+    assert order == ["read", "auth"]
+
+
+def test_limit_shrinks_when_service_time_rises_and_grows_when_saturated():
+    clock = Clock()
+    admission = controller(max_concurrency=10, interval=1.0, clock=clock)
+    read = admission.states["read"]
+    read.limit = 5.0
+
+    async def request(duration):
+        admitted_at = await admission.acquire(read)
+        clock.now += duration
+        admission.release(read, admitted_at)
+
+    async def scenario():
+        await request(0.01)
+        clock.now = 1.0
+        await request(0.01)  # first interval: sets the baseline
+        held = [await admission.acquire(read) for _ in range(5)]
+        saturated = asyncio.ensure_future(admission.acquire(read))
+        await asyncio.sleep(0)
+        for admitted_at in held:
+            admission.release(read, admitted_at)
+        admission.release(read, await saturated)
+        clock.now = 2.5
+        await request(0.01)  # a saturated interval at normal speed: +1
+        grown = read.limit
+        clock.now = 3.5
+        await request(0.5)  # much slower than the baseline...
+        clock.now = 4.5
+        await request(0.01)  # ...so the limit drops by a tenth once that interval ends
+        return grown
+
+    grown = asyncio.run(scenario())
+    assert grown == 6.0
+    assert read.limit == 6.0 * 0.9
+
+
+def test_middleware_sheds_with_503():
+    admission = controller(max_queue=0)
+
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def request(middleware):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/api/tasks/", "query_string": b"", "headers": []}
+        await middleware(scope, receive, send)
+        return messages[0]
+
+    async def scenario():
+        middleware = AdmissionMiddleware(endpoint, admission)
+        admitted = await request(middleware)
+        held = await admission.acquire(admission.states["read"])
+        shed = await request(middleware)
+        admission.release(admission.states["read"], held)
+        return admitted, shed
+
+    admitted, shed = asyncio.run(scenario())
+    assert admitted["status"] == 200
+    assert shed["status"] == 503 and (b"retry-after", b"1") in shed["headers"]
+
+
+def test_metrics_endpoint_reports_admission():
+    with TestClient(app, client=("10.0.49.1", 50000)) as client:
+        client.get("/api/tasks/")
+        admission = client.get("/metrics").json()["admission"]
+    assert set(admission["classes"]) == {"read", "write", "auth"}
+    assert admission["classes"]["read"]["admitted"] >= 1
@@ -0,0 +1,88 @@
+"""Tests for archiving completed tasks out of the hot table."""
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from archive import archive_completed_tasks
+from database import engine
+from models import ArchivedTask, Task
+
+
+def age(task_ids, days):
+    with Session(engine) as session:
+        session.execute(
+            update(Task).where(Task.id.in_(task_ids)).values(updated_at=datetime.utcnow() - timedelta(days=days))
+        )
+        session.commit()
+
+
+def test_old_completed_tasks_move_to_the_archive(client, auth_headers):
+    old_done = client.post("/api/tasks/", json={"title": "old done", "completed": True}, headers=auth_headers).json()
+    old_open = client.post("/api/tasks/", json={"title": "old open"}, headers=auth_headers).json()
+    new_done = client.post("/api/tasks/", json={"title": "new done", "completed": True}, headers=auth_headers).json()
+    age([uuid.UUID(old_done["id"]), uuid.UUID(old_open["id"])], days=100)
+    before = client.get("/api/tasks/", headers=auth_headers).headers["ETag"]
+
+    assert client.post("/api/tasks/archive?older_than_days=30", headers=auth_headers).json() == {"archived": 1}
+
+    active = client.get("/api/tasks/", headers=auth_headers)
+    assert {t["id"] for t in active.json()} == {old_open["id"], new_done["id"]}
+    assert active.headers["ETag"] != before
+    assert client.get(f"/api/tasks/{old_done['id']}", headers=auth_headers).status_code == 404
+
+    everything = client.get("/api/tasks/?include_archived=true", headers=auth_headers).json()
+    assert [t["id"] for t in everything][-1] == old_done["id"]
+    streamed = client.get("/api/tasks/?include_archived=true&stream=true", headers=auth_headers).json()
+    assert streamed == everything
+
+    archived = client.get("/api/tasks/archived", headers=auth_headers).json()
+    assert [t["id"] for t in archived] == [old_done["id"]]
+    assert archived[0]["title"] == "old done" and archived[0]["archived_at"]
+
+
+def test_restore_moves_a_task_back(client, auth_headers, user_headers):
+    other = user_headers(client)
+    task = client.post("/api/tasks/", json={"title": "restore me", "completed": True}, headers=auth_headers).json()
+    age([uuid.UUID(task["id"])], days=100)
+    client.post("/api/tasks/archive", headers=auth_headers)
+
+    assert client.post(f"/api/tasks/archived/{task['id']}/restore", headers=other).status_code == 404
+    restored = client.post(f"/api/tasks/archived/{task['id']}/restore", headers=auth_headers)
+    assert restored.status_code == 200
+    assert restored.json()["created_at"] == task["created_at"]
+    assert client.get("/api/tasks/archived", headers=auth_headers).json() == []
+    assert client.get(f"/api/tasks/{task['id']}", headers=auth_headers).status_code == 200
+
+
+def test_restore_counts_as_an_update(client, auth_headers):
+    task = client.post("/api/tasks/", json={"title": "restore me", "completed": True}, headers=auth_headers).json()
+    age([uuid.UUID(task["id"])], days=100)
+    client.post("/api/tasks/archive", headers=auth_headers)
+    checkpoint = client.post("/api/tasks/", json={"title": "marker"}, headers=auth_headers).json()["updated_at"]
+    time.sleep(0.01)
+
+    restored = client.post(f"/api/tasks/archived/{task['id']}/restore", headers=auth_headers).json()
+    assert restored["version"] == task["version"] + 1
+    assert restored["updated_at"] > checkpoint
+    changed = client.get("/api/tasks/", params={"updated_since": checkpoint}, headers=auth_headers).json()
+    assert [t["id"] for t in changed] == [task["id"]]
+    # It is not old any more, so the next archive run leaves it alone.
+    assert client.post("/api/tasks/archive", headers=auth_headers).json() == {"archived": 0}
+
+
+def test_archive_runs_in_chunks_across_users(client, user_headers):
+    tokens = [user_headers(client) for _ in range(2)]
+    ids = []
+    for headers in tokens:
+        for i in range(3):
+            task = client.post("/api/tasks/", json={"title": f"t{i}", "completed": True}, headers=headers).json()
+            ids.append(uuid.UUID(task["id"]))
+    age(ids, days=400)
+
+    with Session(engine) as session:
+        assert archive_completed_tasks(session, datetime.utcnow() - timedelta(days=365), chunk_size=2) >= 6
+        assert session.exec(select(Task).where(Task.id.in_(ids))).all() == []
+        assert len(session.exec(select(ArchivedTask).where(ArchivedTask.id.in_(ids))).all()) == 6
@@ -0,0 +1,42 @@
+"""Tests for the single-request workspace bootstrap endpoint."""
+
+
+def test_bootstrap_matches_the_list_endpoints(client, auth_headers):
+    client.post("/api/tasks/", json={"title": "task"}, headers=auth_headers)
+    busy = client.post("/api/sub-agents/", json={"name": "busy"}, headers=auth_headers).json()
+    idle = client.post("/api/sub-agents/", json={"name": "idle"}, headers=auth_headers).json()
+    for name in ("a", "b"):
+        client.post("/api/skills/", json={"name": name, "sub_agent_id": busy["id"]}, headers=auth_headers)
+
+    response = client.get("/api/bootstrap", headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["tasks"] == client.get("/api/tasks/", headers=auth_headers).json()
+    assert body["skills"] == client.get("/api/skills/", headers=auth_headers).json()
+    counts = {sub_agent["id"]: sub_agent["skill_count"] for sub_agent in body["sub_agents"]}
+    assert counts == {busy["id"]: 2, idle["id"]: 0}
+
+    streamed = client.get("/api/bootstrap?stream=true", headers=auth_headers)
+    assert streamed.json() == body
+    assert streamed.headers["ETag"] == response.headers["ETag"]
+
+
+def test_bootstrap_etag_changes_with_any_list(client, auth_headers):
+    sub_agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    tag = client.get("/api/bootstrap", headers=auth_headers).headers["ETag"]
+
+    cached = client.get("/api/bootstrap", headers={**auth_headers, "If-None-Match": tag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == tag
+
+    client.post("/api/skills/", json={"name": "new", "sub_agent_id": sub_agent["id"]}, headers=auth_headers)
+    changed = client.get("/api/bootstrap", headers={**auth_headers, "If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.json()["sub_agents"][0]["skill_count"] == 1
+
+
+def test_bootstrap_is_scoped_to_the_user(client, user_headers):
+    owner, other = user_headers(client), user_headers(client)
+    client.post("/api/tasks/", json={"title": "private"}, headers=owner)
+    assert client.get("/api/bootstrap", headers=other).json() == {"tasks": [], "sub_agents": [], "skills": []}
+    assert client.get("/api/bootstrap").status_code in (401, 403)
@@ -0,0 +1,45 @@
+"""Tests for set-based cascading deletes."""
+import uuid
+
+from sqlalchemy import func, insert
+from sqlmodel import Session
+
+from cascades import delete_sub_agent_cascade
+from database import engine
+from models import Skill
+
+
+def count_skills(session, sub_agent_id):
+    return session.query(func.count(Skill.id)).filter(Skill.sub_agent_id == sub_agent_id).scalar()
+
+
+def test_delete_sub_agent_removes_its_skills(client, auth_headers):
+    agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    client.post("/api/skills/", json={"name": "skill", "sub_agent_id": agent["id"]}, headers=auth_headers)
+
+    response = client.delete(f"/api/sub-agents/{agent['id']}", headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/api/skills/", headers=auth_headers).json() == []
+
+
+def test_chunked_delete_reports_progress(client, auth_headers):
+    agent_id = uuid.UUID(client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()["id"])
+    with Session(engine) as session:
+        session.execute(insert(Skill), [{"name": f"s{i}", "sub_agent_id": agent_id} for i in range(25)])
+        session.commit()
+
+        progress = []
+        assert delete_sub_agent_cascade(session, agent_id, chunk_size=10, on_progress=progress.append) == 25
+        assert progress == [10, 20, 25]
+        assert count_skills(session, agent_id) == 0
+
+
+def test_delete_account_removes_everything(client, auth_headers):
+    client.post("/api/tasks/", json={"title": "task"}, headers=auth_headers)
+    agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    client.post("/api/skills/", json={"name": "skill", "sub_agent_id": agent["id"]}, headers=auth_headers)
+
+    response = client.delete("/api/auth/me", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["deleted"] == {"skills": 1, "sub_agents": 1, "tasks": 1, "archived_tasks": 0, "jobs": 0}
+    assert client.get("/api/tasks/", headers=auth_headers).status_code == 401
@@ -0,0 +1,88 @@
+"""Tests for single-flight coalescing of identical reads."""
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+
+from coalescing import CoalescingMiddleware, CoalescingStats
+from main import app
+
+
+def make_app(calls, streamed=False):
+    async def endpoint(scope, receive, send):
+        calls.append(scope["query_string"])
+        await asyncio.sleep(0.05)
+        headers = [] if streamed else [(b"content-length", b"2")]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"[]"})
+    return endpoint
+
+
+def scope(query=b"", token=b"Bearer a", method="GET"):
+    return {
+        "type": "http", "method": method, "path": "/api/tasks/",
+        "query_string": query, "headers": [(b"authorization", token)],
+    }
+
+
+async def request(middleware, request_scope):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(request_scope, receive, send)
+    return messages[0]["status"], messages[-1]["body"]
+
+
+def run_burst(middleware, scopes):
+    async def burst():
+        return await asyncio.gather(*(request(middleware, s) for s in scopes))
+    return asyncio.run(burst())
+
+
+def test_identical_concurrent_reads_share_one_execution():
+    calls, stats = [], CoalescingStats()
+    middleware = CoalescingMiddleware(make_app(calls), stats=stats)
+
+    responses = run_burst(middleware, [scope(b"a=1&b=2"), scope(b"b=2&a=1"), scope(b"a=1&b=2")])
+
+    assert responses == [(200, b"[]")] * 3
+    assert len(calls) == 1
+    assert (stats.leaders, stats.coalesced) == (1, 2)
+
+
+def test_different_credentials_or_params_are_not_shared():
+    calls = []
+    middleware = CoalescingMiddleware(make_app(calls), stats=CoalescingStats())
+
+    run_burst(middleware, [scope(b"a=1"), scope(b"a=2"), scope(b"a=1", token=b"Bearer b")])
+
+    assert len(calls) == 3
+
+
+def test_streamed_responses_are_not_shared():
+    calls, stats = [], CoalescingStats()
+    middleware = CoalescingMiddleware(make_app(calls, streamed=True), stats=stats)
+
+    run_burst(middleware, [scope(), scope()])
+
+    assert len(calls) == 2
+    assert stats.fallbacks == 1
+
+
+def test_metrics_endpoint_reports_coalescing():
+    with TestClient(app, client=("10.0.38.1", 50000)) as client:
+        response = client.post(
+            "/api/auth/signup",
+            json={"email": f"coalesce_{uuid.uuid4().hex[:8]}@example.com", "password": "secure123"},
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        assert client.get("/api/tasks/", headers=headers).status_code == 200
+
+        counters = client.get("/metrics").json()["coalescing"]
+        assert counters["leaders"] >= 1
+        assert set(counters) == {"leaders", "coalesced", "fallbacks"}
@@ -0,0 +1,85 @@
+"""Tests for response compression and streamed list responses."""
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, parse_accept_encoding
+
+
+def make_client(**kwargs):
+    small_app = FastAPI()
+
+    @small_app.get("/big")
+    def big():
+        return [{"title": f"task {i}", "completed": False} for i in range(500)]
+
+    @small_app.get("/small")
+    def small():
+        return {"ok": True}
+
+    small_app.add_middleware(CompressionMiddleware, **kwargs)
+    return TestClient(small_app)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, deflate, br;q=0") == {"gzip", "deflate"}
+    assert parse_accept_encoding("") == set()
+
+
+def test_prefers_brotli():
+    pytest.importorskip("brotli")
+    client = make_client(encodings=["br", "gzip"])
+    response = client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+
+
+def test_falls_back_to_gzip():
+    # Without brotli installed, "br" is dropped from the encodings.
+    client = make_client(encodings=["br", "gzip"])
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()[0] == {"title": "task 0", "completed": False}
+
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_gzip_bodies_decode():
+    client = make_client(encodings=["gzip"], gzip_level=1)
+
+    raw = client.get("/big", headers={"Accept-Encoding": "identity"}).content
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "gzip"}) as response:
+        assert gzip.decompress(b"".join(response.iter_raw())) == raw
+
+
+def test_brotli_bodies_decode():
+    brotli = pytest.importorskip("brotli")
+    client = make_client(encodings=["br"], brotli_quality=1)
+
+    raw = client.get("/big", headers={"Accept-Encoding": "identity"}).content
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "br"}) as response:
+        assert brotli.decompress(b"".join(response.iter_raw())) == raw
+
+
+def test_small_responses_are_not_compressed():
+    client = make_client(minimum_size=1024)
+    response = client.get("/small", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_lists_match_regular_lists(client, auth_headers):
+    for i in range(3):
+        client.post("/api/tasks/", json={"title": f"task {i}"}, headers=auth_headers)
+    agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    client.post("/api/skills/", json={"name": "skill", "sub_agent_id": agent["id"]}, headers=auth_headers)
+
+    for path in ("/api/tasks/", f"/api/skills/?sub_agent_id={agent['id']}"):
+        regular = client.get(path, headers=auth_headers).json()
+        separator = "&" if "?" in path else "?"
+        streamed = client.get(f"{path}{separator}stream=true", headers=auth_headers)
+        assert streamed.status_code == 200
+        assert streamed.json() == regular
+    assert len(client.get("/api/tasks/", headers=auth_headers).json()) == 3
@@ -0,0 +1,28 @@
+"""Tests for the streaming export endpoint."""
+import csv
+import io
+import json
+
+
+def test_export_ndjson_and_csv(client, auth_headers, user_headers):
+    other_headers = user_headers(client)
+    client.post("/api/tasks/", json={"title": "mine"}, headers=auth_headers)
+    client.post("/api/tasks/", json={"title": "not mine"}, headers=other_headers)
+    agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    client.post("/api/skills/", json={"name": "skill", "sub_agent_id": agent["id"]}, headers=auth_headers)
+
+    response = client.get("/api/export?format=ndjson", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["type"] for r in records] == ["task", "sub_agent", "skill"]
+    assert records[0]["title"] == "mine"
+    assert records[2]["sub_agent_id"] == agent["id"]
+
+    response = client.get("/api/export?format=csv", headers=auth_headers)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(r["type"], r["id"]) for r in rows] == [(r["type"], r["id"]) for r in records]
+
+    assert client.get("/api/export?format=xml", headers=auth_headers).status_code == 422
+    assert client.get("/api/export").status_code in (401, 403)
@@ -0,0 +1,125 @@
+"""Tests for group commit of concurrent writes."""
+import threading
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from database import create_db_and_tables, engine
+from group_commit import WriteBatcher, write_batcher
+from main import app
+from models import Task, User
+
+
+@pytest.fixture
+def user_id():
+    create_db_and_tables()
+    with Session(engine) as session:
+        user = User(email=f"group_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        return user.id
+
+
+def concurrently(*calls):
+    """Run ``calls`` on separate threads at once; returns their results or exceptions."""
+    results = [None] * len(calls)
+    start = threading.Barrier(len(calls))
+
+    def run(index, call):
+        start.wait()
+        try:
+            results[index] = call()
+        except Exception as exc:
+            results[index] = exc
+
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def insert(task_id, user_id):
+    def operation(session):
+        session.add(Task(id=task_id, title="grouped", user_id=user_id))
+        session.flush()
+        return task_id
+    return operation
+
+
+def test_concurrent_writes_share_commits(user_id):
+    batcher = WriteBatcher(max_batch=50, max_delay=0.05)
+    batcher.start()
+    try:
+        ids = [uuid.uuid4() for _ in range(40)]
+        calls = [lambda task_id=task_id: batcher.submit(engine, insert(task_id, user_id)) for task_id in ids]
+        results = concurrently(*calls)
+    finally:
+        batcher.stop()
+
+    assert results == ids
+    assert batcher.stats.writes == 40 and batcher.stats.batches < 40
+    with Session(engine) as session:
+        assert len(session.exec(select(Task.id).where(Task.id.in_(ids))).all()) == 40
+
+
+def test_failures_only_affect_their_own_request(user_id):
+    existing = uuid.uuid4()
+    with Session(engine) as session:
+        session.add(Task(id=existing, title="already there", user_id=user_id))
+        session.commit()
+
+    def not_found(session):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    batcher = WriteBatcher(max_batch=10, max_delay=0.2)
+    batcher.start()
+    try:
+        good = uuid.uuid4()
+        results = concurrently(
+            lambda: batcher.submit(engine, insert(good, user_id)),
+            lambda: batcher.submit(engine, insert(existing, user_id)),
+            lambda: batcher.submit(engine, not_found),
+        )
+    finally:
+        batcher.stop()
+
+    assert results[0] == good
+    assert isinstance(results[1], IntegrityError)
+    assert isinstance(results[2], HTTPException) and results[2].status_code == 404
+    assert batcher.stats.batches == 1 and batcher.stats.retried == 1
+    with Session(engine) as session:
+        assert session.get(Task, good) is not None
+
+
+def test_task_endpoints_use_the_batcher():
+    write_batcher.start()
+    try:
+        with TestClient(app, client=("10.0.45.1", 50000)) as client:
+            response = client.post(
+                "/api/auth/signup",
+                json={"email": f"group_{uuid.uuid4().hex[:8]}@example.com", "password": "secure123"},
+            )
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            writes = write_batcher.stats.writes
+
+            task = client.post("/api/tasks/", json={"title": "batched"}, headers=headers).json()
+            assert task["version"] == 1 and task["created_at"]
+            toggled = client.patch(f"/api/tasks/{task['id']}/complete?completed=true", headers=headers)
+            assert toggled.json()["completed"] is True
+            assert toggled.headers["ETag"] == '"2"'
+
+            stale = client.patch(
+                f"/api/tasks/{task['id']}/complete?completed=false", headers={**headers, "If-Match": '"1"'}
+            )
+            assert stale.status_code == 412
+            missing = client.patch(f"/api/tasks/{uuid.uuid4()}/complete?completed=true", headers=headers)
+            assert missing.status_code == 404
+            assert write_batcher.stats.writes == writes + 4
+    finally:
+        write_batcher.stop()
@@ -0,0 +1,54 @@
+"""Tests for Idempotency-Key replay on create endpoints."""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from database import engine
+from idempotency import DatabaseStore
+
+
+def test_retried_create_is_replayed(client, user_headers):
+    headers = {**user_headers(client), "Idempotency-Key": "create-1"}
+    first = client.post("/api/tasks/", json={"title": "once"}, headers=headers)
+    retry = client.post("/api/tasks/", json={"title": "once"}, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get("/api/tasks/", headers=headers).json()) == 1
+
+    mismatch = client.post("/api/tasks/", json={"title": "other"}, headers=headers)
+    assert mismatch.status_code == 422
+
+
+def test_concurrent_duplicates_run_once(client, user_headers):
+    headers = {**user_headers(client), "Idempotency-Key": "burst"}
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        responses = list(pool.map(
+            lambda _: client.post("/api/sub-agents/", json={"name": "agent"}, headers=headers), range(5)
+        ))
+
+    assert {response.json()["id"] for response in responses} == {responses[0].json()["id"]}
+    assert len(client.get("/api/sub-agents/", headers=headers).json()) == 1
+
+
+def test_keys_are_scoped_per_user(client, user_headers):
+    alice, bob = user_headers(client), user_headers(client)
+    a = client.post("/api/tasks/", json={"title": "t"}, headers={**alice, "Idempotency-Key": "same"})
+    b = client.post("/api/tasks/", json={"title": "t"}, headers={**bob, "Idempotency-Key": "same"})
+    assert a.json()["id"] != b.json()["id"]
+    assert "Idempotent-Replayed" not in b.headers
+
+
+def test_database_store_claims_once_and_expires(client):
+    store = DatabaseStore(engine, ttl=60)
+    key = uuid.uuid4().hex
+    assert store.begin(key, "fp") is None
+    assert store.begin(key, "fp").status_code is None
+
+    store.complete(key, 201, [("content-type", "application/json")], b"{}")
+    stored = store.begin(key, "fp")
+    assert (stored.status_code, stored.headers, stored.body) == (201, [("content-type", "application/json")], b"{}")
+
+    store.release(key)
+    assert store.begin(key, "fp", now=time.time()) is None
@@ -0,0 +1,53 @@
+"""Tests for time-ordered ids, binary id storage and the id conversion tool."""
+import sqlite3
+import time
+import uuid
+
+from sqlalchemy import Column, MetaData, Table, create_engine, insert, select
+
+from convert_ids import convert_table, to_binary, to_text
+from ids import BinaryUUID, uuid7
+
+
+def test_uuid7_is_versioned_time_ordered_and_unique():
+    before = int(time.time() * 1000)
+    ids = [uuid7() for _ in range(10_000)]
+    after = int(time.time() * 1000)
+
+    assert all(value.version == 7 and value.variant == uuid.RFC_4122 for value in ids)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert before <= ids[0].int >> 80 <= after + 1
+
+
+def test_binary_uuid_round_trips_as_16_bytes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ids.db'}")
+    table = Table("things", MetaData(), Column("id", BinaryUUID, primary_key=True))
+    table.metadata.create_all(engine)
+    value = uuid7()
+
+    with engine.begin() as connection:
+        connection.execute(insert(table).values(id=value))
+        assert connection.execute(select(table.c.id).where(table.c.id == value)).scalar() == value
+
+    raw = sqlite3.connect(tmp_path / "ids.db").execute("SELECT typeof(id), length(id) FROM things").fetchone()
+    assert raw == ("blob", 16)
+
+
+def test_convert_table_is_reversible_and_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'convert.db'}")
+    ids = [uuid.uuid4() for _ in range(7)]
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE things (id CHAR(32) PRIMARY KEY, parent_id CHAR(32))")
+        for value in ids:
+            connection.exec_driver_sql("INSERT INTO things VALUES (?, ?)", (value.hex, ids[0].hex))
+
+    with engine.begin() as connection:
+        assert convert_table(connection, "things", ["id", "parent_id"], to_binary, chunk_size=3) == 7
+        assert convert_table(connection, "things", ["id", "parent_id"], to_binary, chunk_size=3) == 0
+        stored = [row[0] for row in connection.exec_driver_sql("SELECT id FROM things ORDER BY rowid")]
+        assert stored == [value.bytes for value in ids]
+
+        convert_table(connection, "things", ["id", "parent_id"], to_text, chunk_size=3)
+        stored = [row[0] for row in connection.exec_driver_sql("SELECT id FROM things ORDER BY rowid")]
+        assert stored == [value.hex for value in ids]
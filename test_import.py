@@ -0,0 +1,40 @@
+"""Tests for the streaming NDJSON import endpoint."""
+import json
+
+
+def test_import_round_trips_an_export(client, auth_headers):
+    lines = [
+        {"type": "sub_agent", "id": "agent-1", "name": "researcher"},
+        {"type": "skill", "sub_agent_id": "agent-1", "name": "search"},
+        {"type": "task", "title": "first", "completed": True},
+        {"type": "task", "title": ""},
+        {"type": "skill", "sub_agent_id": "agent-unknown", "name": "orphan"},
+        {"type": "note", "text": "?"},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+
+    response = client.post("/api/import", content=body.encode(), headers=auth_headers)
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["imported"] == {"task": 1, "sub_agent": 1, "skill": 1}
+    assert [error["line"] for error in summary["errors"]] == [4, 5, 6, 7]
+
+    agents = client.get("/api/sub-agents/", headers=auth_headers).json()
+    skills = client.get("/api/skills/", headers=auth_headers).json()
+    assert skills[0]["sub_agent_id"] == agents[0]["id"]
+
+    # Re-importing the user's own export duplicates everything, referencing the new sub-agents.
+    export = client.get("/api/export?format=ndjson", headers=auth_headers).content
+    summary = client.post("/api/import", content=export, headers=auth_headers).json()
+    assert summary["imported"] == {"task": 1, "sub_agent": 1, "skill": 1}
+    assert summary["error_count"] == 0
+    assert len(client.get("/api/skills/", headers=auth_headers).json()) == 2
+
+
+def test_import_flushes_in_chunks(client, auth_headers, monkeypatch):
+    monkeypatch.setattr("importer.IMPORT_CHUNK_SIZE", 10)
+    body = "".join(json.dumps({"type": "task", "title": f"t{i}"}) + "\n" for i in range(25))
+
+    summary = client.post("/api/import", content=body.encode(), headers=auth_headers).json()
+    assert summary["imported"]["task"] == 25
+    assert summary["chunks"] == 3
@@ -0,0 +1,81 @@
+"""Tests for the background job queue and the endpoints that use it."""
+import json
+import time
+import uuid
+
+from database import create_db_and_tables, engine
+from jobs import JobQueue
+from models import Job, User
+from sqlmodel import Session
+
+
+def wait_for_job(client, headers, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_async_sub_agent_delete_returns_202(client, auth_headers, user_headers):
+    agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+
+    response = client.delete(
+        f"/api/sub-agents/{agent['id']}", headers={**auth_headers, "Prefer": "respond-async"}
+    )
+    assert response.status_code == 202
+    assert response.headers["location"] == f"/api/jobs/{response.json()['job_id']}"
+
+    job = wait_for_job(client, auth_headers, response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert client.get(f"/api/sub-agents/{agent['id']}", headers=auth_headers).status_code == 404
+    assert [j["id"] for j in client.get("/api/jobs/", headers=auth_headers).json()] == [job["id"]]
+    assert client.get(f"/api/jobs/{job['id']}", headers=user_headers(client)).status_code == 404
+
+
+def test_async_import_reports_progress(client, auth_headers):
+    body = "".join(json.dumps({"type": "task", "title": f"t{i}"}) + "\n" for i in range(5))
+
+    response = client.post(
+        "/api/import", content=body.encode(), headers={**auth_headers, "Prefer": "respond-async"}
+    )
+    assert response.status_code == 202
+
+    job = wait_for_job(client, auth_headers, response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["imported"]["task"] == 5
+    assert job["progress"]["imported"]["task"] == 5
+    assert len(client.get("/api/tasks/", headers=auth_headers).json()) == 5
+
+
+def test_failed_jobs_are_retried_then_marked_failed():
+    create_db_and_tables()
+    queue = JobQueue(engine)
+    calls = []
+
+    @queue.handler("flaky")
+    def flaky(session, job):
+        calls.append(job.attempts)
+        raise RuntimeError("boom")
+
+    with Session(engine) as session:
+        user = User(email=f"jobs_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        job = session.get(Job, queue.enqueue("flaky", user.id, {}, max_attempts=2).id)
+
+        assert queue.run_once()
+        session.refresh(job)
+        assert (job.status, job.attempts) == ("queued", 1)
+
+        # Skip the backoff delay.
+        job.run_after = job.created_at
+        session.add(job)
+        session.commit()
+        assert queue.run_once()
+        session.refresh(job)
+        assert (job.status, job.attempts) == ("failed", 2)
+        assert job.error == "RuntimeError: boom"
+        assert calls == [1, 2]
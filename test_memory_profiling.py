@@ -0,0 +1,64 @@
+"""Tests for the memory profiling admin endpoints."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import admin_routes
+from memory_profiling import memory_profiler
+from models import Task
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(admin_routes, "ADMIN_TOKEN", ADMIN["X-Admin-Token"])
+    app = FastAPI()
+    app.include_router(admin_routes.router)
+    with TestClient(app) as client:
+        yield client
+    memory_profiler.stop()
+
+
+def test_endpoints_require_the_admin_token(client):
+    assert client.get("/api/admin/memory").status_code == 403
+    assert client.post("/api/admin/memory/start", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+def test_endpoints_are_closed_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(admin_routes, "ADMIN_TOKEN", None)
+    assert client.get("/api/admin/memory", headers=ADMIN).status_code == 403
+
+
+def test_snapshot_diff_points_at_the_growing_site(client):
+    assert client.post("/api/admin/memory/snapshot", headers=ADMIN).status_code == 409
+
+    started = client.post("/api/admin/memory/start", headers=ADMIN).json()
+    assert started["tracing"] is True
+    retained = [bytearray(1024) for _ in range(1000)]
+    diff = client.post("/api/admin/memory/snapshot?limit=50", headers=ADMIN).json()
+
+    assert diff["size_diff_kb"] > 900
+    grown = [stat for stat in diff["top"] if "test_memory_profiling.py" in stat["sites"][0]]
+    assert grown and grown[0]["size_diff_kb"] > 900 and grown[0]["count_diff"] >= 1000
+
+    # The next diff is against the previous snapshot, so the same memory no longer shows as growth.
+    diff = client.post("/api/admin/memory/snapshot?limit=50", headers=ADMIN).json()
+    assert not any("test_memory_profiling.py" in stat["sites"][0] and stat["size_diff_kb"] > 900 for stat in diff["top"])
+    del retained
+
+    stopped = client.post("/api/admin/memory/stop", headers=ADMIN).json()
+    assert stopped["tracing"] is False and "traced_kb" not in stopped
+
+
+def test_snapshot_rejects_unknown_key_type(client):
+    client.post("/api/admin/memory/start", headers=ADMIN)
+    response = client.post("/api/admin/memory/snapshot?key_type=module", headers=ADMIN)
+    assert response.status_code == 422
+
+
+def test_status_counts_live_orm_objects(client):
+    tasks = [Task(title=f"task {i}") for i in range(3)]
+    status = client.get("/api/admin/memory?objects=true", headers=ADMIN).json()
+    assert status["tracing"] is False
+    assert status["objects"]["Task"] >= len(tasks)
@@ -0,0 +1,41 @@
+"""Tests for If-Match / version checks on updates."""
+
+
+def test_task_update_with_stale_if_match_is_rejected(client, auth_headers):
+    task = client.post("/api/tasks/", json={"title": "original"}, headers=auth_headers).json()
+    assert task["version"] == 1
+
+    fetched = client.get(f"/api/tasks/{task['id']}", headers=auth_headers)
+    tag = fetched.headers["ETag"]
+
+    first = client.put(f"/api/tasks/{task['id']}", json={"title": "device A"},
+                       headers={**auth_headers, "If-Match": tag})
+    assert first.status_code == 200
+    assert first.json()["version"] == 2
+    assert first.headers["ETag"] == '"2"'
+
+    second = client.put(f"/api/tasks/{task['id']}", json={"title": "device B"},
+                        headers={**auth_headers, "If-Match": tag})
+    assert second.status_code == 412
+    assert second.headers["ETag"] == '"2"'
+    assert client.get(f"/api/tasks/{task['id']}", headers=auth_headers).json()["title"] == "device A"
+
+    toggled = client.patch(f"/api/tasks/{task['id']}/complete?completed=true",
+                           headers={**auth_headers, "If-Match": '"2"'})
+    assert toggled.status_code == 200
+    assert toggled.json()["version"] == 3
+
+
+def test_updates_without_if_match_still_bump_the_version(client, auth_headers):
+    agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    updated = client.put(f"/api/sub-agents/{agent['id']}", json={"name": "renamed"}, headers=auth_headers)
+    assert updated.status_code == 200
+    assert updated.json()["version"] == 2
+
+    skill = client.post("/api/skills/", json={"name": "skill", "sub_agent_id": agent["id"]},
+                        headers=auth_headers).json()
+    stale = client.put(f"/api/skills/{skill['id']}", json={"name": "x"},
+                       headers={**auth_headers, "If-Match": '"7"'})
+    assert stale.status_code == 412
+    assert client.put(f"/api/skills/{skill['id']}", json={"name": "x"},
+                      headers={**auth_headers, "If-Match": "*"}).json()["version"] == 2
@@ -0,0 +1,187 @@
+"""Tests for fractional-index manual ordering of tasks and skills."""
+import csv
+import io
+import json
+import random
+import uuid
+
+import pytest
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+import positions
+from database import create_db_and_tables, engine
+from models import ArchivedTask, Task, User
+from positions import key_between, keys_after, rebalance
+
+
+def titles(client, headers):
+    return [task["title"] for task in client.get("/api/tasks/", headers=headers).json()]
+
+
+def test_key_between_sorts_between_its_bounds():
+    keys = [key_between(None, None)]
+    rng = random.Random(46)
+    for _ in range(500):
+        index = rng.randrange(len(keys) + 1)
+        lower = keys[index - 1] if index else None
+        upper = keys[index] if index < len(keys) else None
+        key = key_between(lower, upper)
+        assert (lower is None or lower < key) and (upper is None or key < upper)
+        keys.insert(index, key)
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+    with pytest.raises(ValueError):
+        key_between("a1", "a0")
+
+
+def test_appended_keys_stay_short():
+    keys = keys_after(None, 10000)
+    assert keys == sorted(keys)
+    assert max(len(key) for key in keys) <= 4
+
+
+def test_rebalance_shortens_keys_and_keeps_order():
+    create_db_and_tables()
+    with Session(engine) as session:
+        user = User(email=f"positions_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        lower, upper = keys_after(None, 2)
+        keys = []
+        for _ in range(40):
+            # Always inserting right after the first row makes keys grow quickly.
+            upper = key_between(lower, upper)
+            keys.append(upper)
+        tasks = [Task(title=key, user_id=user.id, position=key) for key in keys]
+        session.add_all(tasks)
+        session.commit()
+        expected = sorted(keys)
+
+        assert rebalance(session, Task, user.id) == 40
+        rows = session.exec(select(Task).where(Task.user_id == user.id).order_by(Task.position)).all()
+        assert [task.title for task in rows] == expected
+        assert all(len(task.position) <= 3 and task.version == 2 for task in rows)
+
+
+def test_move_updates_only_the_moved_task(client, auth_headers, user_headers):
+    ids = {}
+    for title in "abcd":
+        ids[title] = client.post("/api/tasks/", json={"title": title}, headers=auth_headers).json()["id"]
+    assert titles(client, auth_headers) == ["a", "b", "c", "d"]
+    before = {task["id"]: task["version"] for task in client.get("/api/tasks/", headers=auth_headers).json()}
+
+    moved = client.post(f"/api/tasks/{ids['d']}/move", json={"after_id": ids["a"]}, headers=auth_headers)
+    assert moved.status_code == 200 and moved.headers["ETag"] == '"2"'
+    assert titles(client, auth_headers) == ["a", "d", "b", "c"]
+    after = {task["id"]: task["version"] for task in client.get("/api/tasks/", headers=auth_headers).json()}
+    assert {task_id for task_id in after if after[task_id] != before[task_id]} == {ids["d"]}
+
+    client.post(f"/api/tasks/{ids['a']}/move", json={"before_id": None, "after_id": ids["c"]}, headers=auth_headers)
+    client.post(f"/api/tasks/{ids['b']}/move", json={"before_id": ids["d"]}, headers=auth_headers)
+    assert titles(client, auth_headers) == ["b", "d", "c", "a"]
+    between = client.post(
+        f"/api/tasks/{ids['a']}/move", json={"after_id": ids["b"], "before_id": ids["d"]}, headers=auth_headers
+    )
+    assert between.status_code == 200
+    assert titles(client, auth_headers) == ["b", "a", "d", "c"]
+
+    stale = client.post(
+        f"/api/tasks/{ids['a']}/move", json={"after_id": ids["c"]}, headers={**auth_headers, "If-Match": '"1"'}
+    )
+    assert stale.status_code == 412
+    assert client.post(f"/api/tasks/{ids['a']}/move", json={}, headers=auth_headers).status_code == 422
+    unknown = client.post(f"/api/tasks/{ids['a']}/move", json={"after_id": str(uuid.uuid4())}, headers=auth_headers)
+    assert unknown.status_code == 404
+    other = user_headers(client)
+    assert client.post(f"/api/tasks/{ids['a']}/move", json={"after_id": ids["b"]}, headers=other).status_code == 404
+
+
+def test_tied_positions_are_spread_out_before_moving(client, auth_headers):
+    ids = [client.post("/api/tasks/", json={"title": title}, headers=auth_headers).json()["id"] for title in "abc"]
+    with Session(engine) as session:
+        # As if "a" and "b" had been created concurrently.
+        for task_id in ids[:2]:
+            session.get(Task, uuid.UUID(task_id)).position = "a0"
+        session.commit()
+
+    stale = client.post(
+        f"/api/tasks/{ids[2]}/move", json={"after_id": ids[0], "before_id": ids[1]},
+        headers={**auth_headers, "If-Match": '"7"'},
+    )
+    assert stale.status_code == 412
+    moved = client.post(
+        f"/api/tasks/{ids[2]}/move", json={"after_id": ids[0], "before_id": ids[1]},
+        headers={**auth_headers, "If-Match": '"1"'},
+    )
+    assert moved.status_code == 200
+    assert titles(client, auth_headers) == ["a", "c", "b"]
+
+
+def test_long_keys_queue_a_rebalance(client, auth_headers, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(positions, "POSITION_REBALANCE_LENGTH", 2)
+    monkeypatch.setattr(positions.job_queue, "enqueue", lambda *args, **kwargs: enqueued.append(args))
+    first, second, third = [
+        client.post("/api/tasks/", json={"title": title}, headers=auth_headers).json()["id"] for title in "abc"
+    ]
+    client.post(f"/api/tasks/{third}/move", json={"after_id": first}, headers=auth_headers)
+    assert enqueued and enqueued[0][0] == "rebalance_positions"
+    assert enqueued[0][2] == {"model": "task", "scope_id": str(enqueued[0][1])}
+
+
+def test_skills_are_ordered_within_their_sub_agent(client, auth_headers):
+    sub_agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    ids = [
+        client.post(
+            "/api/skills/", json={"name": name, "sub_agent_id": sub_agent["id"]}, headers=auth_headers
+        ).json()["id"]
+        for name in ("x", "y", "z")
+    ]
+    moved = client.post(f"/api/skills/{ids[2]}/move", json={"before_id": ids[0]}, headers=auth_headers)
+    assert moved.status_code == 200
+    skills = client.get(f"/api/skills/?sub_agent_id={sub_agent['id']}", headers=auth_headers).json()
+    assert [skill["name"] for skill in skills] == ["z", "x", "y"]
+    bootstrap = client.get("/api/bootstrap", headers=auth_headers).json()
+    assert [skill["name"] for skill in bootstrap["skills"]] == ["z", "x", "y"]
+
+
+def test_export_and_import_keep_the_manual_order(client, auth_headers, user_headers):
+    ids = [client.post("/api/tasks/", json={"title": title}, headers=auth_headers).json()["id"] for title in "abc"]
+    client.post(f"/api/tasks/{ids[2]}/move", json={"before_id": ids[0]}, headers=auth_headers)
+    sub_agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    skill_ids = [
+        client.post(
+            "/api/skills/", json={"name": name, "sub_agent_id": sub_agent["id"]}, headers=auth_headers
+        ).json()["id"]
+        for name in "xyz"
+    ]
+    client.post(f"/api/skills/{skill_ids[2]}/move", json={"before_id": skill_ids[0]}, headers=auth_headers)
+
+    export = client.get("/api/export", headers=auth_headers).content
+    records = [json.loads(line) for line in export.splitlines()]
+    assert [record["title"] for record in records if record["type"] == "task"] == ["c", "a", "b"]
+    rows = list(csv.DictReader(io.StringIO(client.get("/api/export?format=csv", headers=auth_headers).text)))
+    assert [row["position"] for row in rows] == [record.get("position") or "" for record in records]
+
+    other = user_headers(client)
+    assert client.post("/api/import", content=export, headers=other).status_code == 200
+    assert titles(client, other) == ["c", "a", "b"]
+    assert [skill["name"] for skill in client.get("/api/skills/", headers=other).json()] == ["z", "x", "y"]
+
+
+def test_restored_tasks_without_a_position_go_last(client, auth_headers):
+    ids = [
+        client.post("/api/tasks/", json={"title": title, "completed": title == "a"}, headers=auth_headers).json()["id"]
+        for title in "abc"
+    ]
+    client.post("/api/tasks/archive?older_than_days=0", headers=auth_headers)
+    with Session(engine) as session:
+        # As if archived before manual ordering existed.
+        session.execute(update(ArchivedTask).where(ArchivedTask.id == uuid.UUID(ids[0])).values(position=None))
+        session.commit()
+
+    client.post(f"/api/tasks/archived/{ids[0]}/restore", headers=auth_headers)
+    assert titles(client, auth_headers) == ["b", "c", "a"]
+    moved = client.post(f"/api/tasks/{ids[1]}/move", json={"after_id": ids[0]}, headers=auth_headers)
+    assert moved.status_code == 200
+    assert titles(client, auth_headers) == ["c", "a", "b"]
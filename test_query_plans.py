@@ -0,0 +1,165 @@
+"""Query-plan regression tests: every route's SQL uses an index, within a query budget.
+
+Each request runs with the SQL it sends captured through engine events. Every
+captured statement is then put through SQLite's ``EXPLAIN QUERY PLAN`` with
+the same parameters: a ``SCAN`` of a table, where a ``SEARCH ... USING INDEX``
+is expected, fails the test, and so does a request that sends more statements
+than its budget. Scans of subqueries (the ``anon_N`` aggregates behind list
+ETags) are allowed. The database is not ANALYZEd, as in production, so the
+planner chooses as it would for a large table.
+"""
+import re
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import SQLModel
+
+from database import engine, shard_engines
+from jobs import job_queue
+from main import app
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="EXPLAIN QUERY PLAN is SQLite's")
+
+EXPLAINED = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+SCAN = re.compile(r"SCAN (\w+)")
+
+# (method, path, JSON body, maximum statements); paths and bodies are
+# formatted with the ids the workspace fixture seeds. Runs in this order.
+ROUTES = [
+    ("POST", "/api/auth/login", {"email": "{email}", "password": "secure123"}, 4),
+    ("POST", "/api/auth/refresh", {"refresh_token": "{refresh_token}"}, 6),
+    ("GET", "/api/tasks/", None, 3),
+    ("GET", "/api/tasks/?include_archived=true", None, 4),
+    ("GET", "/api/tasks/?updated_since=2000-01-01T00:00:00", None, 3),
+    ("POST", "/api/tasks/", {"title": "planned"}, 4),
+    ("GET", "/api/tasks/{task}", None, 2),
+    ("PUT", "/api/tasks/{task}", {"title": "renamed"}, 4),
+    ("PATCH", "/api/tasks/{task}/complete?completed=true", None, 5),
+    ("POST", "/api/tasks/{task}/move", {"after_id": "{other_task}"}, 6),
+    ("GET", "/api/tasks/archived", None, 3),
+    ("POST", "/api/tasks/archived/{archived_task}/restore", None, 6),
+    ("GET", "/api/sub-agents/", None, 3),
+    ("POST", "/api/sub-agents/", {"name": "planned"}, 3),
+    ("GET", "/api/sub-agents/{sub_agent}", None, 2),
+    ("PUT", "/api/sub-agents/{sub_agent}", {"name": "renamed"}, 4),
+    ("GET", "/api/skills/", None, 3),
+    ("GET", "/api/skills/?sub_agent_id={sub_agent}", None, 3),
+    ("GET", "/api/skills/search?name=skill 1", None, 2),
+    ("GET", "/api/skills/search?name=skill&prefix=true", None, 2),
+    ("POST", "/api/skills/", {"name": "planned", "sub_agent_id": "{sub_agent}"}, 5),
+    ("GET", "/api/skills/{skill}", None, 2),
+    ("PUT", "/api/skills/{skill}", {"name": "renamed"}, 4),
+    ("POST", "/api/skills/{skill}/move", {"before_id": "{other_skill}"}, 6),
+    ("GET", "/api/bootstrap", None, 6),
+    ("GET", "/api/export", None, 5),
+    ("GET", "/api/jobs/", None, 2),
+    ("DELETE", "/api/skills/{skill}", None, 3),
+    ("DELETE", "/api/tasks/{task}", None, 3),
+    ("DELETE", "/api/sub-agents/{sub_agent}", None, 5),
+    ("POST", "/api/auth/logout", {"refresh_token": "{logout_token}"}, 4),
+]
+
+
+@contextmanager
+def capture_sql():
+    """Collect ``(engine, statement, parameters)`` for everything sent to the databases."""
+    captured = []
+    listeners = []
+    for database in {engine, *shard_engines.values()}:
+        def listener(conn, cursor, statement, parameters, context, executemany, database=database):
+            if EXPLAINED.match(statement):
+                captured.append((database, statement, parameters[0] if executemany else parameters))
+        event.listen(database, "before_cursor_execute", listener)
+        listeners.append((database, listener))
+    try:
+        yield captured
+    finally:
+        for database, listener in listeners:
+            event.remove(database, "before_cursor_execute", listener)
+
+
+def table_scans(database, statement, parameters):
+    """Plan lines of ``statement`` that scan a whole table."""
+    connection = database.raw_connection()
+    try:
+        plan = [row[3] for row in connection.cursor().execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+    finally:
+        connection.close()
+    tables = SQLModel.metadata.tables
+    return [
+        line for line in plan
+        if (match := SCAN.match(line)) and re.sub(r"_\d+$", "", match.group(1)) in tables
+    ]
+
+
+def fill(template, ids):
+    if isinstance(template, str):
+        return template.format(**ids)
+    if isinstance(template, dict):
+        return {key: fill(value, ids) for key, value in template.items()}
+    return template
+
+
+def seed(client, headers, tasks=20, sub_agents=5, skills=4):
+    task_ids = [
+        client.post("/api/tasks/", json={"title": f"task {i}"}, headers=headers).json()["id"] for i in range(tasks)
+    ]
+    for task_id in task_ids[-3:]:
+        client.patch(f"/api/tasks/{task_id}/complete?completed=true", headers=headers)
+    client.post("/api/tasks/archive?older_than_days=0", headers=headers)
+    sub_agent_ids, skill_ids = [], []
+    for i in range(sub_agents):
+        sub_agent = client.post("/api/sub-agents/", json={"name": f"agent {i}"}, headers=headers).json()
+        sub_agent_ids.append(sub_agent["id"])
+        for j in range(skills):
+            skill = client.post(
+                "/api/skills/", json={"name": f"skill {j}", "sub_agent_id": sub_agent["id"]}, headers=headers
+            ).json()
+            skill_ids.append(skill["id"])
+    return task_ids, sub_agent_ids, skill_ids
+
+
+@pytest.fixture(scope="module")
+def workspace(signup):
+    with TestClient(app, client=("10.0.48.1", 50000)) as client:
+        # Polling job workers would show up in the captured SQL.
+        job_queue.stop()
+        # Another user's rows, so a missing ownership filter shows up as well as a missing index.
+        other = signup(client)
+        seed(client, {"Authorization": f"Bearer {other['access_token']}"})
+
+        email = f"plans_{uuid.uuid4().hex[:8]}@example.com"
+        tokens = signup(client, email)
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        task_ids, sub_agent_ids, skill_ids = seed(client, headers)
+        archived = client.get("/api/tasks/archived", headers=headers).json()
+        logout = client.post("/api/auth/login", json={"email": email, "password": "secure123"}).json()
+        ids = {
+            "email": email,
+            "refresh_token": tokens["refresh_token"],
+            "logout_token": logout["refresh_token"],
+            "task": task_ids[0],
+            "other_task": task_ids[5],
+            "archived_task": archived[0]["id"],
+            "sub_agent": sub_agent_ids[0],
+            "skill": skill_ids[0],
+            "other_skill": skill_ids[2],
+        }
+        yield client, headers, ids
+
+
+@pytest.mark.parametrize("method,path,body,budget", ROUTES, ids=[f"{m} {p}" for m, p, _, _ in ROUTES])
+def test_route_uses_indexes_within_budget(workspace, method, path, body, budget):
+    client, headers, ids = workspace
+    with capture_sql() as captured:
+        response = client.request(method, fill(path, ids), json=fill(body, ids), headers=headers)
+    assert response.status_code < 400, response.text
+
+    statements = [statement for _, statement, _ in captured]
+    assert len(statements) <= budget, "\n\n".join(statements)
+    for database, statement, parameters in captured:
+        scans = table_scans(database, statement, parameters)
+        assert not scans, f"{scans} in:\n{statement}"
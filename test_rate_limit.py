@@ -0,0 +1,107 @@
+"""Tests for the token-bucket rate limiter."""
+import os
+import tempfile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import create_engine
+
+import migrations
+from rate_limit import DatabaseBackend, InMemoryBackend, Rate, RateLimitMiddleware, RouteLimit
+from utils import create_access_token
+
+
+def test_rate_parse():
+    assert Rate.parse("30/minute") == Rate(burst=30, per_second=0.5)
+    assert Rate.parse("5/second") == Rate(burst=5, per_second=5)
+
+
+def test_in_memory_bucket_refills():
+    backend = InMemoryBackend()
+    rate = Rate(burst=2, per_second=1)
+
+    assert backend.acquire("k", rate, now=0) == 0
+    assert backend.acquire("k", rate, now=0) == 0
+    assert backend.acquire("k", rate, now=0) == 1.0
+    assert backend.acquire("k", rate, now=0.5) == 0.5
+    assert backend.acquire("k", rate, now=1.5) == 0
+
+
+def test_in_memory_evicts_idle_and_excess_buckets():
+    backend = InMemoryBackend(ttl=10, max_entries=3)
+    rate = Rate(burst=1, per_second=1)
+
+    for i in range(5):
+        backend.acquire(f"k{i}", rate, now=0)
+    assert len(backend) == 3
+
+    backend.acquire("fresh", rate, now=100)
+    assert len(backend) == 1
+
+
+def test_database_backend_shares_buckets():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'rl.db')}")
+        migrations.upgrade(engine)
+        rate = Rate(burst=2, per_second=1)
+        worker_a, worker_b = DatabaseBackend(engine), DatabaseBackend(engine)
+
+        assert worker_a.acquire("k", rate, now=0) == 0
+        assert worker_b.acquire("k", rate, now=0) == 0
+        assert worker_a.acquire("k", rate, now=0) == 1.0
+        assert worker_b.acquire("k", rate, now=1) == 0
+        engine.dispose()
+
+
+def make_client(**kwargs):
+    app = FastAPI()
+
+    @app.post("/api/auth/login")
+    def login():
+        return {"ok": True}
+
+    @app.get("/api/tasks/")
+    def tasks():
+        return []
+
+    @app.post("/api/tasks/")
+    def create_task():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, **kwargs)
+    return TestClient(app)
+
+
+def test_middleware_returns_429_with_retry_after():
+    client = make_client(limits=[RouteLimit("/api/auth/login", "POST", per_ip=Rate.parse("2/minute"))])
+
+    assert client.post("/api/auth/login").status_code == 200
+    assert client.post("/api/auth/login").status_code == 200
+    response = client.post("/api/auth/login")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "30"
+
+
+def test_middleware_limits_each_user_separately():
+    client = make_client(limits=[RouteLimit("/api/", "GET", per_user=Rate.parse("1/minute"))])
+    alice = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'})}"}
+    bob = {"Authorization": f"Bearer {create_access_token({'sub': 'bob'})}"}
+
+    assert client.get("/api/tasks/", headers=alice).status_code == 200
+    assert client.get("/api/tasks/", headers=alice).status_code == 429
+    assert client.get("/api/tasks/", headers=bob).status_code == 200
+
+
+def test_reads_and_writes_on_the_same_path_have_separate_buckets():
+    client = make_client(limits=[
+        RouteLimit("/api/", "GET", per_ip=Rate.parse("5/minute"), per_user=Rate.parse("5/minute")),
+        RouteLimit("/api/", per_ip=Rate.parse("2/minute"), per_user=Rate.parse("2/minute")),
+    ])
+    alice = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'})}"}
+
+    assert client.post("/api/tasks/", headers=alice).status_code == 200
+    assert client.post("/api/tasks/", headers=alice).status_code == 200
+    assert client.post("/api/tasks/", headers=alice).status_code == 429
+    for _ in range(5):
+        assert client.get("/api/tasks/", headers=alice).status_code == 200
+    assert client.get("/api/tasks/", headers=alice).status_code == 429
@@ -0,0 +1,103 @@
+"""Tests for refresh-token rotation and access-token revocation."""
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from database import engine
+from models import RevokedToken
+from revocation import BloomFilter, RevocationList
+
+
+def bearer(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def test_refresh_rotates_the_refresh_token(client, signup):
+    tokens = signup(client)
+    assert tokens["refresh_token"] and tokens["expires_in"] > 0
+
+    response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert client.get("/api/tasks/", headers=bearer(rotated)).status_code == 200
+
+    assert client.post("/api/auth/refresh", json={"refresh_token": "unknown"}).status_code == 401
+
+
+def test_reusing_a_rotated_refresh_token_revokes_the_family(client, signup):
+    tokens = signup(client)
+    rotated = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    reused = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reused.status_code == 401
+    # The legitimate holder's newer token is revoked too.
+    assert client.post("/api/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, signup):
+    tokens = signup(client)
+    assert client.get("/api/tasks/", headers=bearer(tokens)).status_code == 200
+
+    response = client.post(
+        "/api/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=bearer(tokens)
+    )
+    assert response.status_code == 200
+    assert client.get("/api/tasks/", headers=bearer(tokens)).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+    # Logging out without credentials is still accepted.
+    assert client.post("/api/auth/logout").status_code == 200
+
+
+def test_replaying_a_logged_out_refresh_token_leaves_other_devices_alone(client, signup):
+    email = f"devices_{uuid.uuid4().hex[:8]}@example.com"
+    device_a = signup(client, email)
+    device_b = client.post("/api/auth/login", json={"email": email, "password": "secure123"}).json()
+    client.post("/api/auth/logout", json={"refresh_token": device_a["refresh_token"]})
+
+    # A stale tab on device A retries its refresh.
+    assert client.post("/api/auth/refresh", json={"refresh_token": device_a["refresh_token"]}).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": device_b["refresh_token"]}).status_code == 200
+
+
+def test_revocations_reach_other_processes_on_sync(client):
+    other = RevocationList(engine)
+    other.sync()
+    jti = uuid.uuid4().hex
+    RevocationList(engine).revoke(jti, time.time() + 60)
+
+    assert not other.is_revoked(jti)
+    other.sync()
+    assert other.is_revoked(jti)
+
+
+def test_sync_picks_up_revocations_that_commit_late(client):
+    other = RevocationList(engine)
+    other.sync()
+    RevocationList(engine).revoke(uuid.uuid4().hex, time.time() + 60)
+    other.sync()  # its watermark is now past this moment
+
+    # Stamped by another worker just before that sync, but committed after it.
+    jti = uuid.uuid4().hex
+    with Session(engine) as session:
+        session.add(RevokedToken(
+            jti=jti,
+            expires_at=datetime.utcnow() + timedelta(minutes=1),
+            revoked_at=datetime.utcnow() - timedelta(seconds=1),
+        ))
+        session.commit()
+    other.sync()
+    assert other.is_revoked(jti)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [uuid.uuid4().hex for _ in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 300
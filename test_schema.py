@@ -0,0 +1,37 @@
+"""Tests for schema versioning used by fast-start mode."""
+import os
+import tempfile
+
+from sqlalchemy import inspect, text
+from sqlmodel import create_engine
+
+import models  # noqa: F401  (registers the tables)
+import migrations
+
+
+def make_engine(directory):
+    return create_engine(f"sqlite:///{os.path.join(directory, 'schema.db')}")
+
+
+def test_fresh_database_is_stamped_current():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(tmp)
+        assert not migrations.is_schema_current(engine)
+
+        migrations.upgrade(engine)
+
+        assert migrations.is_schema_current(engine)
+        assert {"users", "tasks", "sub_agents", "skills"} <= set(inspect(engine).get_table_names())
+        engine.dispose()
+
+
+def test_upgrade_is_idempotent():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(tmp)
+        migrations.upgrade(engine)
+        migrations.upgrade(engine)
+
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT version FROM schema_version")).all()
+        assert rows == [(migrations.SCHEMA_VERSION,)]
+        engine.dispose()
@@ -0,0 +1,224 @@
+"""Tests for sharding users' data across several SQLite databases."""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import auth_routes
+import import_routes
+import migrations
+import sharding
+import sub_agent_routes
+from database import make_engine
+from jobs import JobQueue
+from main import app
+from models import Job, ShardAssignment, Skill, SubAgent, Task, User
+from sharding import ShardRouter, reconcile_rows, copy_rows
+
+
+@pytest.fixture
+def databases(tmp_path):
+    engines = {name: make_engine(f"sqlite:///{tmp_path / name}.db") for name in ("directory", "a", "b", "c")}
+    for engine in engines.values():
+        migrations.upgrade(engine)
+    return engines
+
+
+def make_user(engine) -> uuid.UUID:
+    with Session(engine) as session:
+        user = User(email=f"shard_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        return user.id
+
+
+def add_data(engine, user_id, tasks=3, skills=2):
+    with Session(engine) as session:
+        sub_agent = SubAgent(name="agent", user_id=user_id)
+        session.add(sub_agent)
+        session.add_all([Task(title=f"task {i}", user_id=user_id) for i in range(tasks)])
+        session.commit()
+        session.add_all([Skill(name=f"skill {i}", sub_agent_id=sub_agent.id) for i in range(skills)])
+        session.commit()
+
+
+def counts(engine, user_id):
+    with Session(engine) as session:
+        return tuple(
+            len(session.exec(select(model.id).where(sharding.owned_rows(model, user_id))).all())
+            for model in sharding.SHARDED_MODELS
+        )
+
+
+def test_ring_placement_is_stable_when_a_shard_is_added(databases):
+    two = ShardRouter(databases["directory"], {"a": databases["a"], "b": databases["b"]})
+    three = ShardRouter(databases["directory"], {name: databases[name] for name in ("a", "b", "c")})
+    users = [uuid.uuid4() for _ in range(3000)]
+
+    placed = [two.place(user) for user in users]
+    assert placed == [two.place(user) for user in users]
+    assert 0.4 < placed.count("a") / len(users) < 0.6
+
+    moved = [user for user, shard in zip(users, placed) if three.place(user) != shard]
+    assert all(three.place(user) == "c" for user in moved)
+    assert 0.2 < len(moved) / len(users) < 0.45
+
+
+def test_assignment_is_stored_and_user_row_copied_to_the_shard(databases):
+    router = ShardRouter(databases["directory"], {"a": databases["a"], "b": databases["b"]}, cache_seconds=0)
+    user_id = make_user(databases["directory"])
+
+    shard = router.shard_for(user_id)
+    assert shard == router.place(user_id)
+    with Session(databases["directory"]) as session:
+        assert session.get(ShardAssignment, user_id).shard == shard
+    with Session(databases[shard]) as session:
+        assert session.get(User, user_id) is not None
+
+    # The stored assignment wins over the ring, e.g. after shards are added.
+    grown = ShardRouter(databases["directory"], {name: databases[name] for name in ("a", "b", "c")})
+    assert grown.shard_for(user_id) == shard
+
+
+def test_reconcile_copies_only_what_changed(databases):
+    source, target = databases["a"], databases["b"]
+    user_id = uuid.uuid4()
+    for engine in (source, target):
+        with Session(engine) as session:
+            session.add(User(id=user_id, email="reconcile@example.com", hashed_password=""))
+            session.commit()
+    add_data(source, user_id, tasks=5)
+    copy_rows(source, target, user_id, chunk_size=2)
+    assert counts(target, user_id) == (1, 2, 5, 0)
+
+    with Session(source) as session:
+        tasks = session.exec(select(Task).where(Task.user_id == user_id)).all()
+        tasks[0].title, tasks[0].version = "renamed", tasks[0].version + 1
+        session.delete(tasks[1])
+        session.add(Task(title="new", user_id=user_id))
+        session.commit()
+        renamed_id = tasks[0].id
+
+    result = reconcile_rows(source, target, user_id)
+    assert result["tasks"] == {"copied": 2, "deleted": 1}
+    assert result["skills"] == {"copied": 0, "deleted": 0}
+    with Session(target) as session:
+        assert session.get(Task, renamed_id).title == "renamed"
+    assert counts(target, user_id) == counts(source, user_id)
+
+
+def test_move_user_switches_shard_and_cleans_up_source(databases):
+    router = ShardRouter(databases["directory"], {"a": databases["a"], "b": databases["b"]}, cache_seconds=0)
+    user_id = make_user(databases["directory"])
+    source = router.shard_for(user_id)
+    target = "b" if source == "a" else "a"
+    add_data(databases[source], user_id)
+
+    result = router.move_user(user_id, target, settle_seconds=0)
+
+    assert result["moved"] and result["copied"] == {"sub_agents": 1, "skills": 2, "tasks": 3, "archived_tasks": 0}
+    assert router.shard_for(user_id) == target
+    assert counts(databases[target], user_id) == (1, 2, 3, 0)
+    assert counts(databases[source], user_id) == (0, 0, 0, 0)
+    with Session(databases[source]) as session:
+        assert session.get(User, user_id) is None
+    assert router.move_user(user_id, target) == {"moved": False, "shard": target}
+
+
+def test_move_keeps_the_source_if_a_late_writer_changed_it(databases, monkeypatch):
+    router = ShardRouter(databases["directory"], {"a": databases["a"], "b": databases["b"]}, cache_seconds=0)
+    user_id = make_user(databases["directory"])
+    source = router.shard_for(user_id)
+    target = "b" if source == "a" else "a"
+    add_data(databases[source], user_id)
+
+    def reconcile_then_write(*args, **kwargs):
+        result = reconcile_rows(*args, **kwargs)
+        # A request that looked up the source before the pause commits after the catch-up.
+        with Session(databases[source]) as session:
+            task = session.exec(select(Task).where(Task.user_id == user_id)).first()
+            task.title, task.version = "late write", task.version + 1
+            session.commit()
+        return result
+
+    monkeypatch.setattr(sharding, "reconcile_rows", reconcile_then_write)
+    with pytest.raises(sharding.SourceChanged):
+        router.move_user(user_id, target, settle_seconds=0)
+
+    assert router.shard_for(user_id) == target
+    assert counts(databases[source], user_id) == (1, 2, 3, 0)
+    with Session(databases[source]) as session:
+        assert session.exec(select(Task).where(Task.title == "late write")).first() is not None
+        assert session.get(User, user_id) is not None
+
+
+def test_jobs_of_a_moving_user_are_rescheduled(databases):
+    router = ShardRouter(databases["directory"], {"a": databases["a"], "b": databases["b"]}, cache_seconds=0)
+    queue = JobQueue(databases["directory"])
+
+    @queue.handler("count")
+    def count(session, job):
+        with router.session_for(job.user_id) as shard_session:
+            return {"tasks": len(shard_session.exec(select(Task.id)).all())}
+
+    user_id = make_user(databases["directory"])
+    router.shard_for(user_id)
+    with Session(databases["directory"]) as session:
+        session.get(ShardAssignment, user_id).moving = True
+        session.commit()
+    job_id = queue.enqueue("count", user_id, {}, max_attempts=1).id
+
+    assert queue.run_once()
+    with Session(databases["directory"]) as session:
+        job = session.get(Job, job_id)
+        assert (job.status, job.attempts) == ("queued", 0)
+        job.run_after = job.updated_at
+        session.get(ShardAssignment, user_id).moving = False
+        session.commit()
+
+    assert queue.run_once()
+    with Session(databases["directory"]) as session:
+        job = session.get(Job, job_id)
+        assert (job.status, job.result) == ("succeeded", {"tasks": 0})
+
+
+def test_requests_use_the_users_shard_and_get_503_while_moving(tmp_path, monkeypatch):
+    from database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    other = make_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    migrations.upgrade(other)
+    router = ShardRouter(engine, {"main": engine, "other": other}, cache_seconds=0)
+    for module in (sharding, auth_routes, import_routes, sub_agent_routes):
+        monkeypatch.setattr(module, "shard_router", router)
+
+    with TestClient(app, client=("10.0.41.1", 50000)) as client:
+        email = f"shard_{uuid.uuid4().hex[:8]}@example.com"
+        token = client.post("/api/auth/signup", json={"email": email, "password": "secure123"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        with Session(engine) as session:
+            user_id = session.exec(select(User.id).where(User.email == email)).one()
+        router.shard_for(user_id)
+        router.move_user(user_id, "other", settle_seconds=0)
+
+        response = client.post("/api/tasks/", json={"title": "on the other shard"}, headers=headers)
+        assert response.status_code == 200
+        assert counts(other, user_id) == (0, 0, 1, 0)
+        assert counts(engine, user_id) == (0, 0, 0, 0)
+        assert len(client.get("/api/tasks/", headers=headers).json()) == 1
+
+        with Session(engine) as session:
+            session.get(ShardAssignment, user_id).moving = True
+            session.commit()
+        for response in (client.get("/api/tasks/", headers=headers), client.delete("/api/auth/me", headers=headers)):
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+
+        with Session(engine) as session:
+            session.get(ShardAssignment, user_id).moving = False
+            session.commit()
+        assert client.delete("/api/auth/me", headers=headers).status_code == 200
+        assert counts(other, user_id) == (0, 0, 0, 0)
+        with Session(other) as session:
+            assert session.get(User, user_id) is None
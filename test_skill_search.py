@@ -0,0 +1,63 @@
+"""Tests for GET /api/skills/search."""
+
+
+def add_agent(client, headers, *skills):
+    sub_agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=headers).json()
+    for name in skills:
+        client.post("/api/skills/", json={"name": name, "sub_agent_id": sub_agent["id"]}, headers=headers)
+    return sub_agent["id"]
+
+
+def search(client, headers, **params):
+    response = client.get("/api/skills/search", params=params, headers=headers)
+    assert response.status_code == 200
+    return set(response.json()["sub_agent_ids"])
+
+
+def test_search_finds_sub_agents_by_skill_name(client, auth_headers, user_headers):
+    searcher = add_agent(client, auth_headers, "Web Search", "Summarize")
+    crawler = add_agent(client, auth_headers, "web   search", "Web Scraping")
+    writer = add_agent(client, auth_headers, "Summarize")
+    stranger = user_headers(client)
+    add_agent(client, stranger, "Web Search")
+
+    assert search(client, auth_headers, name="web search") == {searcher, crawler}
+    assert search(client, auth_headers, name="  WEB SEARCH ") == {searcher, crawler}
+    assert search(client, auth_headers, name="web") == set()
+    assert search(client, auth_headers, name="web s", prefix="true") == {searcher, crawler}
+    assert search(client, auth_headers, name="summ", prefix="true") == {searcher, writer}
+    assert search(client, stranger, name="summarize") == set()
+
+    response = client.get("/api/skills/search", params={"name": "  "}, headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_prefix_search_handles_the_highest_characters(client, auth_headers):
+    top = add_agent(client, auth_headers, "tool\U0010ffff kit")
+    hangul = add_agent(client, auth_headers, "tool\ud7ff kit")
+    add_agent(client, auth_headers, "toom", "tool\ue000")
+
+    assert search(client, auth_headers, name="tool\U0010ffff", prefix="true") == {top}
+    assert search(client, auth_headers, name="tool\ud7ff", prefix="true") == {hangul}
+    assert search(client, auth_headers, name="\U0010ffff", prefix="true") == set()
+
+
+def test_search_follows_renames(client, auth_headers):
+    sub_agent = client.post("/api/sub-agents/", json={"name": "agent"}, headers=auth_headers).json()
+    skill = client.post(
+        "/api/skills/", json={"name": "Translate", "sub_agent_id": sub_agent["id"]}, headers=auth_headers
+    ).json()
+    client.put(f"/api/skills/{skill['id']}", json={"name": "Proofread"}, headers=auth_headers)
+
+    assert search(client, auth_headers, name="translate") == set()
+    assert search(client, auth_headers, name="proofread") == {sub_agent["id"]}
+
+
+def test_imported_skills_are_searchable(client, auth_headers):
+    body = "\n".join([
+        '{"type": "sub_agent", "id": "a", "name": "imported"}',
+        '{"type": "skill", "sub_agent_id": "a", "name": "Code Review"}',
+    ])
+    assert client.post("/api/import", content=body, headers=auth_headers).status_code == 200
+
+    assert len(search(client, auth_headers, name="code review")) == 1
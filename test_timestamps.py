@@ -0,0 +1,47 @@
+"""Tests for database-maintained timestamps, delta sync and conditional GETs."""
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def test_timestamps_are_set_per_write(client, auth_headers):
+    first = client.post("/api/tasks/", json={"title": "first"}, headers=auth_headers).json()
+    time.sleep(0.01)
+    second = client.post("/api/tasks/", json={"title": "second"}, headers=auth_headers).json()
+    assert second["created_at"] > first["created_at"]
+
+    time.sleep(0.01)
+    updated = client.put(f"/api/tasks/{first['id']}", json={"title": "edited"}, headers=auth_headers).json()
+    assert updated["created_at"] == first["created_at"]
+    assert updated["updated_at"] > second["updated_at"]
+
+    now = datetime.now(timezone.utc)
+    created = datetime.fromisoformat(second["created_at"]).replace(tzinfo=timezone.utc)
+    assert abs(now - created) < timedelta(minutes=1)
+
+
+def test_updated_since_returns_only_changed_rows(client, auth_headers):
+    old = client.post("/api/tasks/", json={"title": "old"}, headers=auth_headers).json()
+    client.post("/api/tasks/", json={"title": "untouched"}, headers=auth_headers)
+    checkpoint = client.post("/api/tasks/", json={"title": "marker"}, headers=auth_headers).json()["updated_at"]
+    time.sleep(0.01)
+    client.put(f"/api/tasks/{old['id']}", json={"completed": True}, headers=auth_headers)
+
+    changed = client.get("/api/tasks/", params={"updated_since": checkpoint}, headers=auth_headers).json()
+    assert [task["id"] for task in changed] == [old["id"]]
+
+
+def test_list_and_item_etags_answer_304_until_something_changes(client, auth_headers):
+    task = client.post("/api/tasks/", json={"title": "t"}, headers=auth_headers).json()
+
+    listed = client.get("/api/tasks/", headers=auth_headers)
+    tag = listed.headers["ETag"]
+    assert client.get("/api/tasks/", headers={**auth_headers, "If-None-Match": tag}).status_code == 304
+    assert client.get("/api/tasks/?stream=true", headers={**auth_headers, "If-None-Match": tag}).status_code == 304
+
+    item_tag = client.get(f"/api/tasks/{task['id']}", headers=auth_headers).headers["ETag"]
+    item_headers = {**auth_headers, "If-None-Match": item_tag}
+    assert client.get(f"/api/tasks/{task['id']}", headers=item_headers).status_code == 304
+
+    client.patch(f"/api/tasks/{task['id']}/complete?completed=true", headers=auth_headers)
+    assert client.get("/api/tasks/", headers={**auth_headers, "If-None-Match": tag}).status_code == 200
+    assert client.get(f"/api/tasks/{task['id']}", headers=item_headers).status_code == 200
@@ -0,0 +1,66 @@
+"""Tests for the JWT token service."""
+from datetime import timedelta
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.serialization import (
+    Encoding, NoEncryption, PrivateFormat, PublicFormat,
+)
+
+from tokens import TokenError, TokenService, b64url_encode
+
+
+def key_pair(algorithm):
+    key = ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+    private_pem = key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption())
+    public_pem = key.public_key().public_bytes(Encoding.PEM, PublicFormat.SubjectPublicKeyInfo)
+    return private_pem, public_pem
+
+
+def test_hs256_round_trip():
+    service = TokenService("HS256", secret_key="secret")
+    claims = service.decode(service.create_token({"sub": "user-1"}))
+    assert claims["sub"] == "user-1"
+    assert claims["exp"] - claims["iat"] == 30 * 60
+
+
+def test_rejects_tampered_expired_and_foreign_tokens():
+    service = TokenService("HS256", secret_key="secret")
+    token = service.create_token({"sub": "user-1"})
+    header, payload, signature = token.split(".")
+    forged_payload = b64url_encode(b'{"sub":"admin","exp":9999999999}').decode()
+    none_header = b64url_encode(b'{"alg":"none"}').decode()
+
+    with pytest.raises(TokenError):
+        service.decode(f"{header}.{forged_payload}.{signature}")
+    with pytest.raises(TokenError):
+        service.decode(service.create_token({"sub": "user-1"}, expires_delta=timedelta(seconds=-1)))
+    with pytest.raises(TokenError):
+        TokenService("HS256", secret_key="other").decode(token)
+    with pytest.raises(TokenError):
+        service.decode(f"{none_header}.{payload}.")
+    with pytest.raises(TokenError):
+        service.decode("not-a-token")
+
+
+def test_accepts_tokens_issued_by_python_jose():
+    jwt = pytest.importorskip("jose.jwt")
+    token = jwt.encode({"sub": "user-1", "exp": 9999999999}, "secret", algorithm="HS256")
+    assert TokenService("HS256", secret_key="secret").decode(token)["sub"] == "user-1"
+
+
+@pytest.mark.parametrize("algorithm", ["EdDSA", "ES256"])
+def test_asymmetric_tokens_verify_with_public_key_only(algorithm):
+    private_pem, public_pem = key_pair(algorithm)
+    issuer = TokenService(algorithm, private_key_pem=private_pem)
+    verifier = TokenService(algorithm, public_key_pem=public_pem)
+
+    token = issuer.create_token({"sub": "user-1"})
+    assert verifier.decode(token)["sub"] == "user-1"
+    assert verifier.jwks() == issuer.jwks()
+    assert verifier.jwks()["keys"][0]["kid"] == issuer.key_id
+
+    with pytest.raises(TokenError):
+        verifier.create_token({"sub": "user-1"})
+    with pytest.raises(TokenError):
+        TokenService(algorithm, private_key_pem=key_pair(algorithm)[0]).decode(token)
@@ -0,0 +1,60 @@
+"""Row timestamps computed by the database.
+
+``utcnow()`` is a SQL expression for the current UTC time, rendered in each
+dialect's own syntax (at the microsecond-string precision SQLAlchemy stores on
+SQLite). Timestamp columns use it as their INSERT default, ``server_default``
+and UPDATE ``onupdate``, so every write stamps the rows at the moment it runs,
+with no Python datetime work and no dependence on when the process started.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import DateTime
+from sqlmodel import Field
+
+
+class utcnow(FunctionElement):
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw):
+    # Millisecond precision, padded to the 6-digit fraction SQLAlchemy writes,
+    # so stored values compare correctly as strings.
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+@compiles(utcnow, "postgresql")
+def _postgresql_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+def naive_utc(value: datetime) -> datetime:
+    """``value`` as the naive UTC datetime the timestamp columns hold."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def created_at_field() -> Optional[datetime]:
+    """A ``created_at`` column set by the database on INSERT."""
+    return Field(
+        default=None, nullable=False,
+        sa_column_kwargs={"default": utcnow(), "server_default": utcnow()},
+    )
+
+
+def updated_at_field() -> Optional[datetime]:
+    """An indexed ``updated_at`` column set by the database on every INSERT and UPDATE."""
+    return Field(
+        default=None, nullable=False, index=True,
+        sa_column_kwargs={"default": utcnow(), "server_default": utcnow(), "onupdate": utcnow()},
+    )
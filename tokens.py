@@ -0,0 +1,241 @@
+"""JWT signing and verification with precomputed key material.
+
+``TokenService`` does all per-key work once, at construction: the encoded JWS
+header, the HMAC state for HS* secrets, or the parsed key objects for EdDSA
+(Ed25519) and ES256. Verifying a token is then a byte comparison of the header,
+one signature check and a few integer comparisons on the claims.
+
+Asymmetric algorithms need the ``cryptography`` package. A service built with
+only a public key can verify but not issue tokens, which is what edge verifiers
+use; the public key is published as a JWK set at ``/api/auth/jwks``.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    JWT_PRIVATE_KEY_FILE,
+    JWT_PUBLIC_KEY_FILE,
+    SECRET_KEY,
+)
+
+HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+
+class TokenError(Exception):
+    """Raised for tokens that are malformed, badly signed or expired."""
+
+
+def b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64url_decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _json(data: dict) -> bytes:
+    return json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+
+
+class TokenService:
+    def __init__(
+        self,
+        algorithm: str = "HS256",
+        secret_key: Optional[str] = None,
+        private_key_pem: Optional[bytes] = None,
+        public_key_pem: Optional[bytes] = None,
+        expire_minutes: int = 30,
+    ):
+        self.algorithm = algorithm
+        self.expire_minutes = expire_minutes
+        self._hmac = None
+        self._private_key = None
+        self._public_key = None
+        self.key_id = None
+
+        if algorithm in HMAC_DIGESTS:
+            if not secret_key:
+                raise ValueError(f"{algorithm} needs a secret key")
+            self._hmac = hmac.new(secret_key.encode(), digestmod=HMAC_DIGESTS[algorithm])
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            self._load_asymmetric_keys(private_key_pem, public_key_pem)
+        else:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+
+        header = {"alg": algorithm, "typ": "JWT"}
+        if self.key_id:
+            header["kid"] = self.key_id
+        self._header = b64url_encode(_json(header))
+
+    # Key handling
+
+    def _load_asymmetric_keys(self, private_key_pem: Optional[bytes], public_key_pem: Optional[bytes]) -> None:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+        if private_key_pem:
+            self._private_key = load_pem_private_key(private_key_pem, password=None)
+            self._public_key = self._private_key.public_key()
+        elif public_key_pem:
+            self._public_key = load_pem_public_key(public_key_pem)
+        else:
+            raise ValueError(f"{self.algorithm} needs a private or public key")
+        self.key_id = self._thumbprint()
+
+        # Bind the algorithm-specific sign/verify steps once, so the per-token
+        # path is a single call with no dispatch or imports.
+        public_key, private_key = self._public_key, self._private_key
+        if self.algorithm == "EdDSA":
+            def sign(signing_input: bytes) -> bytes:
+                return private_key.sign(signing_input)
+
+            def verify(signing_input: bytes, signature: bytes) -> bool:
+                try:
+                    public_key.verify(signature, signing_input)
+                except InvalidSignature:
+                    return False
+                return True
+        else:
+            ecdsa = ec.ECDSA(hashes.SHA256())
+
+            def sign(signing_input: bytes) -> bytes:
+                # JWS carries ES256 signatures as raw r || s rather than DER.
+                r, s = decode_dss_signature(private_key.sign(signing_input, ecdsa))
+                return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+            def verify(signing_input: bytes, signature: bytes) -> bool:
+                if len(signature) != 64:
+                    return False
+                der = encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big"))
+                try:
+                    public_key.verify(der, signing_input, ecdsa)
+                except InvalidSignature:
+                    return False
+                return True
+
+        self._asymmetric_sign = sign if private_key is not None else None
+        self._asymmetric_verify = verify
+
+    def _public_jwk(self) -> dict:
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+        if self.algorithm == "EdDSA":
+            raw = self._public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)
+            return {"crv": "Ed25519", "kty": "OKP", "x": b64url_encode(raw).decode()}
+        numbers = self._public_key.public_numbers()
+        return {
+            "crv": "P-256",
+            "kty": "EC",
+            "x": b64url_encode(numbers.x.to_bytes(32, "big")).decode(),
+            "y": b64url_encode(numbers.y.to_bytes(32, "big")).decode(),
+        }
+
+    def _thumbprint(self) -> str:
+        """RFC 7638 JWK thumbprint, used as the ``kid``."""
+        return b64url_encode(hashlib.sha256(_json(self._public_jwk())).digest()).decode()
+
+    def jwks(self) -> dict:
+        """The public verification key as a JWK set (empty for shared-secret algorithms)."""
+        if self._public_key is None:
+            return {"keys": []}
+        return {"keys": [{**self._public_jwk(), "alg": self.algorithm, "kid": self.key_id, "use": "sig"}]}
+
+    # Signatures
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        if self._hmac is not None:
+            mac = self._hmac.copy()
+            mac.update(signing_input)
+            return mac.digest()
+        if self._asymmetric_sign is None:
+            raise TokenError("This token service can only verify tokens")
+        return self._asymmetric_sign(signing_input)
+
+    def _check_signature(self, signing_input: bytes, signature: bytes) -> bool:
+        if self._hmac is not None:
+            mac = self._hmac.copy()
+            mac.update(signing_input)
+            return hmac.compare_digest(mac.digest(), signature)
+        return self._asymmetric_verify(signing_input, signature)
+
+    # Public API
+
+    def create_token(self, claims: dict, expires_delta: Optional[timedelta] = None) -> str:
+        """Sign ``claims`` with an ``exp`` (and ``iat``) added."""
+        now = int(time.time())
+        lifetime = expires_delta if expires_delta is not None else timedelta(minutes=self.expire_minutes)
+        payload = {**claims, "iat": now, "exp": now + int(lifetime.total_seconds())}
+        for key, value in payload.items():
+            if isinstance(value, datetime):
+                payload[key] = int(value.timestamp())
+        signing_input = self._header + b"." + b64url_encode(_json(payload))
+        return (signing_input + b"." + b64url_encode(self._sign(signing_input))).decode()
+
+    def decode(self, token: str) -> dict:
+        """Verify ``token`` and return its claims, or raise ``TokenError``."""
+        raw = token.encode() if isinstance(token, str) else token
+        try:
+            signing_input, signature = raw.rsplit(b".", 1)
+            header, payload = signing_input.split(b".")
+        except ValueError:
+            raise TokenError("Malformed token")
+
+        # Fast path: tokens we issued carry exactly our precomputed header. Anything
+        # else is parsed, and must still name our algorithm (no "none", no HS/EdDSA confusion).
+        if header != self._header:
+            try:
+                parsed_header = json.loads(b64url_decode(header))
+            except ValueError:
+                raise TokenError("Malformed token header")
+            if not isinstance(parsed_header, dict) or parsed_header.get("alg") != self.algorithm:
+                raise TokenError("Unexpected token algorithm")
+
+        try:
+            signature_ok = self._check_signature(signing_input, b64url_decode(signature))
+        except (ValueError, TypeError):
+            signature_ok = False
+        if not signature_ok:
+            raise TokenError("Invalid signature")
+
+        try:
+            claims = json.loads(b64url_decode(payload))
+        except ValueError:
+            raise TokenError("Malformed token payload")
+        if not isinstance(claims, dict):
+            raise TokenError("Malformed token payload")
+
+        now = time.time()
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or exp <= now:
+            raise TokenError("Token expired")
+        nbf = claims.get("nbf")
+        if nbf is not None and (not isinstance(nbf, (int, float)) or nbf > now):
+            raise TokenError("Token not yet valid")
+        return claims
+
+
+def _read_key_file(path: Optional[str]) -> Optional[bytes]:
+    if not path:
+        return None
+    with open(path, "rb") as key_file:
+        return key_file.read()
+
+
+token_service = TokenService(
+    algorithm=ALGORITHM,
+    secret_key=SECRET_KEY if ALGORITHM in HMAC_DIGESTS else None,
+    private_key_pem=_read_key_file(JWT_PRIVATE_KEY_FILE),
+    public_key_pem=_read_key_file(JWT_PUBLIC_KEY_FILE),
+    expire_minutes=ACCESS_TOKEN_EXPIRE_MINUTES,
+)
@@ -1,20 +1,16 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
-import os
-from dotenv import load_dotenv
-import bcrypt
+from tokens import TokenError, token_service
+import uuid
 
-load_dotenv()
-
-# JWT settings
-SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-this-in-production")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# bcrypt is imported inside the functions that need it so that a cold start
+# doesn't pay for it until the first signup or login.
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plaintext password against a hashed password."""
+    import bcrypt
+
     # Encode strings to bytes for bcrypt
     password_bytes = plain_password.encode('utf-8')
     hashed_bytes = hashed_password.encode('utf-8') if isinstance(hashed_password, str) else hashed_password
@@ -23,6 +19,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Hash a plaintext password, ensuring it complies with bcrypt 72-byte limit."""
+    import bcrypt
+
     # Truncate password to 72 bytes to comply with bcrypt limitations
     safe_password = password[:72] if len(password) > 72 else password
     # Encode to bytes for bcrypt
@@ -35,22 +33,16 @@ def get_password_hash(password: str) -> str:
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token with optional expiration time."""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    """Create a JWT access token with optional expiration time.
 
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    Each token gets a unique ``jti`` so that it can be revoked individually.
+    """
+    return token_service.create_token({"jti": uuid.uuid4().hex, **data}, expires_delta)
 
 
 def verify_access_token(token: str) -> Optional[dict]:
     """Verify a JWT access token and return the payload if valid."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
\ No newline at end of file
+        return token_service.decode(token)
+    except TokenError:
+        return None